@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import functools
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import signal
+
+from squidbilli.decode import decode_window, probe_duration_s
+
+# Analysis runs on downsampled mono to reduce CPU.
+ANALYSIS_SR = 11025
+
+# Stored with analysis results; bump when the BPM/key estimators change.
+# Tracks analyzed by an older version are queued again on the next scan.
+# New stored features don't need a bump: tracks missing one get a cheaper
+# feature-only job instead (see analyze_chroma).
+ANALYSIS_VERSION = 1
+
+# Tracks up to this long are analyzed from the start; longer ones from
+# several windows spread over the track (intro, middle, outro).
+ANALYSIS_MAX_S = 60.0
+ANALYSIS_WINDOW_S = 20.0
+ANALYSIS_WINDOW_POSITIONS = (0.2, 0.5, 0.8)
+
+CHROMA_N_FFT = 4096
+CHROMA_HOP = 1024
+
+
+def analysis_windows(duration_s: Optional[float]) -> List[Tuple[float, float]]:
+    """(start_s, length_s) of the audio to analyze for a track of `duration_s`."""
+    if duration_s is None or duration_s <= ANALYSIS_MAX_S + ANALYSIS_WINDOW_S:
+        return [(0.0, ANALYSIS_MAX_S)]
+    half = ANALYSIS_WINDOW_S * 0.5
+    return [(max(0.0, duration_s * pos - half), ANALYSIS_WINDOW_S) for pos in ANALYSIS_WINDOW_POSITIONS]
+
+
+def _decode_windows(path: str | Path) -> List[np.ndarray]:
+    # Only the analysis windows are decoded, straight to mono at the analysis rate.
+    return [
+        decode_window(path, start, length, sample_rate=ANALYSIS_SR, channels=1)[:, 0]
+        for start, length in analysis_windows(probe_duration_s(path))
+    ]
+
+
+def analyze_file(path: str | Path) -> Dict:
+    return analyze_windows(_decode_windows(path), ANALYSIS_SR)
+
+
+def analyze_chroma(path: str | Path) -> Dict:
+    """Only the chroma profile, for tracks whose BPM/key are already stored."""
+    chroma = _mean_chroma(_decode_windows(path), ANALYSIS_SR)
+    return {"chroma": [round(float(c), 5) for c in chroma]} if chroma is not None else {}
+
+
+def _mean_chroma(windows: Sequence[np.ndarray], sr: int) -> Optional[np.ndarray]:
+    profiles = [c for c in (chroma_profile(w, sr) for w in windows) if c is not None]
+    return np.mean(profiles, axis=0) if profiles else None
+
+
+def analyze_windows(windows: Sequence[np.ndarray], sr: int) -> Dict:
+    # Median BPM over the windows (robust to a beatless intro); key from the
+    # mean chroma profile.
+    bpms = [b for b in (estimate_bpm(w, sr) for w in windows) if b is not None]
+    bpm = float(np.median(bpms)) if bpms else None
+    chroma = _mean_chroma(windows, sr)
+    key_name, camelot = key_from_chroma(chroma) if chroma is not None else (None, None)
+
+    out: Dict[str, object] = {"analysis_version": ANALYSIS_VERSION}
+    if chroma is not None:
+        out["chroma"] = [round(float(c), 5) for c in chroma]
+    if bpm is not None:
+        out["bpm"] = float(bpm)
+        out["bpm_source"] = "analyzed"
+    if key_name is not None:
+        out["key"] = key_name
+    if camelot is not None:
+        out["camelot"] = camelot
+    return out
+
+
+def estimate_bpm(mono: np.ndarray, sr: int) -> Optional[float]:
+    # Simple onset-strength autocorrelation tempo estimate.
+    if mono.size < sr:
+        return None
+
+    # Envelope from absolute derivative.
+    x = np.diff(mono)
+    env = np.abs(x)
+    win = int(0.02 * sr)
+    win = max(8, win)
+    env = signal.lfilter(np.ones(win) / win, [1.0], env)
+
+    hop = int(0.01 * sr)
+    hop = max(1, hop)
+    env = env[::hop]
+
+    env = env - np.mean(env)
+    denom = np.std(env) + 1e-8
+    env = env / denom
+
+    # Autocorrelation over reasonable BPM range.
+    min_bpm, max_bpm = 70.0, 180.0
+    min_lag = int((60.0 / max_bpm) * (sr / hop))
+    max_lag = int((60.0 / min_bpm) * (sr / hop))
+    if max_lag <= min_lag + 2:
+        return None
+
+    ac = signal.correlate(env, env, mode="full")
+    ac = ac[ac.size // 2 :]
+
+    window = ac[min_lag:max_lag]
+    if window.size == 0:
+        return None
+    lag = int(np.argmax(window)) + min_lag
+    bpm = 60.0 / (lag * (hop / sr))
+
+    # Normalize to preferred range by doubling/halving.
+    while bpm < min_bpm:
+        bpm *= 2.0
+    while bpm > max_bpm:
+        bpm /= 2.0
+    return float(bpm)
+
+
+@functools.lru_cache(maxsize=8)
+def _chroma_map(sr: int, n_fft: int) -> Tuple[int, int, np.ndarray]:
+    """Rows [lo, hi) of an STFT that fall in 40 Hz..5 kHz, and the (12, hi - lo)
+    matrix summing each of those bins into its nearest pitch class."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    valid = np.flatnonzero((freqs >= 40.0) & (freqs <= 5000.0))
+    lo, hi = int(valid[0]), int(valid[-1]) + 1
+    midi = 69.0 + 12.0 * np.log2(freqs[lo:hi] / 440.0)
+    pc = (np.round(midi).astype(int)) % 12
+    to_pc = np.zeros((12, hi - lo), dtype=np.float64)
+    to_pc[pc, np.arange(hi - lo)] = 1.0
+    to_pc.setflags(write=False)
+    return lo, hi, to_pc
+
+
+def chroma_profile(mono: np.ndarray, sr: int) -> Optional[np.ndarray]:
+    if mono.size < sr:
+        return None
+
+    n_fft = CHROMA_N_FFT
+    hop = CHROMA_HOP
+    _, _, Zxx = signal.stft(mono, fs=sr, nperseg=n_fft, noverlap=n_fft - hop, window="hann")
+    lo, hi, to_pc = _chroma_map(int(sr), n_fft)
+    # Mean magnitude per bin over time, then folded onto pitch classes in one product.
+    chroma = to_pc @ np.abs(Zxx[lo:hi]).mean(axis=1)
+
+    if np.allclose(chroma.sum(), 0.0):
+        return None
+    return chroma / (chroma.sum() + 1e-9)
+
+
+@functools.lru_cache(maxsize=None)
+def _key_profiles() -> np.ndarray:
+    # Krumhansl-Schmuckler profiles, rotated to all 12 roots. Row 2*root is
+    # the major key, 2*root + 1 the minor one (argmax ties go to the lower
+    # root, major first).
+    major = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+    minor = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+    major = major / major.sum()
+    minor = minor / minor.sum()
+    rows = []
+    for root in range(12):
+        rows.append(np.roll(major, root))
+        rows.append(np.roll(minor, root))
+    out = np.array(rows)
+    out.setflags(write=False)
+    return out
+
+
+def key_from_chroma(chroma: np.ndarray) -> Tuple[Optional[str], Optional[str]]:
+    scores = _key_profiles() @ np.asarray(chroma, dtype=np.float64)
+    best = int(np.argmax(scores))
+    if not (scores[best] > -1.0):
+        return None, None
+    root = best // 2
+    mode = "major" if best % 2 == 0 else "minor"
+    names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+    key_name = f"{names[int(root)]} {'maj' if mode == 'major' else 'min'}"
+    camelot = camelot_for_key(int(root), mode)
+    return key_name, camelot
+
+
+def camelot_for_key(root_pc: int, mode: str) -> Optional[str]:
+    # Camelot wheel mapping by circle-of-fifths position.
+    # This uses the standard mapping where 8B=C major and 5A=C minor.
+    camelot_major = {
+        0: "8B",
+        7: "9B",
+        2: "10B",
+        9: "11B",
+        4: "12B",
+        11: "1B",
+        6: "2B",
+        1: "3B",
+        8: "4B",
+        3: "5B",
+        10: "6B",
+        5: "7B",
+    }
+    camelot_minor = {
+        0: "5A",
+        7: "6A",
+        2: "7A",
+        9: "8A",
+        4: "9A",
+        11: "10A",
+        6: "11A",
+        1: "12A",
+        8: "1A",
+        3: "2A",
+        10: "3A",
+        5: "4A",
+    }
+    if mode == "major":
+        return camelot_major.get(root_pc)
+    return camelot_minor.get(root_pc)
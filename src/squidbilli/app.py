@@ -5,6 +5,7 @@ from squidbilli.ui import UI
 from squidbilli.clips import ClipManager
 from squidbilli.audio_process import AudioController
 from squidbilli.ingest_service.process import IngestController
+from squidbilli.separation_service.process import SeparationController
 
 
 def main():
@@ -14,12 +15,16 @@ def main():
     transport_b = Transport()
     mixer_state = MixerState()
 
+    # One warm demucs server shared by the UI and the audio worker.
+    separation = SeparationController(clients=("ui", "audio"))
+    separation.start()
+
     clip_manager_a = ClipManager()
     clip_manager_b = ClipManager()
-    stem_manager_a = StemManager(clip_manager=clip_manager_a)
-    stem_manager_b = StemManager(clip_manager=clip_manager_b)
+    stem_manager_a = StemManager(clip_manager=clip_manager_a, separator=separation.client("ui"))
+    stem_manager_b = StemManager(clip_manager=clip_manager_b, separator=separation.client("ui"))
 
-    audio = AudioController()
+    audio = AudioController(separator=separation.client("audio"))
     audio.start()
 
     ingest = IngestController()
@@ -36,6 +41,7 @@ def main():
         print("Shutting down...")
         audio.stop()
         ingest.stop()
+        separation.stop()
 
 
 if __name__ == "__main__":
@@ -144,7 +144,8 @@ class AudioEngine:
                 send_reverb_sum = np.zeros((frames, 2), dtype=np.float32)
                 send_delay_sum = np.zeros((frames, 2), dtype=np.float32)
 
-            if self.stem_manager_a.stems_ready:
+            mgr_a = self.stem_manager_a
+            if mgr_a.stems_ready or mgr_a.stems_partial:
                 for i in range(8):
                     l_cfg = state.get("lanes_a", state.get("lanes", []))[i]
                     lane_audio = lanes_chunk_a[i]
@@ -177,7 +178,11 @@ class AudioEngine:
                     del_out = self.delay(send_delay_sum, self.sample_rate)
                     stems_sum += del_out
 
-            deck_a = mix_chunk_a * (1.0 - stem_blend) + stems_sum * stem_blend
+            # Regions that are not separated yet play the full mix.
+            blend_a = stem_blend
+            if not mgr_a.stems_ready:
+                blend_a = stem_blend * mgr_a.region_mask(current_pos_a, frames)
+            deck_a = mix_chunk_a * (1.0 - blend_a) + stems_sum * blend_a
 
         stop_b_at_end = False
         if self.transport_b.playing:
@@ -206,7 +211,8 @@ class AudioEngine:
                 send_reverb_sum_b = np.zeros((frames, 2), dtype=np.float32)
                 send_delay_sum_b = np.zeros((frames, 2), dtype=np.float32)
 
-            if self.stem_manager_b.stems_ready:
+            mgr_b = self.stem_manager_b
+            if mgr_b.stems_ready or mgr_b.stems_partial:
                 for i in range(8):
                     l_cfg = state.get("lanes_b", state.get("lanes", []))[i]
                     lane_audio = lanes_chunk_b[i]
@@ -239,7 +245,11 @@ class AudioEngine:
                     del_out_b = self.delay(send_delay_sum_b, self.sample_rate)
                     stems_sum_b += del_out_b
 
-            deck_b = mix_chunk_b * (1.0 - stem_blend) + stems_sum_b * stem_blend
+            # Regions that are not separated yet play the full mix.
+            blend_b = stem_blend
+            if not mgr_b.stems_ready:
+                blend_b = stem_blend * mgr_b.region_mask(current_pos_b, frames)
+            deck_b = mix_chunk_b * (1.0 - blend_b) + stems_sum_b * blend_b
 
         final_mix = (deck_a * ga) + (deck_b * gb)
         final_mix *= master_gain
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from squidbilli.audio_engine import AudioEngine
 from squidbilli.clips import ClipManager
 from squidbilli.mixer_state import MixerState
+from squidbilli.separation_service.process import PRIORITY_CUED, PRIORITY_PLAYING
 from squidbilli.stems import StemManager
 from squidbilli.transport import Transport
 
@@ -25,23 +26,42 @@ class AudioStatus:
     pending_clips_b: list[int]
     clip_playheads_b: list[float]
     clip_page_b: int
-
-
-def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
+    separating_a: bool
+    sep_progress_a: float
+    sep_rate_a: float
+    sep_eta_a: float | None
+    separating_b: bool
+    sep_progress_b: float
+    sep_rate_b: float
+    sep_eta_b: float | None
+    # Stems separated and loaded for the deck's current track.
+    stems_ready_a: bool = False
+    stems_ready_b: bool = False
+    track_id_a: str | None = None
+    track_id_b: str | None = None
+
+
+def _clip_page_start(clip_manager: ClipManager) -> int:
+    starts = [c.start_sample for row in clip_manager.grid for c in row if c is not None]
+    return int(min(starts)) if starts else 0
+
+
+def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue, separator=None):
     transport_a = Transport()
     transport_b = Transport()
     mixer_state = MixerState()
 
     clip_manager_a = ClipManager()
     clip_manager_b = ClipManager()
-    stem_manager_a = StemManager(clip_manager=clip_manager_a)
-    stem_manager_b = StemManager(clip_manager=clip_manager_b)
+    stem_manager_a = StemManager(clip_manager=clip_manager_a, separator=separator, compute_waveform=False)
+    stem_manager_b = StemManager(clip_manager=clip_manager_b, separator=separator, compute_waveform=False)
 
     engine = AudioEngine(transport_a, transport_b, mixer_state, stem_manager_a, stem_manager_b)
     engine.start()
 
     running = True
     last_status = 0.0
+    sep_playing = (False, False)
 
     while running:
         # Drain commands quickly.
@@ -73,8 +93,10 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                 pos = int(cmd.get("pos", 0))
                 if deck == "A":
                     transport_a.seek(pos)
+                    stem_manager_a.set_separation_focus(pos)
                 elif deck == "B":
                     transport_b.seek(pos)
+                    stem_manager_b.set_separation_focus(pos)
 
             elif c == "set_bpm":
                 bpm = float(cmd.get("bpm", 120.0))
@@ -155,6 +177,7 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                             )
                     except Exception:
                         pass
+                    stem_manager_b.set_separation_focus(_clip_page_start(clip_manager_b))
                 else:
                     try:
                         if stem_manager_a.full_mix is not None:
@@ -168,6 +191,7 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                             )
                     except Exception:
                         pass
+                    stem_manager_a.set_separation_focus(_clip_page_start(clip_manager_a))
 
             elif c == "queue_clip":
                 deck = str(cmd.get("deck", "A")).upper()
@@ -316,6 +340,19 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                 except Exception:
                     pass
 
+        # Playing decks get their stems first, and separation backs off while
+        # anything is audible.
+        playing = (bool(transport_a.playing), bool(transport_b.playing))
+        if playing != sep_playing:
+            sep_playing = playing
+            stem_manager_a.set_separation_priority(PRIORITY_PLAYING if playing[0] else PRIORITY_CUED)
+            stem_manager_b.set_separation_priority(PRIORITY_PLAYING if playing[1] else PRIORITY_CUED)
+            if separator is not None:
+                try:
+                    separator.throttle(any(playing))
+                except Exception:
+                    pass
+
         now = time.time()
         if now - last_status > 0.05:
             last_status = now
@@ -336,6 +373,18 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                         pending_clips_b=list(getattr(clip_manager_b, "pending_clip_indices", [-2] * 8)),
                         clip_playheads_b=[float(v) for v in getattr(clip_manager_b, "clip_playheads", [0.0] * 8)],
                         clip_page_b=int(getattr(clip_manager_b, "current_page", 0)),
+                        separating_a=bool(stem_manager_a.is_separating),
+                        sep_progress_a=float(stem_manager_a.separation_progress),
+                        sep_rate_a=float(stem_manager_a.separation_rate),
+                        sep_eta_a=stem_manager_a.separation_eta_s,
+                        separating_b=bool(stem_manager_b.is_separating),
+                        sep_progress_b=float(stem_manager_b.separation_progress),
+                        sep_rate_b=float(stem_manager_b.separation_rate),
+                        sep_eta_b=stem_manager_b.separation_eta_s,
+                        stems_ready_a=bool(stem_manager_a.stems_ready),
+                        stems_ready_b=bool(stem_manager_b.stems_ready),
+                        track_id_a=stem_manager_a.current_track_id,
+                        track_id_b=stem_manager_b.current_track_id,
                     )
                 )
             except Exception:
@@ -350,12 +399,20 @@ def _audio_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
 
 
 class AudioController:
-    def __init__(self):
+    def __init__(self, separator=None):
         ctx = mp.get_context("spawn")
         self._cmd_q: mp.Queue = ctx.Queue()
         self._status_q: mp.Queue = ctx.Queue()
-        self._proc = ctx.Process(target=_audio_worker_main, args=(self._cmd_q, self._status_q), daemon=True)
+        self._proc = ctx.Process(target=_audio_worker_main, args=(self._cmd_q, self._status_q, separator), daemon=True)
         self._last_status: AudioStatus | None = None
+        # Debug HUD counters: commands sent, statuses drained by the last poll.
+        self.cmds_sent = 0
+        self.status_backlog = 0
+        self.status_backlog_max = 0
+
+    def _send(self, cmd: dict):
+        self.cmds_sent += 1
+        self._cmd_q.put(cmd)
 
     def start(self):
         self._proc.start()
@@ -374,35 +431,39 @@ class AudioController:
     def poll_status(self) -> AudioStatus | None:
         # Drain queue; keep last.
         s = None
+        n = 0
         for _ in range(64):
             try:
                 s = self._status_q.get_nowait()
             except Exception:
                 break
+            n += 1
+        self.status_backlog = n
+        self.status_backlog_max = max(self.status_backlog_max, n)
         if s is not None:
             self._last_status = s
         return self._last_status
 
     def play(self, deck: str, playing: bool):
-        self._cmd_q.put({"cmd": "play", "deck": deck, "playing": bool(playing)})
+        self._send({"cmd": "play", "deck": deck, "playing": bool(playing)})
 
     def seek(self, deck: str, pos: int):
-        self._cmd_q.put({"cmd": "seek", "deck": deck, "pos": int(pos)})
+        self._send({"cmd": "seek", "deck": deck, "pos": int(pos)})
 
     def set_bpm(self, bpm: float):
-        self._cmd_q.put({"cmd": "set_bpm", "bpm": float(bpm)})
+        self._send({"cmd": "set_bpm", "bpm": float(bpm)})
 
     def set_mixer_values(self, **values):
-        self._cmd_q.put({"cmd": "mixer", "values": values})
+        self._send({"cmd": "mixer", "values": values})
 
     def set_lane_values(self, lane_idx: int, *, deck: str = "A", **values):
-        self._cmd_q.put({"cmd": "lane", "deck": str(deck).upper(), "lane": int(lane_idx), "values": values})
+        self._send({"cmd": "lane", "deck": str(deck).upper(), "lane": int(lane_idx), "values": values})
 
     def store_scene(self, scene_idx: int):
-        self._cmd_q.put({"cmd": "store_scene", "scene": int(scene_idx)})
+        self._send({"cmd": "store_scene", "scene": int(scene_idx)})
 
     def load_deck(self, deck: str, path: str, track_id: str | None = None, cache_dir: str | None = None, start_separation: bool = True):
-        self._cmd_q.put(
+        self._send(
             {
                 "cmd": "load",
                 "deck": deck,
@@ -414,52 +475,52 @@ class AudioController:
         )
 
     def queue_clip(self, deck: str, lane: int, slot: int):
-        self._cmd_q.put({"cmd": "queue_clip", "deck": str(deck).upper(), "lane": int(lane), "slot": int(slot)})
+        self._send({"cmd": "queue_clip", "deck": str(deck).upper(), "lane": int(lane), "slot": int(slot)})
 
     def trigger_scene(self, deck: str, scene: int):
-        self._cmd_q.put({"cmd": "trigger_scene", "deck": str(deck).upper(), "scene": int(scene)})
+        self._send({"cmd": "trigger_scene", "deck": str(deck).upper(), "scene": int(scene)})
 
     def set_pattern(self, deck: str, lane: int, pattern: str):
-        self._cmd_q.put({"cmd": "pattern", "deck": str(deck).upper(), "lane": int(lane), "pattern": pattern})
+        self._send({"cmd": "pattern", "deck": str(deck).upper(), "lane": int(lane), "pattern": pattern})
 
     def clear_patterns(self, deck: str):
-        self._cmd_q.put({"cmd": "clear_patterns", "deck": str(deck).upper()})
+        self._send({"cmd": "clear_patterns", "deck": str(deck).upper()})
 
     def set_clip_page(self, deck: str, page: int):
-        self._cmd_q.put({"cmd": "set_clip_page", "deck": str(deck).upper(), "page": int(page)})
+        self._send({"cmd": "set_clip_page", "deck": str(deck).upper(), "page": int(page)})
 
     def synth_enable(self, enabled: bool):
-        self._cmd_q.put({"cmd": "synth", "action": "enable", "enabled": bool(enabled)})
+        self._send({"cmd": "synth", "action": "enable", "enabled": bool(enabled)})
 
     def synth_gain(self, gain: float):
-        self._cmd_q.put({"cmd": "synth", "action": "gain", "gain": float(gain)})
+        self._send({"cmd": "synth", "action": "gain", "gain": float(gain)})
 
     def synth_lane_gain(self, lane: int, gain: float):
-        self._cmd_q.put({"cmd": "synth", "action": "lane_gain", "lane": int(lane), "gain": float(gain)})
+        self._send({"cmd": "synth", "action": "lane_gain", "lane": int(lane), "gain": float(gain)})
 
     def synth_lane_pan(self, lane: int, pan: float):
-        self._cmd_q.put({"cmd": "synth", "action": "lane_pan", "lane": int(lane), "pan": float(pan)})
+        self._send({"cmd": "synth", "action": "lane_pan", "lane": int(lane), "pan": float(pan)})
 
     def synth_lane_mute(self, lane: int, mute: bool):
-        self._cmd_q.put({"cmd": "synth", "action": "lane_mute", "lane": int(lane), "mute": bool(mute)})
+        self._send({"cmd": "synth", "action": "lane_mute", "lane": int(lane), "mute": bool(mute)})
 
     def synth_pattern(self, lane: int, pattern: str):
-        self._cmd_q.put({"cmd": "synth", "action": "pattern", "lane": int(lane), "pattern": str(pattern)})
+        self._send({"cmd": "synth", "action": "pattern", "lane": int(lane), "pattern": str(pattern)})
 
     def synth_patch(self, lane: int, **params):
-        self._cmd_q.put({"cmd": "synth", "action": "patch", "lane": int(lane), "params": dict(params)})
+        self._send({"cmd": "synth", "action": "patch", "lane": int(lane), "params": dict(params)})
 
     def beatmatch(self, src: str = "A", dst: str = "B"):
-        self._cmd_q.put({"cmd": "beatmatch", "src": str(src).upper(), "dst": str(dst).upper()})
+        self._send({"cmd": "beatmatch", "src": str(src).upper(), "dst": str(dst).upper()})
 
     def jump_beats(self, deck: str, beats: float):
-        self._cmd_q.put({"cmd": "jump", "deck": str(deck).upper(), "unit": "beats", "amount": float(beats)})
+        self._send({"cmd": "jump", "deck": str(deck).upper(), "unit": "beats", "amount": float(beats)})
 
     def jump_bars(self, deck: str, bars: float):
-        self._cmd_q.put({"cmd": "jump", "deck": str(deck).upper(), "unit": "bars", "amount": float(bars)})
+        self._send({"cmd": "jump", "deck": str(deck).upper(), "unit": "bars", "amount": float(bars)})
 
     def nudge(self, deck: str, samples: int):
-        self._cmd_q.put({"cmd": "nudge", "deck": str(deck).upper(), "samples": int(samples)})
+        self._send({"cmd": "nudge", "deck": str(deck).upper(), "samples": int(samples)})
 
     def bend_speed(self, deck: str, speed: float):
-        self._cmd_q.put({"cmd": "bend", "deck": str(deck).upper(), "speed": float(speed)})
+        self._send({"cmd": "bend", "deck": str(deck).upper(), "speed": float(speed)})
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from squidbilli.library import default_cache_root
+from squidbilli.meta_index import MetadataIndex
+from squidbilli.stem_store import MANIFEST_NAME, STEM_NAMES, convert_stems, stem_file, stems_format
+
+LAST_LOADED_NAME = ".last_loaded"
+POLICY_NAME = "cache_policy.json"
+
+# Tracks loaded this recently are never demoted or dropped (they may be on a deck).
+PROTECT_RECENT_S = 60 * 60
+# Rough size of one track's .npy stems (4 stems, stereo float32, ~5 minutes).
+HOT_TRACK_BYTES = 420 * 1024**2
+# The hot set may use at most this share of the budget.
+HOT_BUDGET_SHARE = 0.5
+
+
+@dataclass
+class CachePolicy:
+    # Total size allowed for tracks/ (stems + metadata).
+    budget_bytes: int = 20 * 1024**3
+    # Most recently loaded tracks keep memory-mappable .npy stems
+    # (capped by hot_limit so the hot set fits the budget).
+    hot_tracks: int = 24
+    # Beyond the hot set, stems are kept as FLAC.
+    cold_format: str = "flac"
+
+
+@dataclass
+class TrackCacheEntry:
+    track_id: str
+    path: Path
+    last_loaded: float
+    stems_format: Optional[str]
+    stems_bytes: int
+    other_bytes: int
+    busy: bool
+
+    @property
+    def total_bytes(self) -> int:
+        return self.stems_bytes + self.other_bytes
+
+
+@dataclass
+class CacheReport:
+    tracks: int
+    with_stems: int
+    total_bytes: int
+    stems_bytes: int
+    converted: int
+    dropped: int
+    freed_bytes: int
+    # Tracks whose stems were dropped (their stems_ready flag is now stale).
+    dropped_ids: List[str] = field(default_factory=list)
+
+
+def touch_last_loaded(cache_root: Path, track_id: str):
+    """Record that a track was just loaded (LRU clock for eviction)."""
+    d = Path(cache_root) / "tracks" / str(track_id)
+    try:
+        d.mkdir(parents=True, exist_ok=True)
+        (d / LAST_LOADED_NAME).write_text(f"{time.time():.3f}", encoding="utf-8")
+    except Exception:
+        pass
+
+
+def load_policy(cache_root: Optional[Path] = None) -> CachePolicy:
+    root = Path(cache_root) if cache_root is not None else default_cache_root()
+    pol = CachePolicy()
+    try:
+        raw = json.loads((root / POLICY_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return pol
+    for k in ("budget_bytes", "hot_tracks"):
+        if k in raw:
+            try:
+                setattr(pol, k, int(raw[k]))
+            except Exception:
+                pass
+    if raw.get("cold_format") in ("flac", "npy", "wav"):
+        pol.cold_format = str(raw["cold_format"])
+    return pol
+
+
+def hot_limit(policy: CachePolicy) -> int:
+    """Number of tracks kept hot: `hot_tracks`, capped to a share of the budget."""
+    fit = int(int(policy.budget_bytes) * HOT_BUDGET_SHARE) // HOT_TRACK_BYTES
+    return max(0, min(int(policy.hot_tracks), fit))
+
+
+def save_policy(policy: CachePolicy, cache_root: Optional[Path] = None):
+    root = Path(cache_root) if cache_root is not None else default_cache_root()
+    tmp = root / f".{POLICY_NAME}.partial"
+    tmp.write_text(json.dumps(asdict(policy), indent=2), encoding="utf-8")
+    os.replace(tmp, root / POLICY_NAME)
+
+
+def _dir_bytes(d: Path) -> int:
+    total = 0
+    try:
+        for p in d.rglob("*"):
+            try:
+                if p.is_file():
+                    total += p.stat().st_size
+            except Exception:
+                pass
+    except Exception:
+        pass
+    return total
+
+
+def _last_loaded(d: Path) -> float:
+    try:
+        return float((d / LAST_LOADED_NAME).read_text(encoding="utf-8").strip())
+    except Exception:
+        pass
+    # Never loaded through a deck (e.g. prefetched): fall back to when the stems were written.
+    for p in (d / "stems" / MANIFEST_NAME, d / "stems", d):
+        try:
+            return float(p.stat().st_mtime)
+        except Exception:
+            continue
+    return 0.0
+
+
+def scan_cache(cache_root: Optional[Path] = None) -> List[TrackCacheEntry]:
+    root = Path(cache_root) if cache_root is not None else default_cache_root()
+    out: List[TrackCacheEntry] = []
+    try:
+        dirs = [p for p in (root / "tracks").iterdir() if p.is_dir()]
+    except Exception:
+        return out
+    for d in dirs:
+        sd = d / "stems"
+        stems_bytes = _dir_bytes(sd) if sd.exists() else 0
+        busy = sd.exists() and ((sd / ".separating.lease").exists() or (sd / ".partial").exists())
+        out.append(
+            TrackCacheEntry(
+                track_id=d.name,
+                path=d,
+                last_loaded=_last_loaded(d),
+                stems_format=stems_format(sd) if sd.exists() else None,
+                stems_bytes=stems_bytes,
+                other_bytes=max(0, _dir_bytes(d) - stems_bytes),
+                busy=bool(busy),
+            )
+        )
+    return out
+
+
+def drop_stems(entry: TrackCacheEntry) -> int:
+    """Delete a track's stems (analysis metadata stays). Returns bytes freed."""
+    sd = entry.path / "stems"
+    before = _dir_bytes(sd)
+    for fmt in ("npy", "flac", "wav"):
+        for name in STEM_NAMES:
+            try:
+                stem_file(sd, name, fmt).unlink()
+            except Exception:
+                pass
+    try:
+        (sd / MANIFEST_NAME).unlink()
+    except Exception:
+        pass
+    try:
+        if not any(sd.iterdir()):
+            sd.rmdir()
+    except Exception:
+        pass
+    return max(0, before - _dir_bytes(sd))
+
+
+def enforce(
+    cache_root: Optional[Path] = None,
+    policy: Optional[CachePolicy] = None,
+    dry_run: bool = False,
+    protect: Iterable[str] = (),
+) -> CacheReport:
+    """Apply the tiering policy, least recently loaded first.
+
+    1. Tracks outside the hot set (see `hot_limit`) are converted to `cold_format`.
+    2. While over budget, the coldest tracks lose their stems (metadata stays);
+       the hot set is only touched if dropping every cold track is not enough.
+    Tracks being separated, loaded within the last hour, or listed in
+    `protect` (currently on a deck) are left alone.
+    """
+    root = Path(cache_root) if cache_root is not None else default_cache_root()
+    pol = policy or load_policy(root)
+    entries = scan_cache(root)
+    entries.sort(key=lambda e: e.last_loaded, reverse=True)
+    now = time.time()
+
+    converted = 0
+    dropped: List[str] = []
+    freed = 0
+    keep = {str(t) for t in protect if t}
+
+    def protected(e: TrackCacheEntry) -> bool:
+        return e.busy or e.track_id in keep or (now - e.last_loaded) < PROTECT_RECENT_S
+
+    hot = hot_limit(pol)
+    for i, e in enumerate(entries):
+        if i < hot or e.stems_format is None or e.stems_format == pol.cold_format or protected(e):
+            continue
+        if dry_run:
+            converted += 1
+            continue
+        try:
+            before = e.stems_bytes
+            if convert_stems(e.path / "stems", pol.cold_format):
+                converted += 1
+                e.stems_bytes = _dir_bytes(e.path / "stems")
+                e.stems_format = pol.cold_format
+                freed += max(0, before - e.stems_bytes)
+        except Exception as ex:
+            print(f"Cache: failed to convert {e.track_id}: {ex}")
+
+    total = sum(e.total_bytes for e in entries)
+    for e in list(reversed(entries[hot:])) + list(reversed(entries[:hot])):
+        if total <= int(pol.budget_bytes):
+            break
+        if e.stems_format is None or protected(e):
+            continue
+        n = e.stems_bytes if dry_run else drop_stems(e)
+        dropped.append(e.track_id)
+        freed += n
+        total -= n
+        e.stems_bytes -= n
+        e.stems_format = None
+
+    return CacheReport(
+        tracks=len(entries),
+        with_stems=sum(1 for e in entries if e.stems_format is not None),
+        total_bytes=total,
+        stems_bytes=sum(e.stems_bytes for e in entries),
+        converted=converted,
+        dropped=len(dropped),
+        freed_bytes=freed,
+        dropped_ids=dropped,
+    )
+
+
+def _fmt_bytes(n: int) -> str:
+    v = float(n)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if v < 1024.0 or unit == "TB":
+            return f"{v:.1f} {unit}" if unit != "B" else f"{int(v)} B"
+        v /= 1024.0
+    return f"{n} B"
+
+
+def _parse_bytes(s: str) -> int:
+    t = s.strip().upper().rstrip("B")
+    mult = 1
+    for suffix, m in (("K", 1024), ("M", 1024**2), ("G", 1024**3), ("T", 1024**4)):
+        if t.endswith(suffix):
+            mult = m
+            t = t[:-1]
+            break
+    return int(float(t) * mult)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="squidbilli-cache", description="Inspect and prune the squidbilli track cache.")
+    parser.add_argument("--root", type=Path, default=None, help="cache root (default ~/.cache/squidbilli)")
+    sub = parser.add_subparsers(dest="cmd")
+
+    p_report = sub.add_parser("report", help="show cache usage")
+    p_report.add_argument("--top", type=int, default=10, help="list the N largest tracks")
+
+    p_prune = sub.add_parser("prune", help="apply the tiering/eviction policy")
+    p_prune.add_argument("--budget", type=str, default=None, help="size budget, e.g. 20G")
+    p_prune.add_argument("--hot", type=int, default=None, help="number of recent tracks kept as .npy")
+    p_prune.add_argument("--dry-run", action="store_true")
+    p_prune.add_argument("--save", action="store_true", help="store --budget/--hot as the default policy")
+
+    args = parser.parse_args(argv)
+    root = args.root.expanduser() if args.root is not None else default_cache_root()
+
+    if args.cmd == "prune":
+        pol = load_policy(root)
+        if args.budget:
+            pol.budget_bytes = _parse_bytes(args.budget)
+        if args.hot is not None:
+            pol.hot_tracks = int(args.hot)
+        if args.save:
+            save_policy(pol, root)
+        rep = enforce(root, pol, dry_run=bool(args.dry_run))
+        if rep.dropped_ids and not args.dry_run:
+            meta = MetadataIndex(root)
+            for tid in rep.dropped_ids:
+                meta.update(tid, {"stems_ready": False})
+            meta.close()
+        print(
+            f"{rep.tracks} tracks, {rep.with_stems} with stems, {_fmt_bytes(rep.total_bytes)} total "
+            f"(budget {_fmt_bytes(pol.budget_bytes)})"
+        )
+        if args.dry_run:
+            print(f"Would convert {rep.converted} to {pol.cold_format}, drop stems of {rep.dropped}, free {_fmt_bytes(rep.freed_bytes)}")
+        else:
+            print(f"Converted {rep.converted} to {pol.cold_format}, dropped stems of {rep.dropped}, freed {_fmt_bytes(rep.freed_bytes)}")
+        return 0
+
+    entries = scan_cache(root)
+    pol = load_policy(root)
+    total = sum(e.total_bytes for e in entries)
+    by_fmt: dict = {}
+    for e in entries:
+        key = e.stems_format or "none"
+        n, b = by_fmt.get(key, (0, 0))
+        by_fmt[key] = (n + 1, b + e.stems_bytes)
+    print(f"Cache root: {root}")
+    print(f"Tracks: {len(entries)}   total {_fmt_bytes(total)}   budget {_fmt_bytes(pol.budget_bytes)}   hot {hot_limit(pol)}")
+    for fmt, (n, b) in sorted(by_fmt.items()):
+        print(f"  stems {fmt:<5} {n:>6} tracks  {_fmt_bytes(b):>10}")
+    top = int(getattr(args, "top", 10) or 0)
+    if top > 0 and entries:
+        print("Largest:")
+        for e in sorted(entries, key=lambda e: e.total_bytes, reverse=True)[:top]:
+            age_d = (time.time() - e.last_loaded) / 86400.0 if e.last_loaded > 0 else float("nan")
+            print(f"  {e.track_id[:12]}  {_fmt_bytes(e.total_bytes):>10}  {e.stems_format or '-':<5}  last loaded {age_d:.1f}d ago")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
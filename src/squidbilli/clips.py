@@ -115,8 +115,8 @@ class ClipManager:
         self.bars_per_slot = bps
         self.slots_per_page = spp
 
-        # Rebuild grid in-place.
-        self.grid = [[None for _ in range(self.num_slots)] for _ in range(self.num_lanes)]
+        # Built aside and swapped in whole: the audio thread may be reading the grid.
+        grid = [[None for _ in range(self.num_slots)] for _ in range(self.num_lanes)]
         base_slot = int(p) * int(spp)
         for l in range(self.num_lanes):
             for s in range(self.num_slots):
@@ -129,7 +129,8 @@ class ClipManager:
                     end = total
                 if end <= start:
                     continue
-                self.create_clip(l, s, f"Clip {l}-{s}", start, end)
+                grid[l][s] = Clip(f"Clip {l}-{s}", l, start, end)
+        self.grid = grid
 
     def queue_clip(self, lane_idx, slot_idx):
         if 0 <= lane_idx < self.num_lanes:
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+
+# Formats libsndfile reads natively (no ffmpeg process needed).
+SOUNDFILE_EXTS = {".wav", ".flac", ".aiff", ".aif"}
+
+# ~1.5s of stereo audio at 44.1 kHz per pipe read.
+DEFAULT_CHUNK_FRAMES = 65536
+
+
+def _sf_info(path: str | Path, native_only: bool = True):
+    # libsndfile >= 1.1 also reads MP3 (and more); native_only limits this to
+    # the formats full-track decodes are known to handle well.
+    if native_only and Path(path).suffix.lower() not in SOUNDFILE_EXTS:
+        return None
+    try:
+        import soundfile as sf
+
+        return sf.info(str(path))
+    except Exception:
+        return None
+
+
+def _map_channels(x: np.ndarray, channels: int) -> np.ndarray:
+    have = int(x.shape[1])
+    if have == channels:
+        return x
+    if channels == 1:
+        return x.mean(axis=1, keepdims=True, dtype=np.float32)
+    if have == 1:
+        return np.repeat(x, channels, axis=1)
+    return x[:, :channels]
+
+
+def probe_duration_s(path: str | Path) -> Optional[float]:
+    # Header-only reads; used to preallocate decode buffers.
+    info = _sf_info(path, native_only=False)
+    if info is not None and info.samplerate > 0 and info.frames > 0:
+        return float(info.frames) / float(info.samplerate)
+
+    cmd = [
+        FFPROBE_BIN,
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        str(path),
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=10.0)
+        dur = float(out.stdout.strip())
+    except Exception:
+        return None
+    if dur != dur or dur <= 0.0:
+        return None
+    return dur
+
+
+def _iter_soundfile_chunks(path: str | Path, channels: int, chunk_frames: int) -> Iterator[np.ndarray]:
+    import soundfile as sf
+
+    with sf.SoundFile(str(path)) as f:
+        while True:
+            block = f.read(int(chunk_frames), dtype="float32", always_2d=True)
+            if block.shape[0] == 0:
+                break
+            yield _map_channels(block, channels)
+
+
+def _iter_ffmpeg_chunks(
+    path: str | Path,
+    sample_rate: int,
+    channels: int,
+    chunk_frames: int,
+    start_s: Optional[float] = None,
+    duration_s: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    cmd = [FFMPEG_BIN, "-nostdin", "-v", "error"]
+    if start_s:
+        # Before -i: input seeking, so ffmpeg skips to the position instead of decoding up to it.
+        cmd += ["-ss", f"{float(start_s):.3f}"]
+    cmd += ["-i", str(path)]
+    if duration_s is not None:
+        cmd += ["-t", f"{float(duration_s):.3f}"]
+    cmd += [
+        "-vn",
+        "-f",
+        "f32le",
+        "-acodec",
+        "pcm_f32le",
+        "-ac",
+        str(int(channels)),
+        "-ar",
+        str(int(sample_rate)),
+        "-",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    frame_bytes = 4 * int(channels)
+    want = max(1, int(chunk_frames)) * frame_bytes
+    produced = 0
+    carry = b""
+    try:
+        while True:
+            data = proc.stdout.read(want)
+            if not data:
+                break
+            if carry:
+                data = carry + data
+                carry = b""
+            usable = len(data) - (len(data) % frame_bytes)
+            if usable < len(data):
+                carry = data[usable:]
+            if usable <= 0:
+                continue
+            chunk = np.frombuffer(data[:usable], dtype="<f4").reshape(-1, int(channels))
+            produced += int(chunk.shape[0])
+            yield chunk
+
+        proc.wait()
+        if proc.returncode != 0 and produced == 0:
+            err = b""
+            try:
+                err = proc.stderr.read() or b""
+            except Exception:
+                pass
+            tail = err[-2000:].decode("utf-8", errors="replace")
+            raise RuntimeError(f"ffmpeg decode failed (code={proc.returncode}): {tail}")
+    finally:
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        for stream in (proc.stdout, proc.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        try:
+            proc.wait(timeout=1.0)
+        except Exception:
+            pass
+
+
+def iter_pcm_chunks(
+    path: str | Path,
+    *,
+    sample_rate: int = 44100,
+    channels: int = 2,
+    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+) -> Iterator[np.ndarray]:
+    """Yield (frames, channels) float32 chunks at `sample_rate`.
+
+    WAV/FLAC/AIFF already at the target rate are read with libsndfile; anything
+    else goes through an ffmpeg pipe, which also resamples and remaps channels.
+    Raises FileNotFoundError if ffmpeg is needed but not installed and
+    RuntimeError if ffmpeg fails before producing any audio.
+    """
+    info = _sf_info(path)
+    if info is not None and int(info.samplerate) == int(sample_rate):
+        return _iter_soundfile_chunks(path, int(channels), int(chunk_frames))
+    return _iter_ffmpeg_chunks(path, int(sample_rate), int(channels), int(chunk_frames))
+
+
+def decode_audio(path: str | Path, *, sample_rate: int = 44100, channels: int = 2) -> np.ndarray:
+    """Decode a whole file to a (frames, channels) float32 array at `sample_rate`.
+
+    Chunks are written straight into one preallocated buffer, so the only
+    full-track allocation is the result itself.
+    """
+    sr = int(sample_rate)
+    ch = int(channels)
+
+    info = _sf_info(path)
+    if info is not None and int(info.samplerate) == sr:
+        import soundfile as sf
+
+        data, _ = sf.read(str(path), dtype="float32", always_2d=True)
+        return np.ascontiguousarray(_map_channels(data, ch))
+
+    dur_s = probe_duration_s(path)
+    cap = int(dur_s * sr) + sr if dur_s is not None else sr * 60
+    out = np.empty((max(sr, cap), ch), dtype=np.float32)
+    n = 0
+    try:
+        for chunk in _iter_ffmpeg_chunks(path, sr, ch, DEFAULT_CHUNK_FRAMES):
+            end = n + int(chunk.shape[0])
+            if end > out.shape[0]:
+                grown = np.empty((max(end, int(out.shape[0] * 1.5)), ch), dtype=np.float32)
+                grown[:n] = out[:n]
+                out = grown
+            out[n:end] = chunk
+            n = end
+    except FileNotFoundError:
+        if info is None:
+            raise
+        # No ffmpeg, but libsndfile can read it: resample in-process.
+        import soundfile as sf
+        from scipy import signal
+
+        data, file_sr = sf.read(str(path), dtype="float32", always_2d=True)
+        data = _map_channels(data, ch)
+        g = int(np.gcd(int(file_sr), sr))
+        data = signal.resample_poly(data, sr // g, int(file_sr) // g, axis=0)
+        return np.ascontiguousarray(data, dtype=np.float32)
+    return out[:n]
+
+
+def decode_window(
+    path: str | Path,
+    start_s: float,
+    duration_s: float,
+    *,
+    sample_rate: int = 44100,
+    channels: int = 2,
+) -> np.ndarray:
+    """Decode only `duration_s` seconds from `start_s` to (frames, channels) float32.
+
+    Anything libsndfile can open (including MP3 with libsndfile >= 1.1) is
+    seeked and read in-process, resampling only that window; everything else
+    (or anything libsndfile fails on) uses ffmpeg with input seeking and -t.
+    """
+    sr = int(sample_rate)
+    ch = int(channels)
+    start_s = max(0.0, float(start_s))
+    duration_s = max(0.0, float(duration_s))
+
+    info = _sf_info(path, native_only=False)
+    if info is not None:
+        import soundfile as sf
+
+        file_sr = int(info.samplerate)
+        try:
+            with sf.SoundFile(str(path)) as f:
+                start = min(int(start_s * file_sr), int(info.frames))
+                f.seek(start)
+                data = f.read(int(duration_s * file_sr), dtype="float32", always_2d=True)
+        except Exception:
+            if Path(path).suffix.lower() in SOUNDFILE_EXTS:
+                raise
+            data = None
+        if data is not None:
+            data = _map_channels(data, ch)
+            if file_sr != sr and data.shape[0] > 0:
+                from scipy import signal
+
+                g = int(np.gcd(file_sr, sr))
+                data = signal.resample_poly(data, sr // g, file_sr // g, axis=0)
+            return np.ascontiguousarray(data, dtype=np.float32)
+
+    out = np.empty((int(duration_s * sr) + sr, ch), dtype=np.float32)
+    n = 0
+    chunks = _iter_ffmpeg_chunks(path, sr, ch, DEFAULT_CHUNK_FRAMES, start_s=start_s, duration_s=duration_s)
+    try:
+        for chunk in chunks:
+            take = min(int(chunk.shape[0]), out.shape[0] - n)
+            out[n : n + take] = chunk[:take]
+            n += take
+            if n >= out.shape[0]:
+                break
+    finally:
+        chunks.close()
+    return out[:n]
+
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List
+
+# Lower runs first. CRITICAL tasks run every time they are due, budget or not.
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+# Share of a 60 Hz frame the UI's own work may use; the rest is left for
+# DearPyGui's render and the audio worker.
+DEFAULT_FRAME_BUDGET_S = 0.008
+
+# A deferred task runs anyway once it is this many periods late.
+MAX_DEFER_PERIODS = 4.0
+
+FRAME_HISTORY = 600
+
+
+@dataclass
+class FrameTask:
+    name: str
+    fn: Callable[[], object]
+    priority: int
+    interval_s: float
+    last_run: float = 0.0
+    # Exponential moving average of the task's run time.
+    cost_s: float = 0.0
+    runs: int = 0
+    deferred: int = 0
+    errors: int = 0
+
+
+@dataclass
+class FrameStats:
+    frames: int = 0
+    over_budget: int = 0
+    frame_times: Deque[float] = field(default_factory=lambda: deque(maxlen=FRAME_HISTORY))
+    # Time between successive run_frame calls: our work plus DearPyGui's render.
+    frame_periods: Deque[float] = field(default_factory=lambda: deque(maxlen=FRAME_HISTORY))
+    last_start: float = 0.0
+
+
+class FrameScheduler:
+    """Runs the UI's per-frame tasks by priority within a time budget.
+
+    Each task has a target period. Due tasks run highest priority first;
+    once the frame has used its budget, non-critical tasks whose expected
+    cost would not fit are pushed to a later frame (but never more than
+    MAX_DEFER_PERIODS late).
+    """
+
+    def __init__(self, budget_s: float = DEFAULT_FRAME_BUDGET_S):
+        self.budget_s = float(budget_s)
+        self.tasks: List[FrameTask] = []
+        self.stats = FrameStats()
+
+    def add(self, name: str, fn: Callable[[], object], *, priority: int = PRIORITY_NORMAL, interval_s: float = 0.0) -> FrameTask:
+        task = FrameTask(name=name, fn=fn, priority=int(priority), interval_s=max(0.0, float(interval_s)))
+        self.tasks.append(task)
+        return task
+
+    def run_frame(self) -> float:
+        """Run one frame's due tasks; returns the time spent."""
+        t0 = time.perf_counter()
+        now = time.time()
+        if self.stats.last_start > 0.0:
+            self.stats.frame_periods.append(t0 - self.stats.last_start)
+        self.stats.last_start = t0
+        due = [t for t in self.tasks if now - t.last_run >= t.interval_s]
+        due.sort(key=lambda t: t.priority)
+
+        for t in due:
+            used = time.perf_counter() - t0
+            if t.priority > PRIORITY_CRITICAL and used + t.cost_s > self.budget_s:
+                late = now - t.last_run
+                if late < max(t.interval_s, 1.0 / 60.0) * MAX_DEFER_PERIODS:
+                    t.deferred += 1
+                    continue
+            ts = time.perf_counter()
+            try:
+                t.fn()
+            except Exception as e:
+                t.errors += 1
+                if t.errors == 1:
+                    print(f"UI task {t.name} failed: {e}")
+            dt = time.perf_counter() - ts
+            t.cost_s = dt if t.runs == 0 else (t.cost_s * 0.9 + dt * 0.1)
+            t.runs += 1
+            t.last_run = now
+
+        elapsed = time.perf_counter() - t0
+        self.stats.frames += 1
+        self.stats.frame_times.append(elapsed)
+        if elapsed > self.budget_s:
+            self.stats.over_budget += 1
+        return elapsed
+
+    def snapshot(self) -> Dict[str, object]:
+        """Frame-time percentiles (ms) and per-task cost/deferral counters."""
+        times = sorted(self.stats.frame_times)
+        periods = sorted(self.stats.frame_periods)
+
+        def pct(xs: List[float], p: float) -> float:
+            if not xs:
+                return 0.0
+            return xs[min(len(xs) - 1, int(p * (len(xs) - 1)))] * 1000.0
+
+        return {
+            "frames": self.stats.frames,
+            "over_budget": self.stats.over_budget,
+            "p50_ms": pct(times, 0.50),
+            "p95_ms": pct(times, 0.95),
+            "p99_ms": pct(times, 0.99),
+            "max_ms": (times[-1] * 1000.0) if times else 0.0,
+            "period_p50_ms": pct(periods, 0.50),
+            "period_p95_ms": pct(periods, 0.95),
+            "period_p99_ms": pct(periods, 0.99),
+            "tasks": {
+                t.name: {"cost_ms": t.cost_s * 1000.0, "runs": t.runs, "deferred": t.deferred, "errors": t.errors}
+                for t in self.tasks
+            },
+        }
@@ -6,6 +6,7 @@ import uuid
 from dataclasses import dataclass
 from pathlib import Path
 
+from squidbilli.analysis import analyze_file
 from squidbilli.library import TrackLibrary, default_cache_root, track_id_for_path
 
 
@@ -255,11 +256,13 @@ def _ingest_worker_main(cmd_q: mp.Queue, status_q: mp.Queue):
                 pass
 
             try:
-                updates = library._analyze_track(final_path)
+                updates = analyze_file(final_path)
                 if updates:
                     library.update_meta(tid, dict(updates))
             except Exception:
                 pass
+            # The UI process re-reads the index when it rescans after "done".
+            library.flush_meta()
 
         _emit_status(
             status_q,
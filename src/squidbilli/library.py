@@ -1,20 +1,44 @@
 from __future__ import annotations
 
-import json
+import atexit
+import heapq
+import itertools
+import multiprocessing as mp
 import os
 import re
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-import numpy as np
-import soundfile as sf
-from scipy import signal
+from squidbilli.analysis import ANALYSIS_VERSION, analyze_chroma, analyze_file
+from squidbilli.library_query import RECOMMEND_BPM_TOLERANCE, RECOMMEND_COUNT, LibraryQuery, parse_query
+from squidbilli.meta_index import MetadataIndex
+from squidbilli.stem_store import stems_complete
 
 AUDIO_EXTS = {".mp3", ".wav", ".aiff", ".aif", ".flac", ".m4a"}
 
+# Analysis queue order: the selected track, then tracks visible in the list.
+ANALYSIS_PRIORITY_SELECTED = 0
+ANALYSIS_PRIORITY_VISIBLE = 1
+ANALYSIS_PRIORITY_BACKGROUND = 2
+# Chroma-only jobs for tracks analyzed before chroma was stored.
+ANALYSIS_PRIORITY_CHROMA = 3
+
+# Directory listings run in parallel (scandir/stat release the GIL).
+SCAN_WORKERS = 8
+# While a scan runs, the track list is republished every this many new files.
+SCAN_PUBLISH_EVERY = 500
+# The folder watcher checks directory mtimes this often.
+WATCH_INTERVAL_S = 5.0
+
+
+def default_analysis_workers() -> int:
+    # Leave cores for the audio worker, separation and the UI.
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
 
 def default_cache_root() -> Path:
     root = Path.home() / ".cache" / "squidbilli"
@@ -30,6 +54,28 @@ def track_id_for_path(path: Path) -> str:
     return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
 
+def _list_dir(d: str) -> Tuple[List[Tuple[str, int, int]], List[str], Optional[float]]:
+    """Audio files (path, size, int mtime), subdirectories and mtime of one directory."""
+    files: List[Tuple[str, int, int]] = []
+    subdirs: List[str] = []
+    try:
+        d_mtime = os.stat(d).st_mtime
+        with os.scandir(d) as it:
+            for e in it:
+                try:
+                    # Like rglob: don't descend into symlinked directories.
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    elif os.path.splitext(e.name)[1].lower() in AUDIO_EXTS and e.is_file():
+                        st = e.stat()
+                        files.append((e.path, int(st.st_size), int(st.st_mtime)))
+                except OSError:
+                    continue
+    except OSError:
+        return [], [], None
+    return files, subdirs, d_mtime
+
+
 @dataclass
 class TrackInfo:
     track_id: str
@@ -39,22 +85,56 @@ class TrackInfo:
     bpm: Optional[float]
     camelot: Optional[str]
     musical_key: Optional[str]
+    # 12-bin pitch-class profile from analysis (sums to 1), for similarity ranking.
+    chroma: Optional[Tuple[float, ...]] = None
+    # File mtime as seen by the scan.
+    mtime: float = 0.0
+
+
+def _chroma_tuple(v) -> Optional[Tuple[float, ...]]:
+    try:
+        return tuple(float(x) for x in v) if v is not None and len(v) == 12 else None
+    except Exception:
+        return None
 
 
 class TrackLibrary:
-    def __init__(self, cache_root: Optional[Path] = None):
+    def __init__(self, cache_root: Optional[Path] = None, analysis_workers: Optional[int] = None):
         self.cache_root = cache_root or default_cache_root()
         self.folders: List[Path] = []
         self._tracks: List[TrackInfo] = []
         self._index_by_id: Dict[str, TrackInfo] = {}
+        self.meta = MetadataIndex(self.cache_root)
+        atexit.register(self.meta.flush)
+        # Bumped whenever the track list or a track's fields change.
+        self.version = 0
+        self._query: Optional[LibraryQuery] = None
+        self._filter_cache = None
+
+        self.scanning = False
+        self._scan_lock = threading.Lock()
+        self._scan_run_lock = threading.Lock()
+        self._scan_pending = False
+        self._scan_thread: Optional[threading.Thread] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        # Directory -> mtime seen by the last scan, for the watcher.
+        self._dir_mtimes: Dict[str, float] = {}
 
         self.filter_text: str = ""
         self.selected_index: int = 0
 
-        self._analysis_lock = threading.Lock()
-        self._analysis_queue: List[Tuple[str, Path]] = []
+        self.analysis_workers = int(analysis_workers or default_analysis_workers())
+        self._analysis_cv = threading.Condition()
+        # Heap of (priority, seq, track_id, path); entries superseded by a
+        # higher priority stay in the heap and are skipped when popped.
+        # (priority, seq, track_id, path, chroma_only)
+        self._analysis_heap: List[Tuple[int, int, str, Path, bool]] = []
+        self._analysis_seq = itertools.count()
+        self._analysis_pending: Dict[str, Tuple[int, Path, bool]] = {}
         self._analysis_inflight: set[str] = set()
-        self._analysis_thread = threading.Thread(target=self._analysis_worker, daemon=True)
+        self._analysis_done = 0
+        self._analysis_executor = None
+        self._analysis_thread = threading.Thread(target=self._analysis_dispatch, daemon=True)
         self._analysis_thread.start()
 
     def add_folder(self, folder: Path):
@@ -63,132 +143,230 @@ class TrackLibrary:
             self.folders.append(folder)
 
     def scan(self):
-        tracks: List[TrackInfo] = []
-        for folder in self.folders:
-            if not folder.exists():
-                continue
-            for p in folder.rglob("*"):
-                if not p.is_file():
-                    continue
-                if p.suffix.lower() not in AUDIO_EXTS:
-                    continue
-                tid = track_id_for_path(p)
-                meta = self._read_meta(tid)
-                stems_ready = self._stems_exist(tid)
-                bpm = meta.get("bpm") if meta else None
-                camelot = meta.get("camelot") if meta else None
-                musical_key = meta.get("key") if meta else None
-
-                # Opportunistic filename parse (stored separately); analysis can override later.
-                filename_bpm = self._parse_bpm_from_filename(p.name)
-                if filename_bpm is not None and (meta.get("filename_bpm") != filename_bpm):
-                    self.update_meta(tid, {"filename_bpm": float(filename_bpm)})
-
-                # If analysis missing (or only filename BPM exists), enqueue analysis.
-                if bpm is None or camelot is None or musical_key is None:
-                    self.enqueue_analysis(tid, p)
-                tracks.append(
-                    TrackInfo(
-                        track_id=tid,
-                        path=p,
-                        name=p.stem,
-                        stems_ready=stems_ready,
-                        bpm=bpm,
-                        camelot=camelot,
-                        musical_key=musical_key,
-                    )
-                )
+        """Rescan all folders, blocking. The UI uses scan_async()."""
+        with self._scan_run_lock:
+            self._scan(None)
+
+    def scan_async(self):
+        """Rescan all folders on a background thread; the track list fills in as it goes."""
+        with self._scan_lock:
+            self._scan_pending = True
+            if self._scan_thread is not None:
+                return
+            self._scan_thread = threading.Thread(target=self._scan_loop, daemon=True)
+            self._scan_thread.start()
 
-        tracks.sort(key=lambda t: t.name.lower())
-        self._tracks = tracks
-        self._index_by_id = {t.track_id: t for t in tracks}
-        self.selected_index = max(0, min(self.selected_index, len(self.filtered_tracks()) - 1))
+    def _scan_loop(self):
+        while True:
+            with self._scan_lock:
+                if not self._scan_pending:
+                    self._scan_thread = None
+                    return
+                self._scan_pending = False
+            try:
+                with self._scan_run_lock:
+                    self._scan(None)
+            except Exception as e:
+                print(f"Library scan error: {e}")
+
+    def start_watching(self, interval_s: float = WATCH_INTERVAL_S):
+        """Pick up added/removed files by polling directory mtimes (no full rescans)."""
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(float(interval_s),), daemon=True)
+        self._watch_thread.start()
 
-    def filtered_tracks(self) -> List[TrackInfo]:
-        ft = self.filter_text.strip()
-        if not ft:
-            return list(self._tracks)
-
-        bpm_min = None
-        bpm_max = None
-        camelot = None
-        key = None
-        terms: List[str] = []
-
-        for raw in ft.split():
-            token = raw.strip()
-            low = token.lower()
-
-            if low.startswith("bpm:"):
-                spec = low.split(":", 1)[1]
-                if "-" in spec:
-                    a, b = spec.split("-", 1)
-                    try:
-                        bpm_min = float(a)
-                        bpm_max = float(b)
-                    except Exception:
-                        pass
-                else:
-                    try:
-                        v = float(spec)
-                        bpm_min = v
-                        bpm_max = v
-                    except Exception:
-                        pass
+    def _watch_loop(self, interval_s: float):
+        while True:
+            time.sleep(interval_s)
+            if self.scanning or not self._dir_mtimes:
                 continue
-
-            if low.startswith("camelot:"):
-                camelot = token.split(":", 1)[1].strip().upper()
+            changed = []
+            for d, mt in list(self._dir_mtimes.items()):
+                try:
+                    if os.stat(d).st_mtime != mt:
+                        changed.append(d)
+                except OSError:
+                    changed.append(d)
+            if not changed:
                 continue
+            try:
+                with self._scan_run_lock:
+                    self._scan(changed)
+            except Exception as e:
+                print(f"Library watch error: {e}")
+
+    def _scan(self, dirs: Optional[List[str]]):
+        """Walk `dirs` (None: every folder) and merge the result into the track list.
+
+        Files whose (path, size, mtime) match the persisted scan index reuse
+        their track id without hashing. A partial scan lists only the given
+        directories plus any subdirectories not seen before.
+        """
+        self.scanning = True
+        try:
+            full = dirs is None
+            if full:
+                # Pick up metadata written by other processes (ingest) since the last scan.
+                self.meta.reload()
+                roots = [str(f) for f in self.folders if f.exists()]
+            else:
+                roots = list(dirs)
+            known = self.meta.scanned_files()
+
+            by_path: Dict[str, TrackInfo] = {str(t.path): t for t in self._tracks}
+            seen: set[str] = set()
+            scanned_dirs: set[str] = set()
+            dir_mtimes: Dict[str, float] = {}
+            new_rows: List[Tuple[str, int, int, str]] = []
+            since_publish = 0
+
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+                pending = {pool.submit(self._scan_dir, d, known) for d in roots}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        d, tracks, rows, subdirs, d_mtime = fut.result()
+                        if d_mtime is None:
+                            continue
+                        scanned_dirs.add(d)
+                        dir_mtimes[d] = d_mtime
+                        new_rows.extend(rows)
+                        for t in tracks:
+                            by_path[str(t.path)] = t
+                            seen.add(str(t.path))
+                        since_publish += len(tracks)
+                        for sd in subdirs:
+                            if full or sd not in self._dir_mtimes:
+                                pending.add(pool.submit(self._scan_dir, sd, known))
+                    if since_publish >= SCAN_PUBLISH_EVERY:
+                        since_publish = 0
+                        self._publish(by_path.values(), final=False)
+
+            if full:
+                removed = [p for p in by_path if p not in seen]
+                self._dir_mtimes = dir_mtimes
+            else:
+                removed = [p for p in by_path if os.path.dirname(p) in scanned_dirs and p not in seen]
+                for d in roots:
+                    if d not in scanned_dirs:
+                        # Directory is gone: drop it and everything below it.
+                        prefix = d + os.sep
+                        removed.extend(p for p in by_path if p.startswith(prefix))
+                        for k in [k for k in self._dir_mtimes if k == d or k.startswith(prefix)]:
+                            self._dir_mtimes.pop(k, None)
+                self._dir_mtimes.update(dir_mtimes)
+            for p in set(removed):
+                by_path.pop(p, None)
+            if full:
+                forget = [p for p in known if p not in seen]
+            else:
+                forget = [p for p in set(removed) if p in known]
+
+            self.meta.record_files(new_rows, forget)
+            self.meta.flush()
+            self._publish(by_path.values(), final=True)
+        finally:
+            self.scanning = False
+
+    def _scan_dir(self, d: str, known: Dict[str, Tuple[int, int, str]]):
+        files, subdirs, d_mtime = _list_dir(d)
+        tracks: List[TrackInfo] = []
+        rows: List[Tuple[str, int, int, str]] = []
+        for path_s, size, mtime in files:
+            prev = known.get(path_s)
+            p = Path(path_s)
+            if prev is not None and prev[0] == size and prev[1] == mtime:
+                tid = prev[2]
+            else:
+                try:
+                    tid = track_id_for_path(p)
+                except OSError:
+                    continue
+                rows.append((path_s, size, mtime, tid))
+            tracks.append(self._track_info(tid, p, mtime))
+        return d, tracks, rows, subdirs, d_mtime
+
+    def _track_info(self, tid: str, p: Path, mtime: float = 0.0) -> TrackInfo:
+        meta = self.meta.get(tid)
+        stems_ready = self._stems_exist(tid)
+        bpm = meta.get("bpm")
+        camelot = meta.get("camelot")
+        musical_key = meta.get("key")
+
+        updates: Dict[str, object] = {}
+        if meta.get("stems_ready") != stems_ready:
+            updates["stems_ready"] = stems_ready
+        # Opportunistic filename parse (stored separately); analysis can override later.
+        filename_bpm = self._parse_bpm_from_filename(p.name)
+        if filename_bpm is not None and (meta.get("filename_bpm") != filename_bpm):
+            updates["filename_bpm"] = float(filename_bpm)
+        if updates:
+            self.meta.update(tid, updates)
+
+        # If analysis missing (or only filename BPM exists) or stale, enqueue analysis.
+        # A track that failed under the current version waits until the file
+        # changes (which gives it a new track id).
+        version = meta.get("analysis_version")
+        if version is None and bpm is not None and camelot is not None and musical_key is not None:
+            # Analyzed before versions were recorded; that estimator is version 1.
+            version = 1
+        current = int(version or 0) >= ANALYSIS_VERSION
+        failed = current and meta.get("analysis_error") is not None
+        if not failed and (bpm is None or camelot is None or musical_key is None or not current):
+            self.enqueue_analysis(tid, p)
+        elif not failed and meta.get("chroma") is None and meta.get("chroma_error") is None:
+            # Analyzed before chroma was stored: fill it in, keeping BPM/key.
+            self.enqueue_analysis(tid, p, ANALYSIS_PRIORITY_CHROMA, chroma_only=True)
+        return TrackInfo(
+            track_id=tid,
+            path=p,
+            name=p.stem,
+            stems_ready=stems_ready,
+            bpm=bpm,
+            camelot=camelot,
+            musical_key=musical_key,
+            chroma=_chroma_tuple(meta.get("chroma")),
+            mtime=float(mtime),
+        )
+
+    def _publish(self, tracks: Iterable[TrackInfo], final: bool):
+        # Readers (UI thread) only ever see complete lists; both are swapped in whole.
+        ordered = sorted(tracks, key=lambda t: t.name.lower())
+        # The query index is built here, off the UI thread, once the scan is done.
+        query = LibraryQuery(ordered) if final else None
+        self._index_by_id = {t.track_id: t for t in ordered}
+        self._query = query
+        self._tracks = ordered
+        self.version += 1
+        self.selected_index = max(0, min(self.selected_index, len(self.filtered_tracks()) - 1))
 
-            if low.startswith("key:"):
-                key = token.split(":", 1)[1].strip().upper()
-                continue
+    def all_tracks(self) -> List[TrackInfo]:
+        return list(self._tracks)
 
-            terms.append(low)
+    def get_track(self, track_id: str) -> Optional[TrackInfo]:
+        return self._index_by_id.get(str(track_id))
 
-        def meta_for(t: TrackInfo) -> Dict:
-            return self._read_meta(t.track_id) or {}
+    def filtered_tracks(self) -> List[TrackInfo]:
+        tracks = self._tracks
+        ft = self.filter_text.strip()
+        if not ft:
+            return list(tracks)
 
-        def passes(t: TrackInfo) -> bool:
-            hay = f"{t.name.lower()} {str(t.path).lower()}"
-            if any(term not in hay for term in terms):
-                return False
+        key = (ft, self.version, id(tracks))
+        cached = self._filter_cache
+        if cached is not None and cached[0] == key:
+            return list(cached[1])
 
-            meta = meta_for(t)
-            bpm_val = meta.get("bpm", t.bpm)
-            if bpm_min is not None or bpm_max is not None:
-                if bpm_val is None:
-                    return False
-                try:
-                    b = float(bpm_val)
-                except Exception:
-                    return False
-                if bpm_min is not None and b < bpm_min:
-                    return False
-                if bpm_max is not None and b > bpm_max:
-                    return False
-
-            if camelot:
-                c = meta.get("camelot")
-                if not c:
-                    return False
-                if str(c).upper() != camelot:
-                    return False
-
-            if key:
-                c = meta.get("camelot")
-                if c and str(c).upper() == key:
-                    return True
-                k = meta.get("key")
-                if not k:
-                    return False
-                if key not in str(k).upper().replace(" ", ""):
-                    return False
-
-            return True
-
-        return [t for t in self._tracks if passes(t)]
+        q = parse_query(ft)
+        engine = self._query
+        if engine is not None and engine.tracks is tracks:
+            out = [tracks[i] for i in engine.run(q, self.version)]
+        else:
+            # Scan still publishing partial lists: no index for this one yet.
+            out = [t for t in tracks if q.matches(t)]
+        self._filter_cache = (key, out)
+        return list(out)
 
     def select_next(self):
         items = self.filtered_tracks()
@@ -216,62 +394,158 @@ class TrackLibrary:
         return d
 
     def stems_dir(self, track_id: str) -> Path:
-        d = self.cache_dir(track_id) / "stems"
-        d.mkdir(parents=True, exist_ok=True)
-        return d
-
-    def meta_path(self, track_id: str) -> Path:
-        return self.cache_dir(track_id) / "meta.json"
+        # Not created here: the separation server makes it when it writes stems.
+        return self.cache_root / "tracks" / track_id / "stems"
 
     def get_meta(self, track_id: str) -> Dict:
-        return self._read_meta(track_id)
+        return self.meta.get(track_id)
 
     def write_meta(self, track_id: str, meta: Dict):
-        p = self.meta_path(track_id)
-        p.write_text(json.dumps(meta, indent=2))
+        self.meta.put(track_id, meta)
+        self._apply_meta(track_id)
 
     def update_meta(self, track_id: str, updates: Dict):
-        meta = self._read_meta(track_id) or {}
-        meta.update(updates)
-        self.write_meta(track_id, meta)
-
-    def _read_meta(self, track_id: str) -> Dict:
-        p = self.meta_path(track_id)
-        if not p.exists():
-            return {}
-        try:
-            return json.loads(p.read_text())
-        except Exception:
-            return {}
+        self.meta.update(track_id, updates)
+        self._apply_meta(track_id)
+
+    def flush_meta(self):
+        self.meta.flush()
+
+    def mark_stems_ready(self, track_id: str, ready: bool = True):
+        t = self._index_by_id.get(str(track_id))
+        if t is not None:
+            t.stems_ready = bool(ready)
+        self.meta.update(track_id, {"stems_ready": bool(ready)})
+        self.version += 1
+
+    def _apply_meta(self, track_id: str):
+        t = self._index_by_id.get(str(track_id))
+        if t is None:
+            return
+        meta = self.meta.get(track_id)
+        t.bpm = meta.get("bpm")
+        t.camelot = meta.get("camelot")
+        t.musical_key = meta.get("key")
+        t.chroma = _chroma_tuple(meta.get("chroma"))
+        engine = self._query
+        if engine is not None:
+            engine.update_track(t)
+        self.version += 1
+
+    def recommend(self, track_id: str, n: int = RECOMMEND_COUNT, bpm_tolerance: float = RECOMMEND_BPM_TOLERANCE) -> List[TrackInfo]:
+        """Tracks that mix well after `track_id`, best first (see LibraryQuery.recommend)."""
+        ref = self.get_track(track_id)
+        engine = self._query
+        if ref is None or engine is None:
+            return []
+        # During a scan the last complete index is still valid for ranking.
+        return [engine.tracks[i] for i in engine.recommend(ref, n=n, bpm_tolerance=bpm_tolerance)]
 
     def _stems_exist(self, track_id: str) -> bool:
-        d = self.stems_dir(track_id)
-        required = ["drums.wav", "bass.wav", "other.wav", "vocals.wav"]
-        return all((d / r).exists() for r in required)
+        return stems_complete(self.stems_dir(track_id))
 
-    def enqueue_analysis(self, track_id: str, path: Path):
-        with self._analysis_lock:
+    def enqueue_analysis(
+        self, track_id: str, path: Path, priority: int = ANALYSIS_PRIORITY_BACKGROUND, chroma_only: bool = False
+    ):
+        with self._analysis_cv:
             if track_id in self._analysis_inflight:
                 return
-            self._analysis_inflight.add(track_id)
-            self._analysis_queue.append((track_id, path))
+            priority = int(priority)
+            cur = self._analysis_pending.get(track_id)
+            if cur is not None:
+                # A queued full analysis already covers chroma.
+                chroma_only = chroma_only and cur[2]
+                priority = min(priority, cur[0])
+                if (priority, chroma_only) == (cur[0], cur[2]):
+                    return
+            self._analysis_pending[track_id] = (priority, path, chroma_only)
+            heapq.heappush(self._analysis_heap, (priority, next(self._analysis_seq), track_id, path, chroma_only))
+            self._analysis_cv.notify_all()
+
+    def prioritize_analysis(self, track_ids: Sequence[str], priority: int):
+        """Move already queued tracks (e.g. the ones on screen) ahead of the backlog."""
+        with self._analysis_cv:
+            for tid in track_ids:
+                cur = self._analysis_pending.get(tid)
+                if cur is not None and cur[0] > priority:
+                    self.enqueue_analysis(tid, cur[1], priority, chroma_only=cur[2])
+
+    def analysis_progress(self) -> Tuple[int, int]:
+        """(done, total) for the current analysis run; (0, 0) when idle."""
+        with self._analysis_cv:
+            left = len(self._analysis_pending) + len(self._analysis_inflight)
+            if left == 0:
+                return 0, 0
+            return self._analysis_done, self._analysis_done + left
+
+    def _analysis_pool(self):
+        if self._analysis_executor is None:
+            try:
+                # Separate processes: numpy/scipy analysis would otherwise hold the UI's GIL.
+                self._analysis_executor = ProcessPoolExecutor(
+                    max_workers=self.analysis_workers, mp_context=mp.get_context("spawn")
+                )
+            except Exception as e:
+                print(f"Library: analysis processes unavailable ({e}), using threads")
+                self._analysis_executor = ThreadPoolExecutor(max_workers=self.analysis_workers)
+            atexit.register(self._analysis_executor.shutdown, wait=False, cancel_futures=True)
+        return self._analysis_executor
 
-    def _analysis_worker(self):
+    def _analysis_dispatch(self):
         while True:
-            item = None
-            with self._analysis_lock:
-                if self._analysis_queue:
-                    item = self._analysis_queue.pop(0)
-            if item is None:
-                time.sleep(0.1)
-                continue
-
-            track_id, path = item
+            with self._analysis_cv:
+                # One job per worker; the rest stays in the heap where
+                # priorities can still change.
+                while not self._analysis_heap or len(self._analysis_inflight) >= self.analysis_workers:
+                    self._analysis_cv.wait()
+                prio, _, tid, path, chroma_only = heapq.heappop(self._analysis_heap)
+                cur = self._analysis_pending.get(tid)
+                if cur is None or cur[0] != prio or cur[2] != chroma_only:
+                    continue
+                del self._analysis_pending[tid]
+                self._analysis_inflight.add(tid)
             try:
-                updates = self._analyze_track(path)
-
+                fut = self._analysis_pool().submit(analyze_chroma if chroma_only else analyze_file, str(path))
+            except Exception as e:
+                print(f"Library: analysis submit failed: {e}")
+                fut = Future()
+                fut.set_exception(e)
+            fut.add_done_callback(lambda f, tid=tid, c=chroma_only: self._analysis_finished(tid, f, c))
+
+    def _analysis_finished(self, track_id: str, fut: Future, chroma_only: bool = False):
+        error = None
+        try:
+            updates = fut.result()
+        except BrokenExecutor:
+            # The worker died, not necessarily because of this file; start a
+            # fresh pool and leave the track for the next scan.
+            updates = None
+            self._analysis_executor = None
+        except OSError:
+            # Missing decoder or unreadable path: not a property of the file's contents.
+            updates = None
+        except Exception as e:
+            updates = None
+            error = str(e) or type(e).__name__
+        if chroma_only:
+            if updates is not None and updates.get("chroma") is None:
+                error = "no chroma detected"
+        elif updates and updates.get("bpm") is None and updates.get("key") is None:
+            error = "no tempo or key detected"
+        try:
+            if chroma_only:
+                if error is not None:
+                    self.update_meta(track_id, {"chroma_error": error})
+                elif updates:
+                    self.update_meta(track_id, updates)
+            elif error is not None:
+                # Recorded so the next scan doesn't queue the same file again.
+                self.update_meta(track_id, {"analysis_version": ANALYSIS_VERSION, "analysis_error": error})
+            elif updates:
                 # Policy: analysis overrides filename bpm if disagreement.
-                meta = self._read_meta(track_id) or {}
+                meta = self.meta.get(track_id)
+                if meta.get("analysis_error") is not None:
+                    updates["analysis_error"] = None
                 filename_bpm = meta.get("filename_bpm")
                 analyzed_bpm = updates.get("bpm")
                 if analyzed_bpm is not None and filename_bpm is not None:
@@ -283,12 +557,19 @@ class TrackLibrary:
                         updates["bpm"] = float(analyzed_bpm)
                         updates["bpm_source"] = "analyzed"
 
+                # Metadata writes are batched by the index (see MetadataIndex.flush).
                 self.update_meta(track_id, updates)
-            except Exception:
-                pass
-            finally:
-                with self._analysis_lock:
-                    self._analysis_inflight.discard(track_id)
+        except Exception:
+            pass
+        with self._analysis_cv:
+            self._analysis_inflight.discard(track_id)
+            self._analysis_done += 1
+            idle = not self._analysis_pending and not self._analysis_inflight
+            if idle:
+                self._analysis_done = 0
+            self._analysis_cv.notify_all()
+        if idle:
+            self.meta.flush()
 
     def _parse_bpm_from_filename(self, filename: str) -> Optional[float]:
         # Common forms: "128bpm", "128 bpm", "[128]", "(128)"
@@ -312,168 +593,3 @@ class TrackLibrary:
             except Exception:
                 return None
         return None
-
-    def _analyze_track(self, path: Path) -> Dict:
-        # Decode up to ~60s of audio for analysis.
-        data, sr = sf.read(str(path), dtype="float32", always_2d=True)
-        if data.shape[1] == 1:
-            mono = data[:, 0]
-        else:
-            mono = data.mean(axis=1)
-
-        max_sec = 60.0
-        max_n = int(sr * max_sec)
-        if mono.shape[0] > max_n:
-            mono = mono[:max_n]
-
-        # Downsample to reduce CPU.
-        target_sr = 11025
-        if sr != target_sr:
-            g = int(np.gcd(sr, target_sr))
-            up = target_sr // g
-            down = sr // g
-            mono = signal.resample_poly(mono, up, down).astype(np.float32)
-            sr = target_sr
-
-        bpm = self._estimate_bpm(mono, sr)
-        key_name, camelot = self._estimate_key_and_camelot(mono, sr)
-
-        out: Dict[str, object] = {}
-        if bpm is not None:
-            out["bpm"] = float(bpm)
-            out["bpm_source"] = "analyzed"
-        if key_name is not None:
-            out["key"] = key_name
-        if camelot is not None:
-            out["camelot"] = camelot
-        return out
-
-    def _estimate_bpm(self, mono: np.ndarray, sr: int) -> Optional[float]:
-        # Simple onset-strength autocorrelation tempo estimate.
-        if mono.size < sr:
-            return None
-
-        # Envelope from absolute derivative.
-        x = np.diff(mono)
-        env = np.abs(x)
-        win = int(0.02 * sr)
-        win = max(8, win)
-        env = signal.lfilter(np.ones(win) / win, [1.0], env)
-
-        hop = int(0.01 * sr)
-        hop = max(1, hop)
-        env = env[::hop]
-
-        env = env - np.mean(env)
-        denom = np.std(env) + 1e-8
-        env = env / denom
-
-        # Autocorrelation over reasonable BPM range.
-        min_bpm, max_bpm = 70.0, 180.0
-        min_lag = int((60.0 / max_bpm) * (sr / hop))
-        max_lag = int((60.0 / min_bpm) * (sr / hop))
-        if max_lag <= min_lag + 2:
-            return None
-
-        ac = signal.correlate(env, env, mode="full")
-        ac = ac[ac.size // 2 :]
-
-        window = ac[min_lag:max_lag]
-        if window.size == 0:
-            return None
-        lag = int(np.argmax(window)) + min_lag
-        bpm = 60.0 / (lag * (hop / sr))
-
-        # Normalize to preferred range by doubling/halving.
-        while bpm < min_bpm:
-            bpm *= 2.0
-        while bpm > max_bpm:
-            bpm /= 2.0
-        return float(bpm)
-
-    def _estimate_key_and_camelot(self, mono: np.ndarray, sr: int) -> Tuple[Optional[str], Optional[str]]:
-        # Rough chroma-based key detection.
-        if mono.size < sr:
-            return None, None
-
-        n_fft = 4096
-        hop = 1024
-        _, _, Zxx = signal.stft(mono, fs=sr, nperseg=n_fft, noverlap=n_fft - hop, window="hann")
-        mag = np.abs(Zxx)
-
-        freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
-        valid = (freqs >= 40.0) & (freqs <= 5000.0)
-        freqs = freqs[valid]
-        mag = mag[valid, :]
-
-        # Map each frequency bin to a pitch class.
-        midi = 69.0 + 12.0 * np.log2(freqs / 440.0)
-        pc = (np.round(midi).astype(int)) % 12
-
-        chroma = np.zeros(12, dtype=np.float64)
-        for i in range(mag.shape[0]):
-            chroma[pc[i]] += float(np.mean(mag[i, :]))
-
-        if np.allclose(chroma.sum(), 0.0):
-            return None, None
-        chroma = chroma / (chroma.sum() + 1e-9)
-
-        # Krumhansl-Schmuckler profiles.
-        major = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-        minor = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
-        major = major / major.sum()
-        minor = minor / minor.sum()
-
-        best = (None, None, -1.0)
-        for root in range(12):
-            maj_prof = np.roll(major, root)
-            min_prof = np.roll(minor, root)
-            maj_score = float(np.dot(chroma, maj_prof))
-            min_score = float(np.dot(chroma, min_prof))
-            if maj_score > best[2]:
-                best = (root, "major", maj_score)
-            if min_score > best[2]:
-                best = (root, "minor", min_score)
-
-        root, mode, _ = best
-        if root is None:
-            return None, None
-        names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-        key_name = f"{names[int(root)]} {'maj' if mode == 'major' else 'min'}"
-        camelot = self._camelot_for_key(int(root), mode)
-        return key_name, camelot
-
-    def _camelot_for_key(self, root_pc: int, mode: str) -> Optional[str]:
-        # Camelot wheel mapping by circle-of-fifths position.
-        # This uses the standard mapping where 8B=C major and 5A=C minor.
-        camelot_major = {
-            0: "8B",
-            7: "9B",
-            2: "10B",
-            9: "11B",
-            4: "12B",
-            11: "1B",
-            6: "2B",
-            1: "3B",
-            8: "4B",
-            3: "5B",
-            10: "6B",
-            5: "7B",
-        }
-        camelot_minor = {
-            0: "5A",
-            7: "6A",
-            2: "7A",
-            9: "8A",
-            4: "9A",
-            11: "10A",
-            6: "11A",
-            1: "12A",
-            8: "1A",
-            3: "2A",
-            10: "3A",
-            5: "4A",
-        }
-        if mode == "major":
-            return camelot_major.get(root_pc)
-        return camelot_minor.get(root_pc)
@@ -0,0 +1,511 @@
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+# Token lookups kept per index; cleared when the index is rebuilt.
+TERM_CACHE_SIZE = 4096
+
+# Vocabulary tokens are indexed by every character n-gram up to this length;
+# longer terms are narrowed with their n-grams and then checked directly.
+GRAM_MAX = 3
+
+RECOMMEND_COUNT = 10
+# BPM distance (fraction) still counted as mixable, including half/double time.
+RECOMMEND_BPM_TOLERANCE = 0.06
+# Tempo multiples treated as the same groove (half/double time).
+BPM_MULTIPLES = (1.0, 2.0, 0.5)
+
+# Harmonic score for Camelot neighbours of the reference key.
+CAMELOT_SAME = 1.0
+CAMELOT_ADJACENT = 0.8
+CAMELOT_RELATIVE = 0.7
+
+
+def camelot_neighbors(code: str) -> List[Tuple[str, float]]:
+    """Compatible Camelot codes with a weight: same key, +/-1 on the wheel, relative major/minor."""
+    try:
+        num, letter = int(code[:-1]), code[-1].upper()
+    except Exception:
+        return []
+    if not (1 <= num <= 12) or letter not in ("A", "B"):
+        return []
+    other = "B" if letter == "A" else "A"
+    return [
+        (f"{num}{letter}", CAMELOT_SAME),
+        (f"{num % 12 + 1}{letter}", CAMELOT_ADJACENT),
+        (f"{(num - 2) % 12 + 1}{letter}", CAMELOT_ADJACENT),
+        (f"{num}{other}", CAMELOT_RELATIVE),
+    ]
+
+
+def camelot_compatible(code: Optional[str], ref: Optional[str]) -> bool:
+    if not code or not ref:
+        return False
+    c = str(code).upper()
+    return any(n == c for n, _ in camelot_neighbors(str(ref)))
+
+
+def bpm_deviation(bpm, ref: float):
+    """Relative distance of `bpm` (scalar or array; NaN = unknown) to `ref` or its half/double."""
+    bpm = np.asarray(bpm, dtype=np.float64)
+    dev = np.full(bpm.shape, np.inf)
+    with np.errstate(invalid="ignore"):
+        for mult in BPM_MULTIPLES:
+            target = float(ref) * mult
+            dev = np.fmin(dev, np.abs(bpm - target) / target)
+    return dev
+
+
+def bpm_compatible(bpm: Optional[float], ref: Optional[float], tolerance: float = RECOMMEND_BPM_TOLERANCE) -> bool:
+    # Scalar form of bpm_deviation(bpm, ref) <= tolerance (called per track).
+    try:
+        b, r = float(bpm or 0.0), float(ref or 0.0)
+    except Exception:
+        return False
+    if b <= 0.0 or r <= 0.0:
+        return False
+    return any(abs(b - r * m) <= r * m * tolerance for m in BPM_MULTIPLES)
+
+
+@dataclass(frozen=True)
+class Query:
+    terms: Tuple[str, ...] = ()
+    bpm_min: Optional[float] = None
+    bpm_max: Optional[float] = None
+    # "bpm:120-130~" also accepts half and double time.
+    bpm_multiples: bool = False
+    camelot: Optional[str] = None
+    key: Optional[str] = None
+
+    def facets(self):
+        return (self.bpm_min, self.bpm_max, self.bpm_multiples, self.camelot, self.key)
+
+    def refines(self, other: "Query") -> bool:
+        """True if every result of self is also a result of `other`."""
+        if self.facets() != other.facets():
+            return False
+        return all(any(o in t for t in self.terms) for o in other.terms)
+
+    def matches(self, t) -> bool:
+        """Linear check of one track; used while no index covers the list."""
+        hay = f"{t.name.lower()} {str(t.path).lower()}"
+        if any(term not in hay for term in self.terms):
+            return False
+
+        if self.bpm_min is not None or self.bpm_max is not None:
+            if t.bpm is None:
+                return False
+            try:
+                b = float(t.bpm)
+            except Exception:
+                return False
+            ok = False
+            for mult in (BPM_MULTIPLES if self.bpm_multiples else (1.0,)):
+                if (self.bpm_min is None or b >= self.bpm_min * mult) and (self.bpm_max is None or b <= self.bpm_max * mult):
+                    ok = True
+            if not ok:
+                return False
+
+        if self.camelot:
+            if not t.camelot or str(t.camelot).upper() != self.camelot:
+                return False
+
+        if self.key:
+            if t.camelot and str(t.camelot).upper() == self.key:
+                return True
+            if not t.musical_key or self.key not in str(t.musical_key).upper().replace(" ", ""):
+                return False
+
+        return True
+
+
+def parse_query(text: str) -> Query:
+    terms: List[str] = []
+    bpm_min = None
+    bpm_max = None
+    multiples = False
+    camelot = None
+    key = None
+
+    for raw in text.split():
+        token = raw.strip()
+        low = token.lower()
+
+        if low.startswith("bpm:"):
+            spec = low.split(":", 1)[1]
+            if spec.endswith("~"):
+                multiples = True
+                spec = spec[:-1]
+            if "-" in spec:
+                a, b = spec.split("-", 1)
+                try:
+                    bpm_min = float(a)
+                    bpm_max = float(b)
+                except Exception:
+                    pass
+            else:
+                try:
+                    v = float(spec)
+                    bpm_min = v
+                    bpm_max = v
+                except Exception:
+                    pass
+            continue
+
+        if low.startswith("camelot:"):
+            camelot = token.split(":", 1)[1].strip().upper()
+            continue
+
+        if low.startswith("key:"):
+            key = token.split(":", 1)[1].strip().upper()
+            continue
+
+        terms.append(low)
+
+    return Query(tuple(terms), bpm_min, bpm_max, multiples, camelot, key)
+
+
+class TextIndex:
+    """Inverted index from word tokens of track names/paths to track positions.
+
+    A search term matches a track when it is a substring of its name or path.
+    For a term made of word characters that substring lies inside one token,
+    so matching tracks are the postings of every vocabulary token containing
+    the term. Those tokens are found through a character n-gram index over
+    the vocabulary; results are cached and, while typing, narrowed from the
+    previous keystroke's set.
+    """
+
+    def __init__(self, haystacks: Sequence[str]):
+        self.haystacks = list(haystacks)
+        postings: Dict[str, List[int]] = {}
+        for i, hay in enumerate(self.haystacks):
+            for tok in set(_WORD.findall(hay)):
+                postings.setdefault(tok, []).append(i)
+        self.vocab: List[str] = sorted(postings)
+        counts = np.fromiter((len(postings[t]) for t in self.vocab), dtype=np.int64, count=len(self.vocab))
+        self._ptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._ptr[1:])
+        self._ids = np.fromiter(
+            (i for t in self.vocab for i in postings[t]), dtype=np.int32, count=int(self._ptr[-1])
+        )
+
+        grams: Dict[str, List[int]] = {}
+        for ti, tok in enumerate(self.vocab):
+            seen = set()
+            for k in range(1, GRAM_MAX + 1):
+                for j in range(len(tok) - k + 1):
+                    seen.add(tok[j : j + k])
+            for g in seen:
+                grams.setdefault(g, []).append(ti)
+        self._grams: Dict[str, np.ndarray] = {g: np.asarray(ts, dtype=np.int64) for g, ts in grams.items()}
+        self._term_tokens: Dict[str, np.ndarray] = {}
+        # Single characters (the first keystroke) match most of the library;
+        # their track masks are computed up front.
+        self._char_masks: Dict[str, np.ndarray] = {}
+        for g, toks in self._grams.items():
+            if len(g) == 1:
+                mask = np.zeros(len(self.haystacks), dtype=bool)
+                mask[self._postings(toks)] = True
+                self._char_masks[g] = mask
+
+    def _postings(self, toks: np.ndarray) -> np.ndarray:
+        # Concatenate the postings of all given tokens in one gather.
+        starts = self._ptr[toks]
+        lens = self._ptr[toks + 1] - starts
+        total = int(lens.sum())
+        offs = np.repeat(starts - np.concatenate(([0], np.cumsum(lens)[:-1])), lens)
+        return self._ids[offs + np.arange(total)]
+
+    def _tokens_containing(self, term: str) -> np.ndarray:
+        hit = self._term_tokens.get(term)
+        if hit is not None:
+            return hit
+        empty = np.zeros(0, dtype=np.int64)
+        if len(term) <= GRAM_MAX:
+            out = self._grams.get(term, empty)
+        else:
+            cands = None
+            for n in range(len(term) - 1, GRAM_MAX, -1):
+                cands = self._term_tokens.get(term[:n])
+                if cands is not None:
+                    break
+            if cands is None:
+                # Intersect the two rarest n-grams of the term, then verify.
+                lists = sorted(
+                    (self._grams.get(term[j : j + GRAM_MAX], empty) for j in range(len(term) - GRAM_MAX + 1)), key=len
+                )
+                cands = lists[0] if len(lists) == 1 else np.intersect1d(lists[0], lists[1], assume_unique=True)
+            vocab = self.vocab
+            out = np.array([i for i in cands if term in vocab[i]], dtype=np.int64)
+        if len(self._term_tokens) >= TERM_CACHE_SIZE:
+            self._term_tokens.clear()
+        self._term_tokens[term] = out
+        return out
+
+    def match(self, term: str, within: np.ndarray) -> np.ndarray:
+        """`within` narrowed to tracks whose name or path contains `term`."""
+        if _WORD.fullmatch(term) is None:
+            # Spans punctuation or separators: check the remaining strings themselves.
+            return self._scan(term, within)
+        chars = self._char_masks.get(term)
+        if chars is not None:
+            return chars & within
+        mask = np.zeros(within.shape[0], dtype=bool)
+        toks = self._tokens_containing(term)
+        if toks.size == 0:
+            return mask
+        total = int((self._ptr[toks + 1] - self._ptr[toks]).sum())
+        if np.count_nonzero(within) * 8 < total:
+            # Few tracks left (narrowed by earlier terms): cheaper to check them directly.
+            return self._scan(term, within)
+        mask[self._postings(toks)] = True
+        return mask & within
+
+    def _scan(self, term: str, within: np.ndarray) -> np.ndarray:
+        mask = np.zeros(within.shape[0], dtype=bool)
+        for i in np.flatnonzero(within):
+            if term in self.haystacks[i]:
+                mask[i] = True
+        return mask
+
+
+def _facet_norm(v, is_key: bool) -> Optional[str]:
+    if not v:
+        return None
+    return str(v).upper().replace(" ", "") if is_key else str(v).upper()
+
+
+class FacetIndex:
+    """Sorted BPM array plus Camelot and key lookups over track positions.
+
+    Also holds per-track BPM and unit-length chroma vectors for ranking.
+    """
+
+    def __init__(
+        self,
+        bpms: Sequence[Optional[float]],
+        camelots: Sequence[Optional[str]],
+        keys: Sequence[Optional[str]],
+        chromas: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    ):
+        n = len(bpms)
+        self.n = n
+        bpm = np.array([float(b) if b is not None else np.nan for b in bpms], dtype=np.float64)
+        self.bpm = bpm
+        self.chroma = np.zeros((n, 12), dtype=np.float32)
+        for i, c in enumerate(chromas or ()):
+            if c is not None:
+                self.chroma[i] = c
+        norms = np.linalg.norm(self.chroma, axis=1, keepdims=True)
+        np.divide(self.chroma, norms, out=self.chroma, where=norms > 0)
+        known = np.flatnonzero(~np.isnan(bpm))
+        order = np.argsort(bpm[known], kind="stable")
+        self.bpm_sorted = bpm[known][order]
+        self.bpm_pos = known[order]
+
+        self.camelot: Dict[str, np.ndarray] = {}
+        self.keys: Dict[str, np.ndarray] = {}
+        # Normalized Camelot code / key name per position, for in-place updates.
+        self._camelot_of: List[Optional[str]] = [None] * n
+        self._key_of: List[Optional[str]] = [None] * n
+        for table, of, values in ((self.camelot, self._camelot_of, camelots), (self.keys, self._key_of, keys)):
+            groups: Dict[str, List[int]] = {}
+            for i, v in enumerate(values):
+                norm = _facet_norm(v, table is self.keys)
+                if norm:
+                    of[i] = norm
+                    groups.setdefault(norm, []).append(i)
+            for k, idx in groups.items():
+                table[k] = np.asarray(idx, dtype=np.int64)
+
+    def set_track(self, i: int, bpm, camelot, key, chroma=None):
+        """Replace the facets of position `i` in place (analysis results)."""
+        old = self.bpm[i]
+        new = float(bpm) if bpm is not None else np.nan
+        if not (old == new or (np.isnan(old) and np.isnan(new))):
+            srt, pos = self.bpm_sorted, self.bpm_pos
+            if not np.isnan(old):
+                a = np.searchsorted(srt, old, side="left")
+                b = np.searchsorted(srt, old, side="right")
+                j = a + int(np.flatnonzero(pos[a:b] == i)[0])
+                srt, pos = np.delete(srt, j), np.delete(pos, j)
+            if not np.isnan(new):
+                j = np.searchsorted(srt, new, side="right")
+                srt, pos = np.insert(srt, j, new), np.insert(pos, j, i)
+            self.bpm[i] = new
+            self.bpm_sorted, self.bpm_pos = srt, pos
+
+        for table, of, v in ((self.camelot, self._camelot_of, camelot), (self.keys, self._key_of, key)):
+            norm = _facet_norm(v, table is self.keys)
+            prev = of[i]
+            if norm == prev:
+                continue
+            if prev is not None:
+                idx = table[prev]
+                idx = np.delete(idx, np.searchsorted(idx, i))
+                if idx.size:
+                    table[prev] = idx
+                else:
+                    del table[prev]
+            if norm is not None:
+                idx = table.get(norm, np.zeros(0, dtype=np.int64))
+                table[norm] = np.insert(idx, np.searchsorted(idx, i), i)
+            of[i] = norm
+
+        row = np.zeros(12, dtype=np.float32)
+        if chroma is not None:
+            row[:] = chroma
+            norm = float(np.linalg.norm(row))
+            if norm > 0:
+                row /= norm
+        self.chroma[i] = row
+
+    def bpm_mask(self, lo: Optional[float], hi: Optional[float], multiples: bool) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        lo = -np.inf if lo is None else float(lo)
+        hi = np.inf if hi is None else float(hi)
+        for mult in (BPM_MULTIPLES if multiples else (1.0,)):
+            a = np.searchsorted(self.bpm_sorted, lo * mult, side="left")
+            b = np.searchsorted(self.bpm_sorted, hi * mult, side="right")
+            mask[self.bpm_pos[a:b]] = True
+        return mask
+
+    def camelot_mask(self, camelot: str) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        idx = self.camelot.get(camelot)
+        if idx is not None:
+            mask[idx] = True
+        return mask
+
+    def key_mask(self, key: str) -> np.ndarray:
+        # A key filter matches the Camelot code exactly or the key name by substring.
+        mask = self.camelot_mask(key)
+        for name, idx in self.keys.items():
+            if key in name:
+                mask[idx] = True
+        return mask
+
+
+class LibraryQuery:
+    """Answers filter queries over one published track list.
+
+    Both indexes are built once per list, by the scan that publishes it.
+    Analysis results are folded into the facet index in place through
+    `update_track`. A query that narrows the previous one is only evaluated
+    over the previous result.
+    """
+
+    def __init__(self, tracks: list):
+        self.tracks = tracks
+        self.text = TextIndex([f"{t.name.lower()} {str(t.path).lower()}" for t in tracks])
+        self.pos_by_id: Dict[str, int] = {t.track_id: i for i, t in enumerate(tracks)}
+        self.facets = FacetIndex(
+            [t.bpm for t in tracks], [t.camelot for t in tracks], [t.musical_key for t in tracks], [t.chroma for t in tracks]
+        )
+        # Facet updates (analysis callbacks) vs. queries (UI thread).
+        self._lock = threading.Lock()
+        self._last: Optional[Tuple[Query, int, np.ndarray]] = None
+
+    def update_track(self, t) -> bool:
+        """Fold `t`'s current BPM/key/chroma into the facet index; False if not indexed."""
+        i = self.pos_by_id.get(t.track_id)
+        if i is None:
+            return False
+        with self._lock:
+            self.facets.set_track(i, t.bpm, t.camelot, t.musical_key, t.chroma)
+        return True
+
+    def run(self, q: Query, version: int) -> np.ndarray:
+        """Positions (ascending) of the tracks matching `q`; `version` is the library's."""
+        n = len(self.tracks)
+        # Metadata changes only matter to facet filters.
+        uses_facets = any(v not in (None, False) for v in q.facets())
+        last = self._last
+        if last is not None and last[1] != version and uses_facets:
+            last = None
+        if last is not None and last[0] == q:
+            return last[2]
+        if last is not None and q.refines(last[0]):
+            mask = np.zeros(n, dtype=bool)
+            mask[last[2]] = True
+        else:
+            mask = np.ones(n, dtype=bool)
+
+        if uses_facets:
+            f = self.facets
+            with self._lock:
+                if q.bpm_min is not None or q.bpm_max is not None:
+                    mask &= f.bpm_mask(q.bpm_min, q.bpm_max, q.bpm_multiples)
+                if q.camelot:
+                    mask &= f.camelot_mask(q.camelot)
+                if q.key:
+                    mask &= f.key_mask(q.key)
+        for term in q.terms:
+            if not mask.any():
+                break
+            mask = self.text.match(term, mask)
+
+        out = np.flatnonzero(mask)
+        self._last = (q, version, out)
+        return out
+
+    def recommend(self, ref, n: int = RECOMMEND_COUNT, bpm_tolerance: float = RECOMMEND_BPM_TOLERANCE) -> np.ndarray:
+        """Positions of the best `n` tracks to mix after `ref`, best first.
+
+        Candidates must be Camelot neighbours of `ref` and within
+        `bpm_tolerance` of its BPM (or half/double), when `ref` has those.
+        They are ranked by harmonic closeness + BPM closeness + chroma
+        cosine similarity, all computed over the facet index.
+        """
+        with self._lock:
+            return self._recommend(ref, n, bpm_tolerance)
+
+    def _recommend(self, ref, n: int, bpm_tolerance: float) -> np.ndarray:
+        f = self.facets
+        if f.n == 0:
+            return np.zeros(0, dtype=np.int64)
+        ok = np.ones(f.n, dtype=bool)
+        own = self.pos_by_id.get(ref.track_id)
+        if own is not None:
+            ok[own] = False
+        score = np.zeros(f.n, dtype=np.float64)
+        constrained = False
+
+        if ref.camelot:
+            harm = np.zeros(f.n, dtype=np.float64)
+            for code, w in camelot_neighbors(str(ref.camelot)):
+                idx = f.camelot.get(code)
+                if idx is not None:
+                    harm[idx] = np.maximum(harm[idx], w)
+            ok &= harm > 0
+            score += harm
+            constrained = True
+
+        if ref.bpm:
+            tol = max(1e-6, float(bpm_tolerance))
+            dev = bpm_deviation(f.bpm, float(ref.bpm))
+            ok &= dev <= tol
+            score += np.where(dev <= tol, 1.0 - dev / tol, 0.0)
+            constrained = True
+
+        if ref.chroma is not None:
+            v = np.asarray(ref.chroma, dtype=np.float32)
+            norm = float(np.linalg.norm(v))
+            if norm > 0:
+                score += f.chroma @ (v / norm)
+                constrained = True
+
+        if not constrained:
+            return np.zeros(0, dtype=np.int64)
+        cand = np.flatnonzero(ok)
+        if cand.size > n:
+            cand = cand[np.argpartition(-score[cand], n - 1)[:n]]
+        return cand[np.argsort(-score[cand], kind="stable")]
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+INDEX_NAME = "library.sqlite3"
+META_JSON_NAME = "meta.json"
+
+# PRAGMA user_version; bump when the schema changes.
+SCHEMA_VERSION = 1
+
+# Pending updates are written in one transaction once this many are queued
+# or this long after the first one, whichever comes first.
+FLUSH_BATCH = 64
+FLUSH_INTERVAL_S = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_meta (
+    track_id TEXT PRIMARY KEY,
+    bpm REAL,
+    musical_key TEXT,
+    camelot TEXT,
+    stems_ready INTEGER,
+    source_url TEXT,
+    analysis_version INTEGER,
+    meta TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS track_meta_bpm ON track_meta (bpm);
+CREATE INDEX IF NOT EXISTS track_meta_camelot ON track_meta (camelot);
+CREATE TABLE IF NOT EXISTS scan_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    track_id TEXT NOT NULL
+);
+"""
+
+
+def _row(track_id: str, meta: Dict, now: float):
+    def num(v):
+        try:
+            return float(v) if v is not None else None
+        except Exception:
+            return None
+
+    def intval(v):
+        try:
+            return int(v) if v is not None else None
+        except Exception:
+            return None
+
+    stems = meta.get("stems_ready")
+    return (
+        track_id,
+        num(meta.get("bpm")),
+        meta.get("key"),
+        meta.get("camelot"),
+        None if stems is None else int(bool(stems)),
+        meta.get("source_url"),
+        intval(meta.get("analysis_version")),
+        json.dumps(meta),
+        now,
+    )
+
+
+class MetadataIndex:
+    """Per-track metadata (BPM, key, stems state, source, ...) in one SQLite file.
+
+    The whole table is held in memory, so reads never touch the disk; writes
+    are queued and committed in batches. The promoted columns (bpm, camelot,
+    ...) are indexed for queries; `meta` holds the full JSON dict.
+
+    Several processes (UI, ingest) may open the same file; each sees the
+    others' writes after `reload()`.
+    """
+
+    def __init__(self, cache_root: Path):
+        self.path = Path(cache_root) / INDEX_NAME
+        self._lock = threading.RLock()
+        self._meta: Dict[str, Dict] = {}
+        # track_id -> (replace whole dict?, fields to write)
+        self._pending: Dict[str, Tuple[bool, Dict]] = {}
+        # Flushes whatever is pending FLUSH_INTERVAL_S after the first queued update.
+        self._timer: threading.Timer | None = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly in flush().
+        self._db = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False, isolation_level=None)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        self._db.executescript(_SCHEMA)
+        version = int(self._db.execute("PRAGMA user_version").fetchone()[0])
+        if version < SCHEMA_VERSION:
+            self._migrate_json(Path(cache_root) / "tracks")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.reload()
+
+    def _migrate_json(self, tracks_dir: Path):
+        # One-time import of the per-track meta.json files this index replaces.
+        rows = []
+        now = time.time()
+        try:
+            dirs = list(tracks_dir.iterdir())
+        except Exception:
+            dirs = []
+        for d in dirs:
+            try:
+                meta = json.loads((d / META_JSON_NAME).read_text())
+            except Exception:
+                continue
+            if isinstance(meta, dict):
+                if meta.get("analysis_version") is None and all(meta.get(k) is not None for k in ("bpm", "key", "camelot")):
+                    # Analyzed by the estimator that predates version stamps.
+                    meta["analysis_version"] = 1
+                rows.append(_row(d.name, meta, now))
+        if rows:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany("INSERT OR IGNORE INTO track_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            print(f"Library: migrated {len(rows)} meta.json files into {self.path.name}")
+
+    def reload(self):
+        """Re-read the table, keeping local updates that are not flushed yet."""
+        with self._lock:
+            fresh: Dict[str, Dict] = {}
+            for tid, raw in self._db.execute("SELECT track_id, meta FROM track_meta"):
+                try:
+                    fresh[tid] = json.loads(raw)
+                except Exception:
+                    fresh[tid] = {}
+            for tid in self._pending:
+                if tid in self._meta:
+                    fresh[tid] = self._meta[tid]
+            self._meta = fresh
+
+    def get(self, track_id: str) -> Dict:
+        with self._lock:
+            return dict(self._meta.get(str(track_id), {}))
+
+    def put(self, track_id: str, meta: Dict):
+        with self._lock:
+            tid = str(track_id)
+            self._meta[tid] = dict(meta)
+            self._queue(tid, dict(meta), replace=True)
+
+    def update(self, track_id: str, updates: Dict):
+        with self._lock:
+            tid = str(track_id)
+            meta = dict(self._meta.get(tid, {}))
+            meta.update(updates)
+            self._meta[tid] = meta
+            self._queue(tid, dict(updates), replace=False)
+
+    def _queue(self, track_id: str, updates: Dict, replace: bool):
+        if self._timer is None:
+            self._timer = threading.Timer(FLUSH_INTERVAL_S, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        prev = self._pending.get(track_id)
+        if prev is not None and not replace:
+            prev[1].update(updates)
+        else:
+            self._pending[track_id] = (replace, updates)
+        if len(self._pending) >= FLUSH_BATCH:
+            self.flush()
+
+    def flush(self):
+        """Commit queued updates in a single transaction.
+
+        Updates are merged into the row as stored, so fields written by
+        another process since our last reload are kept.
+        """
+        with self._lock:
+            timer = self._timer
+            self._timer = None
+            if timer is not None and timer is not threading.current_thread():
+                timer.cancel()
+            if not self._pending:
+                return
+            now = time.time()
+            try:
+                with self._db:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    rows = []
+                    for tid, (replace, updates) in self._pending.items():
+                        meta: Dict = {}
+                        if not replace:
+                            r = self._db.execute("SELECT meta FROM track_meta WHERE track_id = ?", (tid,)).fetchone()
+                            if r is not None:
+                                try:
+                                    meta = json.loads(r[0])
+                                except Exception:
+                                    meta = {}
+                        meta.update(updates)
+                        self._meta[tid] = meta
+                        rows.append(_row(tid, meta, now))
+                    self._db.executemany("INSERT OR REPLACE INTO track_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._pending.clear()
+            except Exception as e:
+                print(f"Library: metadata write failed: {e}")
+
+    def scanned_files(self) -> Dict[str, Tuple[int, int, str]]:
+        """path -> (size, mtime, track_id) as of the last library scan."""
+        with self._lock:
+            return {p: (int(sz), int(mt), tid) for p, sz, mt, tid in self._db.execute("SELECT path, size, mtime, track_id FROM scan_files")}
+
+    def record_files(self, rows: List[Tuple[str, int, int, str]], removed: List[str]):
+        with self._lock:
+            if not rows and not removed:
+                return
+            try:
+                with self._db:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    self._db.executemany("INSERT OR REPLACE INTO scan_files VALUES (?, ?, ?, ?)", rows)
+                    self._db.executemany("DELETE FROM scan_files WHERE path = ?", [(p,) for p in removed])
+            except Exception as e:
+                print(f"Library: scan index write failed: {e}")
+
+    def close(self):
+        self.flush()
+        try:
+            self._db.close()
+        except Exception:
+            pass
+
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from squidbilli.cache_manager import load_policy, scan_cache
+from squidbilli.library import TrackInfo, TrackLibrary
+from squidbilli.library_query import bpm_compatible, camelot_compatible
+from squidbilli.separation_service.process import PRIORITY_PREFETCH
+
+# Only start new prefetch work when the 1-minute load average per core is below
+# this (our own running separation sits around 0.5, see _thread_budget).
+PREFETCH_MAX_LOAD = 0.6
+
+# Stop prefetching once the stems cache reaches this share of its budget, so
+# prefetch never pushes cache maintenance into evicting stems.
+PREFETCH_CACHE_HIGH_WATER = 0.9
+# How often the cache size is re-measured (scan_cache walks every track dir).
+CACHE_CHECK_INTERVAL_S = 60.0
+# Only the best-ranked tracks are prefetched (counting those that already have stems).
+PREFETCH_MAX_TRACKS = 20
+
+# The candidate ranking is rebuilt when the loaded decks change, when it runs
+# out, or at most this often while the library keeps changing (analysis).
+RERANK_INTERVAL_S = 30.0
+
+
+def _system_busy() -> bool:
+    try:
+        load = os.getloadavg()[0]
+    except Exception:
+        return False
+    return load / float(os.cpu_count() or 1) > PREFETCH_MAX_LOAD
+
+
+class PrefetchScheduler:
+    """Separates library tracks in the background while the decks are idle.
+
+    One job at a time, submitted at PRIORITY_PREFETCH so anything a deck asks
+    for runs first. The separation server itself holds prefetch jobs as soon
+    as the audio worker reports playback; this thread just stops feeding it.
+    """
+
+    def __init__(self, library: TrackLibrary, separator, deck_state: Callable[[], Dict]):
+        self.library = library
+        self.separator = separator
+        self.deck_state = deck_state
+        self.enabled = True
+
+        self._job_id: Optional[str] = None
+        self._job_track: Optional[TrackInfo] = None
+        self._failed: set[str] = set()
+        # Ranked candidates, walked with a cursor between re-ranks.
+        self._ranked: List[TrackInfo] = []
+        self._cursor = 0
+        self._rank_key: Optional[Tuple] = None
+        self._ranked_at = 0.0
+        self._cache_full = False
+        self._cache_checked_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.separator is None:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        job_id = self._job_id
+        if job_id is not None and self.separator is not None:
+            try:
+                self.separator.cancel(job_id)
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"Prefetch error: {e}")
+
+    def _tick(self):
+        if self._job_id is not None:
+            st = self.separator.wait(self._job_id, timeout=0.0)
+            if st is None or st.state not in ("done", "error", "cancelled"):
+                return
+            t = self._job_track
+            self._job_id = None
+            self._job_track = None
+            # New stems on disk: measure again before the next job.
+            self._cache_checked_at = None
+            if t is not None:
+                if st.state == "done":
+                    self.library.mark_stems_ready(t.track_id)
+                elif st.state == "error":
+                    self._failed.add(t.track_id)
+
+        if not self.enabled:
+            return
+        state = self.deck_state() or {}
+        if state.get("playing") or _system_busy() or self._over_high_water():
+            return
+
+        t = self._next_candidate(state)
+        if t is None:
+            return
+        self._job_track = t
+        self._job_id = self.separator.submit(
+            str(t.path),
+            track_id=t.track_id,
+            out_dir=str(self.library.stems_dir(t.track_id)),
+            priority=PRIORITY_PREFETCH,
+        )
+
+    def _over_high_water(self) -> bool:
+        now = time.monotonic()
+        if self._cache_checked_at is None or now - self._cache_checked_at >= CACHE_CHECK_INTERVAL_S:
+            self._cache_checked_at = now
+            root = self.library.cache_root
+            try:
+                total = sum(e.total_bytes for e in scan_cache(root))
+                self._cache_full = total >= load_policy(root).budget_bytes * PREFETCH_CACHE_HIGH_WATER
+            except Exception:
+                self._cache_full = False
+        return self._cache_full
+
+    def _next_candidate(self, state: Dict) -> Optional[TrackInfo]:
+        loaded_ids = tuple(sorted(str(tid) for tid in (state.get("loaded") or [])))
+        now = time.monotonic()
+        changed = self._rank_key is not None and self._rank_key[1] != self.library.version
+        stale = changed and (now - self._ranked_at >= RERANK_INTERVAL_S or self._cursor >= len(self._ranked))
+        if self._rank_key is None or self._rank_key[0] != loaded_ids or stale:
+            self._rerank(loaded_ids)
+            self._ranked_at = now
+
+        # Stems state comes from the scan and mark_stems_ready(); a track whose
+        # stems appeared from elsewhere finishes immediately on the server.
+        while self._cursor < len(self._ranked):
+            t = self._ranked[self._cursor]
+            self._cursor += 1
+            if t.stems_ready or t.track_id in self._failed or t.track_id in loaded_ids:
+                continue
+            return t
+        return None
+
+    def _rerank(self, loaded_ids: Tuple[str, ...]):
+        loaded = [self.library.get_track(tid) for tid in loaded_ids]
+        loaded = [t for t in loaded if t is not None]
+
+        def score(t: TrackInfo):
+            match = 0
+            for ref in loaded:
+                if bpm_compatible(t.bpm, ref.bpm):
+                    match += 1
+                if camelot_compatible(t.camelot, ref.camelot):
+                    match += 1
+            analyzed = 1 if (t.bpm is not None and t.camelot is not None) else 0
+            return (match, analyzed, t.mtime)
+
+        self._rank_key = (loaded_ids, self.library.version)
+        # Tracks that already have stems still take a top slot; otherwise each
+        # rerank would reach further down the library.
+        cands = [t for t in self.library.all_tracks() if t.track_id not in self._failed]
+        top = heapq.nlargest(PREFETCH_MAX_TRACKS, cands, key=score)
+        self._ranked = [t for t in top if not t.stems_ready]
+        self._cursor = 0
@@ -0,0 +1,841 @@
+import json
+import multiprocessing as mp
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from squidbilli.cache_manager import enforce as enforce_cache_policy
+from squidbilli.decode import decode_audio
+from squidbilli.library import default_cache_root
+from squidbilli.stem_store import DEFAULT_STEM_FORMAT, adopt_npy_stems, cleanup_stale, stems_complete, write_stems
+
+MODEL_NAME = "htdemucs"
+
+# Lock file dropped in the stems dir while a separation is running, so other
+# app instances sharing the cache wait for it instead of running demucs again.
+LEASE_NAME = ".separating.lease"
+LEASE_STALE_S = 2 * 60 * 60
+
+# Lower value runs first; a job shared by several decks takes the most urgent.
+PRIORITY_PLAYING = 0
+PRIORITY_CUED = 1
+PRIORITY_PREFETCH = 2
+
+# Tracks are separated block by block (each block padded with context that is
+# trimmed off again) so cancellation and throttling apply mid-track.
+BLOCK_S = 30.0
+CONTEXT_S = 3.0
+
+# Prefetch jobs run each block in shorter slices, checking for hold/throttle
+# between them, so a deck starting to play is noticed within seconds rather
+# than at the next block boundary. The block grid (and resume) is unchanged.
+PREFETCH_SLICE_S = 5.0
+
+# Finished blocks are published here (one memmapped .npy per stem plus a
+# regions.json readiness map) so decks can play separated regions early.
+PARTIAL_DIR = ".partial"
+
+# Separation is always background work relative to the audio callback.
+SEPARATION_NICE = 10
+
+# The server re-publishes its job snapshot this often even when idle, so
+# clients can tell a busy server from a dead or wedged one.
+HEARTBEAT_S = 2.0
+SERVER_SILENCE_S = 15.0
+
+
+@dataclass
+class SeparationStatus:
+    job_id: str
+    track_id: str | None
+    state: str
+    message: str
+    progress: float
+    out_dir: str | None
+    regions_done: int = 0
+    regions_total: int = 0
+    # Measured throughput in audio-seconds per wall-second, and the ETA it implies.
+    rate: float = 0.0
+    eta_s: float | None = None
+
+
+@dataclass
+class SeparationJobInfo:
+    track_id: str | None
+    state: str
+    priority: int
+    progress: float
+    subscribers: int
+
+
+@dataclass
+class SeparationSnapshot:
+    jobs: list[SeparationJobInfo]
+
+
+@dataclass
+class SeparationEvicted:
+    # Tracks whose stems cache maintenance deleted.
+    track_ids: list[str]
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _emit_status(status_q: mp.Queue, status):
+    if status_q is None:
+        return
+    try:
+        status_q.put_nowait(status)
+    except Exception:
+        pass
+
+
+def _load_model(name: str):
+    from demucs.pretrained import get_model
+
+    model = get_model(name)
+    model.cpu()
+    model.eval()
+    return model
+
+
+def _thread_budget(throttled: bool) -> int:
+    n = os.cpu_count() or 2
+    if throttled:
+        return max(1, n // 4)
+    return max(1, n // 2)
+
+
+def read_partial_regions(out_dir: str | Path) -> dict | None:
+    """Readiness map of an in-progress separation, or None if there is none.
+
+    Keys: frames, block_frames, sample_rate, sources, done (block indices).
+    """
+    try:
+        return json.loads((Path(out_dir) / PARTIAL_DIR / "regions.json").read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _write_regions(pdir: Path, info: dict):
+    tmp = pdir / "regions.json.tmp"
+    tmp.write_text(json.dumps(info), encoding="utf-8")
+    os.replace(tmp, pdir / "regions.json")
+
+
+def _open_partials(pdir: Path, sources: list[str], frames: int, channels: int, block: int, sr: int):
+    shape = (int(frames), int(channels))
+    info = read_partial_regions(pdir.parent)
+    if (
+        info is not None
+        and int(info.get("frames", -1)) == shape[0]
+        and int(info.get("block_frames", -1)) == int(block)
+        and list(info.get("sources") or []) == list(sources)
+    ):
+        # Resume a previously cancelled run.
+        try:
+            parts = {name: np.load(str(pdir / f"{name}.npy"), mmap_mode="r+") for name in sources}
+            if all(p.shape == shape for p in parts.values()):
+                return parts, info
+        except Exception:
+            pass
+
+    shutil.rmtree(pdir, ignore_errors=True)
+    pdir.mkdir(parents=True, exist_ok=True)
+    parts = {
+        name: np.lib.format.open_memmap(str(pdir / f"{name}.npy"), mode="w+", dtype=np.float32, shape=shape)
+        for name in sources
+    }
+    info = {"frames": shape[0], "block_frames": int(block), "sample_rate": int(sr), "sources": list(sources), "done": []}
+    _write_regions(pdir, info)
+    return parts, info
+
+
+def _separate_to_dir(
+    model,
+    path: str,
+    out_dir: Path,
+    *,
+    stem_format: str = DEFAULT_STEM_FORMAT,
+    should_stop=None,
+    before_block=None,
+    focus=None,
+    on_region=None,
+    sliced=None,
+):
+    import torch
+    from demucs.apply import apply_model
+
+    sr = int(model.samplerate)
+    channels = int(model.audio_channels)
+    sources = list(model.sources)
+    audio = decode_audio(path, sample_rate=sr, channels=channels)
+    n = int(audio.shape[0])
+    wav = torch.from_numpy(np.ascontiguousarray(audio.T))
+
+    # Same input normalization as the demucs CLI.
+    ref = wav.mean(0)
+    mean = float(ref.mean())
+    std = float(ref.std()) + 1e-8
+    wav = (wav - mean) / std
+
+    block = max(1, int(BLOCK_S * sr))
+    ctx = int(CONTEXT_S * sr)
+    nblocks = max(1, (n + block - 1) // block)
+    pdir = out_dir / PARTIAL_DIR
+    parts, info = _open_partials(pdir, sources, n, channels, block, sr)
+    done = set(int(i) for i in info.get("done", []))
+
+    with torch.no_grad():
+        while len(done) < nblocks:
+            if before_block is not None:
+                before_block()
+            if should_stop is not None and should_stop():
+                raise _Cancelled()
+
+            # Nearest unfinished block at/after the focus first, then the
+            # ones before it, nearest first.
+            fb = 0
+            if focus is not None:
+                fb = min(nblocks - 1, max(0, int(focus()) // block))
+            i = min((k for k in range(nblocks) if k not in done), key=lambda k: (k < fb, abs(k - fb)))
+
+            start = i * block
+            end = min(n, start + block)
+            step = end - start
+            if sliced is not None and sliced():
+                step = max(1, int(PREFETCH_SLICE_S * sr))
+            wall_s = 0.0
+            for s in range(start, end, step):
+                if s > start:
+                    if before_block is not None:
+                        before_block()
+                    if should_stop is not None and should_stop():
+                        raise _Cancelled()
+                e = min(end, s + step)
+                a = max(0, s - ctx)
+                b = min(n, e + ctx)
+                t0 = time.perf_counter()
+                est = apply_model(model, wav[None, :, a:b], device="cpu", split=True, overlap=0.25, progress=False)[0]
+                seg = est[:, :, s - a : e - a].numpy()
+                for k, name in enumerate(sources):
+                    parts[name][s:e] = seg[k].T * np.float32(std) + np.float32(mean)
+                wall_s += time.perf_counter() - t0
+            for p in parts.values():
+                p.flush()
+
+            done.add(i)
+            info["done"] = sorted(done)
+            _write_regions(pdir, info)
+            if on_region is not None:
+                remaining = sum(min(n, (k + 1) * block) - k * block for k in range(nblocks) if k not in done)
+                on_region(len(done), nblocks, float(end - start) / sr, wall_s, float(remaining) / sr)
+
+    # The partial memmaps already are the final data; in npy mode they are
+    # just renamed into place, otherwise encoded once from them.
+    if stem_format == "npy":
+        for p in parts.values():
+            p.flush()
+        del parts
+        adopt_npy_stems(out_dir, {name: pdir / f"{name}.npy" for name in sources}, sr, n)
+    else:
+        write_stems(out_dir, {name: np.asarray(parts[name]) for name in sources}, sr, stem_format)
+        del parts
+    shutil.rmtree(pdir, ignore_errors=True)
+
+
+def _job_key(out_dir: str) -> str:
+    try:
+        return str(Path(out_dir).expanduser().resolve())
+    except Exception:
+        return str(out_dir)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except Exception:
+        return True
+    return True
+
+
+def _try_acquire_lease(out_dir: Path) -> bool:
+    lease = out_dir / LEASE_NAME
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(str(lease), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            # Break leases left behind by a crashed or long-dead holder.
+            try:
+                info = json.loads(lease.read_text(encoding="utf-8") or "{}")
+            except Exception:
+                info = {}
+            pid = int(info.get("pid") or 0)
+            started = float(info.get("started") or 0.0)
+            if _pid_alive(pid) and (time.time() - started) < LEASE_STALE_S:
+                return False
+            try:
+                lease.unlink()
+            except FileNotFoundError:
+                pass
+            except Exception:
+                return False
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "started": time.time()}, f)
+        return True
+    return False
+
+
+def _release_lease(out_dir: Path):
+    try:
+        (out_dir / LEASE_NAME).unlink()
+    except Exception:
+        pass
+
+
+class _SeparationServer:
+    """Single-process job runner.
+
+    A reader thread keeps handling commands (new jobs, cancel, priority,
+    throttle) while the main thread runs demucs on one job at a time; demucs
+    already uses every core it is given, so one job is the concurrency bound.
+    Jobs are keyed by stems dir and every request for the same dir subscribes
+    to the same job.
+    """
+
+    def __init__(self, cmd_q: mp.Queue, status_qs: dict, stem_format: str = DEFAULT_STEM_FORMAT):
+        self.cmd_q = cmd_q
+        self.status_qs = status_qs
+        self.stem_format = stem_format
+        self.cond = threading.Condition()
+        self.jobs: dict[str, dict] = {}
+        self.seq = 0
+        self.throttled = False
+        # (client, deck) -> track id on that deck; kept out of cache eviction.
+        self.loaded: dict[tuple, str] = {}
+        self.stopping = False
+        self.model = None
+        self._threads = 0
+        self._last_publish = 0.0
+        self._maint_thread: threading.Thread | None = None
+
+    def run(self):
+        try:
+            os.nice(SEPARATION_NICE)
+        except Exception:
+            pass
+
+        self._maintain_cache()
+
+        # Commands (and heartbeats) are handled while the model loads.
+        reader = threading.Thread(target=self._read_commands, daemon=True)
+        reader.start()
+
+        # Load the model once up front so the first job doesn't pay for it either.
+        try:
+            self.model = _load_model(MODEL_NAME)
+        except Exception as e:
+            print(f"Separation model load failed: {e}")
+
+        while True:
+            with self.cond:
+                job = self._next_job()
+                while job is None and not self.stopping:
+                    self.cond.wait(timeout=0.25)
+                    job = self._next_job()
+                if self.stopping:
+                    break
+                job["state"] = "running"
+            self._publish()
+            self._run_job(job)
+
+    def _held(self, job: dict) -> bool:
+        # Prefetch work waits entirely while a deck is playing.
+        return self.throttled and job["priority"] >= PRIORITY_PREFETCH
+
+    def _maintain_cache(self):
+        # Stale-file cleanup plus size budget / tiering, off the job thread.
+        t = self._maint_thread
+        if t is not None and t.is_alive():
+            return
+
+        with self.cond:
+            loaded = set(self.loaded.values())
+
+        def run():
+            root = default_cache_root()
+            try:
+                cleanup_stale(root)
+            except Exception:
+                pass
+            try:
+                rep = enforce_cache_policy(root, protect=loaded)
+            except Exception as e:
+                print(f"Cache maintenance failed: {e}")
+                return
+            if rep.dropped_ids:
+                evicted = SeparationEvicted(track_ids=list(rep.dropped_ids))
+                for q in self.status_qs.values():
+                    _emit_status(q, evicted)
+
+        self._maint_thread = threading.Thread(target=run, daemon=True)
+        self._maint_thread.start()
+
+    def _next_job(self):
+        now = time.time()
+        queued = [
+            j
+            for j in self.jobs.values()
+            if j["state"] == "queued" and j["not_before"] <= now and not self._held(j)
+        ]
+        if not queued:
+            return None
+        return min(queued, key=lambda j: (j["priority"], j["seq"]))
+
+    def _read_commands(self):
+        while True:
+            try:
+                cmd = self.cmd_q.get(timeout=0.25)
+            except Exception:
+                cmd = None
+            if not cmd:
+                if time.monotonic() - self._last_publish >= HEARTBEAT_S:
+                    self._publish()
+                continue
+
+            c = cmd.get("cmd")
+            if c == "shutdown":
+                with self.cond:
+                    self.stopping = True
+                    self.cond.notify_all()
+                return
+            if c == "separate":
+                self._add(cmd)
+            elif c == "cancel":
+                self._cancel(cmd.get("client"), str(cmd.get("job_id") or ""))
+            elif c == "priority":
+                self._set_priority(cmd.get("client"), str(cmd.get("job_id") or ""), int(cmd.get("priority", PRIORITY_CUED)))
+            elif c == "focus":
+                self._set_focus(cmd.get("client"), str(cmd.get("job_id") or ""), int(cmd.get("frame", 0) or 0))
+                continue
+            elif c == "loaded":
+                with self.cond:
+                    deck = (cmd.get("client"), str(cmd.get("deck") or ""))
+                    if cmd.get("track_id"):
+                        self.loaded[deck] = str(cmd["track_id"])
+                    else:
+                        self.loaded.pop(deck, None)
+                continue
+            elif c == "throttle":
+                with self.cond:
+                    self.throttled = bool(cmd.get("active", False))
+                    self.cond.notify_all()
+                continue
+            self._publish()
+
+    def _add(self, cmd: dict):
+        job_id = str(cmd.get("job_id") or uuid.uuid4().hex)
+        sub = (cmd.get("client"), job_id)
+        priority = int(cmd.get("priority", PRIORITY_CUED))
+        out_dir = str(cmd.get("out_dir") or "")
+        key = _job_key(out_dir)
+        with self.cond:
+            job = self.jobs.get(key)
+            if job is None:
+                job = {
+                    "key": key,
+                    "path": str(cmd.get("path") or ""),
+                    "out_dir": out_dir,
+                    "track_id": cmd.get("track_id"),
+                    "subs": {},
+                    "priority": priority,
+                    "seq": self.seq,
+                    "state": "queued",
+                    "cancelled": False,
+                    "progress": 0.0,
+                    "not_before": 0.0,
+                    "focus": int(cmd.get("focus", 0) or 0),
+                }
+                self.seq += 1
+                self.jobs[key] = job
+            # A job cancelled mid-run is revived if someone asks for it again.
+            job["cancelled"] = False
+            job["subs"][sub] = priority
+            job["priority"] = min(job["subs"].values())
+            self.cond.notify_all()
+        self._emit(job, "queued", "Queued for separation", 0.0, subs=[sub])
+
+    def _cancel(self, client, job_id: str):
+        sub = (client, job_id)
+        with self.cond:
+            job = next((j for j in self.jobs.values() if sub in j["subs"]), None)
+            if job is None:
+                return
+            job["subs"].pop(sub, None)
+            if job["subs"]:
+                job["priority"] = min(job["subs"].values())
+            elif job["state"] == "queued":
+                self.jobs.pop(job["key"], None)
+            else:
+                job["cancelled"] = True
+            self.cond.notify_all()
+        self._emit(job, "cancelled", "Cancelled", 0.0, subs=[sub])
+
+    def _set_priority(self, client, job_id: str, priority: int):
+        sub = (client, job_id)
+        with self.cond:
+            for job in self.jobs.values():
+                if sub in job["subs"]:
+                    job["subs"][sub] = int(priority)
+                    job["priority"] = min(job["subs"].values())
+                    self.cond.notify_all()
+                    return
+
+    def _set_focus(self, client, job_id: str, frame: int):
+        sub = (client, job_id)
+        with self.cond:
+            for job in self.jobs.values():
+                if sub in job["subs"]:
+                    job["focus"] = max(0, int(frame))
+                    return
+
+    def _between_blocks(self, job: dict):
+        if self._held(job):
+            with self.cond:
+                job["state"] = "paused"
+            self._publish()
+            with self.cond:
+                while self._held(job) and not job["cancelled"] and not self.stopping:
+                    self.cond.wait(timeout=0.05)
+                job["state"] = "running"
+            self._publish()
+        self._apply_throttle()
+
+    def _apply_throttle(self):
+        want = _thread_budget(self.throttled)
+        if want == self._threads:
+            return
+        try:
+            import torch
+
+            torch.set_num_threads(want)
+            self._threads = want
+        except Exception:
+            pass
+
+    def _emit(self, job: dict, state: str, message: str, progress: float, subs=None, **extra):
+        if subs is None:
+            with self.cond:
+                subs = list(job["subs"])
+        for client, job_id in subs:
+            _emit_status(
+                self.status_qs.get(client),
+                SeparationStatus(
+                    job_id=job_id,
+                    track_id=job["track_id"],
+                    state=state,
+                    message=message,
+                    progress=float(progress),
+                    out_dir=job["out_dir"] or None,
+                    **extra,
+                ),
+            )
+
+    def _publish(self):
+        with self.cond:
+            jobs = [
+                SeparationJobInfo(
+                    track_id=j["track_id"],
+                    state=j["state"],
+                    priority=int(j["priority"]),
+                    progress=float(j["progress"]),
+                    subscribers=len(j["subs"]),
+                )
+                for j in sorted(self.jobs.values(), key=lambda j: (j["state"] != "running", j["priority"], j["seq"]))
+            ]
+            self._last_publish = time.monotonic()
+        snap = SeparationSnapshot(jobs=jobs)
+        for q in self.status_qs.values():
+            _emit_status(q, snap)
+
+    def _finish(self, job: dict, state: str, message: str, progress: float):
+        with self.cond:
+            if self.jobs.get(job["key"]) is job:
+                self.jobs.pop(job["key"], None)
+            subs = list(job["subs"])
+        self._emit(job, state, message, progress, subs=subs)
+        self._publish()
+
+    def _run_job(self, job: dict):
+        if not job["path"] or not job["out_dir"]:
+            self._finish(job, "error", "Missing path or output dir", 0.0)
+            return
+
+        out_dir = Path(job["out_dir"])
+        if stems_complete(out_dir):
+            self._finish(job, "done", "Stems ready", 1.0)
+            return
+
+        try:
+            leased = _try_acquire_lease(out_dir)
+        except Exception as e:
+            self._finish(job, "error", f"Cannot lock stems dir: {e}", 0.0)
+            return
+        if not leased:
+            # Another instance is separating this track; check back shortly.
+            with self.cond:
+                job["state"] = "queued"
+                job["not_before"] = time.time() + 0.5
+            self._emit(job, "waiting", "Separating in another process...", 0.0)
+            return
+
+        try:
+            if self.model is None:
+                self._emit(job, "loading_model", f"Loading {MODEL_NAME}...", 0.0)
+                try:
+                    self.model = _load_model(MODEL_NAME)
+                except Exception as e:
+                    self._finish(job, "error", f"Model load failed: {e}", 0.0)
+                    return
+
+            def on_region(done: int, total: int, audio_s: float, wall_s: float, remaining_s: float):
+                rate = audio_s / max(1e-6, wall_s)
+                # Smooth across blocks; the first block sets the baseline.
+                prev = float(job.get("rate") or 0.0)
+                rate = rate if prev <= 0.0 else (0.7 * prev + 0.3 * rate)
+                eta_s = remaining_s / max(1e-6, rate)
+                with self.cond:
+                    job["progress"] = float(done) / float(max(1, total))
+                    job["rate"] = rate
+                self._emit(
+                    job,
+                    "separating",
+                    f"{done}/{total} regions",
+                    job["progress"],
+                    regions_done=int(done),
+                    regions_total=int(total),
+                    rate=float(rate),
+                    eta_s=float(eta_s),
+                )
+                self._publish()
+
+            self._emit(job, "separating", "Separating...", 0.0)
+            try:
+                _separate_to_dir(
+                    self.model,
+                    job["path"],
+                    out_dir,
+                    stem_format=self.stem_format,
+                    should_stop=lambda: job["cancelled"] or self.stopping,
+                    before_block=lambda: self._between_blocks(job),
+                    focus=lambda: job["focus"],
+                    on_region=on_region,
+                    sliced=lambda: job["priority"] >= PRIORITY_PREFETCH,
+                )
+            except _Cancelled:
+                with self.cond:
+                    if job["subs"] and not self.stopping:
+                        # Re-requested while we were unwinding: run it again later.
+                        job["cancelled"] = False
+                        job["state"] = "queued"
+                        return
+                self._finish(job, "cancelled", "Cancelled", 0.0)
+                return
+            except Exception as e:
+                self._finish(job, "error", f"Separation failed: {e}", 0.0)
+                return
+            self._finish(job, "done", "Stems ready", 1.0)
+            self._maintain_cache()
+        finally:
+            _release_lease(out_dir)
+
+
+def _separation_worker_main(cmd_q: mp.Queue, status_qs: dict, stem_format: str = DEFAULT_STEM_FORMAT):
+    _SeparationServer(cmd_q, status_qs, stem_format).run()
+
+
+class SeparationClient:
+    """Per-process handle to the separation server.
+
+    Picklable so it can be handed to spawned workers; each process gets its own
+    listener thread that routes status updates to whoever is waiting on a job.
+    Every `submit` gets its own job id; the server merges requests for the
+    same stems dir, so cancelling one deck's request leaves the others alone.
+    """
+
+    def __init__(self, name: str, cmd_q: mp.Queue, status_q: mp.Queue):
+        self.name = name
+        self._cmd_q = cmd_q
+        self._status_q = status_q
+        self._init_local()
+
+    def _init_local(self):
+        self._lock = threading.Lock()
+        self._statuses: dict[str, SeparationStatus] = {}
+        self._finished: dict[str, threading.Event] = {}
+        self._jobs: list[SeparationJobInfo] = []
+        self._evicted: set[str] = set()
+        self._listener: threading.Thread | None = None
+        self._last_heard = time.monotonic()
+
+    def __getstate__(self):
+        return {"name": self.name, "_cmd_q": self._cmd_q, "_status_q": self._status_q}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    def submit(
+        self,
+        path: str,
+        *,
+        track_id: str | None,
+        out_dir: str,
+        priority: int = PRIORITY_CUED,
+        focus: int = 0,
+        job_id: str | None = None,
+    ) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        self._ensure_listener()
+        with self._lock:
+            self._finished[job_id] = threading.Event()
+        self._cmd_q.put(
+            {
+                "cmd": "separate",
+                "job_id": job_id,
+                "track_id": track_id,
+                "path": str(path),
+                "out_dir": str(out_dir),
+                "priority": int(priority),
+                "focus": int(focus),
+                "client": self.name,
+            }
+        )
+        return job_id
+
+    def cancel(self, job_id: str):
+        self._cmd_q.put({"cmd": "cancel", "job_id": str(job_id), "client": self.name})
+
+    def set_priority(self, job_id: str, priority: int):
+        self._cmd_q.put({"cmd": "priority", "job_id": str(job_id), "priority": int(priority), "client": self.name})
+
+    def set_focus(self, job_id: str, frame: int):
+        self._cmd_q.put({"cmd": "focus", "job_id": str(job_id), "frame": int(frame), "client": self.name})
+
+    def throttle(self, active: bool):
+        self._cmd_q.put({"cmd": "throttle", "active": bool(active)})
+
+    def set_loaded(self, deck: str, track_id: str | None):
+        """Report the track on `deck` (None: empty) so cache eviction leaves it alone."""
+        self._cmd_q.put({"cmd": "loaded", "deck": str(deck), "track_id": track_id, "client": self.name})
+
+    def jobs(self) -> list[SeparationJobInfo]:
+        self._ensure_listener()
+        with self._lock:
+            return list(self._jobs)
+
+    def evicted(self) -> list[str]:
+        """Track ids whose stems cache maintenance dropped since the last call."""
+        self._ensure_listener()
+        with self._lock:
+            out, self._evicted = self._evicted, set()
+        return sorted(out)
+
+    def status(self, job_id: str) -> SeparationStatus | None:
+        with self._lock:
+            return self._statuses.get(job_id)
+
+    def wait(self, job_id: str, timeout: float | None = None) -> SeparationStatus | None:
+        with self._lock:
+            ev = self._finished.get(job_id)
+        if ev is None:
+            return self.status(job_id)
+        ev.wait(timeout=timeout)
+        with self._lock:
+            st = self._statuses.get(job_id)
+            if ev.is_set():
+                self._finished.pop(job_id, None)
+                self._statuses.pop(job_id, None)
+        return st
+
+    def responsive(self, silence_s: float = SERVER_SILENCE_S) -> bool:
+        """False once the server has been silent (no heartbeat) for `silence_s`."""
+        self._ensure_listener()
+        with self._lock:
+            return time.monotonic() - self._last_heard < silence_s
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._last_heard = time.monotonic()
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                st = self._status_q.get(timeout=0.25)
+            except Exception:
+                continue
+            if st is None:
+                continue
+            with self._lock:
+                self._last_heard = time.monotonic()
+                if isinstance(st, SeparationSnapshot):
+                    self._jobs = list(st.jobs)
+                    continue
+                if isinstance(st, SeparationEvicted):
+                    self._evicted.update(st.track_ids)
+                    continue
+                if st.job_id not in self._finished:
+                    continue
+                self._statuses[st.job_id] = st
+                if st.state in ("done", "error", "cancelled"):
+                    ev = self._finished.get(st.job_id)
+                    if ev is not None:
+                        ev.set()
+
+
+class SeparationController:
+    def __init__(self, clients: tuple[str, ...] = ("ui", "audio"), stem_format: str = DEFAULT_STEM_FORMAT):
+        ctx = mp.get_context("spawn")
+        self._cmd_q: mp.Queue = ctx.Queue()
+        self._status_qs: dict[str, mp.Queue] = {name: ctx.Queue() for name in clients}
+        self._proc = ctx.Process(
+            target=_separation_worker_main,
+            args=(self._cmd_q, self._status_qs, stem_format),
+            daemon=True,
+        )
+        self._clients = {name: SeparationClient(name, self._cmd_q, q) for name, q in self._status_qs.items()}
+
+    def start(self):
+        self._proc.start()
+
+    def stop(self):
+        try:
+            self._cmd_q.put({"cmd": "shutdown"})
+        except Exception:
+            pass
+        try:
+            if self._proc.is_alive():
+                self._proc.join(timeout=2.0)
+        except Exception:
+            pass
+
+    def client(self, name: str) -> SeparationClient:
+        return self._clients[name]
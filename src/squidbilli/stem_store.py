@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+STEM_NAMES = ["drums", "bass", "other", "vocals"]
+
+# "npy": raw float32, memory-mapped on load (fastest, largest).
+# "flac": 24-bit lossless, roughly half the size; decoded on load.
+# "wav": legacy float32 WAV as written by older builds (read-only in practice).
+STEM_FORMATS = ("npy", "flac", "wav")
+DEFAULT_STEM_FORMAT = "npy"
+
+# Written last, after every stem file is in place; its presence marks the dir complete.
+MANIFEST_NAME = "stems.json"
+
+_EXT = {"npy": ".npy", "flac": ".flac", "wav": ".wav"}
+
+# Leftovers from interrupted writes/runs older than this are removed at startup.
+STALE_TMP_S = 24 * 60 * 60
+STALE_PARTIAL_S = 7 * 24 * 60 * 60
+
+
+def stem_file(stems_dir: str | Path, name: str, fmt: str) -> Path:
+    return Path(stems_dir) / f"{name}{_EXT[fmt]}"
+
+
+def read_manifest(stems_dir: str | Path) -> dict | None:
+    try:
+        return json.loads((Path(stems_dir) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def stems_format(stems_dir: str | Path) -> str | None:
+    """Format of a complete stems dir, or None if it is missing/incomplete."""
+    d = Path(stems_dir)
+    man = read_manifest(d)
+    if man is not None:
+        fmt = str(man.get("format") or "")
+        if fmt in _EXT and all(stem_file(d, n, fmt).exists() for n in STEM_NAMES):
+            return fmt
+        return None
+    # Dirs written before the manifest existed: four float WAVs.
+    if all(stem_file(d, n, "wav").exists() for n in STEM_NAMES):
+        return "wav"
+    return None
+
+
+def stems_complete(stems_dir: str | Path) -> bool:
+    return stems_format(stems_dir) is not None
+
+
+def stems_size_bytes(stems_dir: str | Path) -> int:
+    total = 0
+    try:
+        for p in Path(stems_dir).rglob("*"):
+            try:
+                if p.is_file():
+                    total += p.stat().st_size
+            except Exception:
+                pass
+    except Exception:
+        pass
+    return total
+
+
+def _atomic_write_stem(path: Path, data: np.ndarray, sample_rate: int, fmt: str):
+    tmp = path.with_name(f".{path.name}.partial")
+    if fmt == "npy":
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float32))
+    else:
+        import soundfile as sf
+
+        if fmt == "flac":
+            sf.write(str(tmp), data, int(sample_rate), subtype="PCM_24", format="FLAC")
+        else:
+            sf.write(str(tmp), data, int(sample_rate), subtype="FLOAT", format="WAV")
+    os.replace(tmp, path)
+
+
+def write_stems(stems_dir: str | Path, stems: dict, sample_rate: int, fmt: str = DEFAULT_STEM_FORMAT):
+    """Write (frames, channels) float32 stems into `stems_dir` as `fmt`.
+
+    Each file is written to a dot-prefixed temp name and renamed into place;
+    the manifest goes last, so readers never see a half-written set. Files
+    of other formats left from a previous write are removed afterwards.
+    """
+    if fmt not in _EXT:
+        raise ValueError(f"Unknown stem format: {fmt}")
+    d = Path(stems_dir)
+    d.mkdir(parents=True, exist_ok=True)
+    frames = 0
+    for name in STEM_NAMES:
+        data = stems[name]
+        frames = int(data.shape[0])
+        _atomic_write_stem(stem_file(d, name, fmt), data, sample_rate, fmt)
+
+    _finish_write(d, fmt, sample_rate, frames)
+
+
+def adopt_npy_stems(stems_dir: str | Path, sources: dict, sample_rate: int, frames: int):
+    """Move finished .npy files (e.g. separation memmaps) into `stems_dir`.
+
+    Same-filesystem renames, so the audio is not written a second time.
+    """
+    d = Path(stems_dir)
+    d.mkdir(parents=True, exist_ok=True)
+    for name in STEM_NAMES:
+        os.replace(Path(sources[name]), stem_file(d, name, "npy"))
+    _finish_write(d, "npy", sample_rate, frames)
+
+
+def _finish_write(d: Path, fmt: str, sample_rate: int, frames: int):
+    man = {"format": fmt, "sample_rate": int(sample_rate), "frames": int(frames), "stems": list(STEM_NAMES)}
+    tmp = d / f".{MANIFEST_NAME}.partial"
+    tmp.write_text(json.dumps(man), encoding="utf-8")
+    os.replace(tmp, d / MANIFEST_NAME)
+
+    for other in _EXT:
+        if other == fmt:
+            continue
+        for name in STEM_NAMES:
+            try:
+                stem_file(d, name, other).unlink()
+            except FileNotFoundError:
+                pass
+            except Exception:
+                pass
+
+
+def load_stems(stems_dir: str | Path) -> tuple[dict, int] | None:
+    """Load a complete stems dir as {name: (frames, 2) float32}.
+
+    .npy stems come back as read-only memory maps, so nothing is read from
+    disk until the audio is actually played.
+    """
+    d = Path(stems_dir)
+    fmt = stems_format(d)
+    if fmt is None:
+        return None
+    man = read_manifest(d) or {}
+    sr = int(man.get("sample_rate") or 44100)
+    out = {}
+    for name in STEM_NAMES:
+        p = stem_file(d, name, fmt)
+        try:
+            if fmt == "npy":
+                data = np.load(str(p), mmap_mode="r")
+            else:
+                import soundfile as sf
+
+                data, sr = sf.read(str(p), dtype="float32", always_2d=True)
+        except Exception:
+            return None
+        if data.ndim != 2:
+            return None
+        if data.shape[1] == 1:
+            data = np.repeat(data, 2, axis=1)
+        out[name] = data
+    return out, sr
+
+
+def convert_stems(stems_dir: str | Path, fmt: str) -> bool:
+    """Rewrite a complete stems dir in another format. Returns True if changed."""
+    d = Path(stems_dir)
+    cur = stems_format(d)
+    if cur is None or cur == fmt:
+        return False
+    loaded = load_stems(d)
+    if loaded is None:
+        return False
+    stems, sr = loaded
+    write_stems(d, {k: np.asarray(v) for k, v in stems.items()}, sr, fmt)
+    return True
+
+
+def cleanup_stale(cache_root: str | Path) -> int:
+    """Remove debris from interrupted runs; returns the number of paths removed.
+
+    - dot-prefixed `.partial` files left by a crash mid-write,
+    - abandoned progressive-separation dirs (`stems/.partial`) nobody resumed,
+    - `tmpXXXX/htdemucs` dirs from builds that ran the demucs CLI into mkdtemp().
+    """
+    removed = 0
+    now = time.time()
+    tracks = Path(cache_root) / "tracks"
+    try:
+        stem_dirs = [p for p in tracks.glob("*/stems") if p.is_dir()]
+    except Exception:
+        stem_dirs = []
+    for d in stem_dirs:
+        try:
+            entries = list(d.iterdir())
+        except Exception:
+            continue
+        for p in entries:
+            try:
+                age = now - p.stat().st_mtime
+                if p.is_file() and p.name.startswith(".") and p.name.endswith(".partial") and age > STALE_TMP_S:
+                    p.unlink()
+                    removed += 1
+                elif p.is_dir() and p.name == ".partial" and age > STALE_PARTIAL_S:
+                    shutil.rmtree(p, ignore_errors=True)
+                    removed += 1
+            except Exception:
+                pass
+
+    try:
+        tmp_root = Path(tempfile.gettempdir())
+        candidates = [p for p in tmp_root.glob("tmp*") if p.is_dir()]
+    except Exception:
+        candidates = []
+    for p in candidates:
+        try:
+            children = [c.name for c in p.iterdir()]
+            getuid = getattr(os, "getuid", None)
+            if children == ["htdemucs"] and (getuid is None or p.stat().st_uid == getuid()):
+                shutil.rmtree(p, ignore_errors=True)
+                removed += 1
+        except Exception:
+            pass
+    return removed
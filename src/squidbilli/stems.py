@@ -1,21 +1,25 @@
-import os
-import subprocess
 import threading
-import tempfile
-import shutil
+import uuid
 from pathlib import Path
 
 import numpy as np
-import soundfile as sf
-from pydub import AudioSegment
 from scipy import signal
 from scipy.io import wavfile
 
+from squidbilli.cache_manager import touch_last_loaded
+from squidbilli.decode import decode_audio, iter_pcm_chunks, probe_duration_s
 from squidbilli.library import default_cache_root, track_id_for_path
+from squidbilli.separation_service.process import PARTIAL_DIR, PRIORITY_CUED, read_partial_regions
+from squidbilli.stem_store import STEM_NAMES, load_stems
+from squidbilli.waveform import WAVEFORM_NAME, WaveformPyramid, build_pyramid, load_pyramid, save_pyramid
+
+# Extra separated audio on each side of a region when deriving its lanes, so
+# the crossover filters settle before the region boundary.
+LANE_FILTER_MARGIN_S = 0.5
 
 
 class StemManager:
-    def __init__(self, clip_manager=None):
+    def __init__(self, clip_manager=None, separator=None, compute_waveform: bool = True):
         self.full_mix = None
         self.stems = {}
         self.lanes = [None] * 8
@@ -25,20 +29,47 @@ class StemManager:
         self.stems_ready = False
         self.clip_manager = clip_manager
 
+        # Progressive separation: lanes fill in region by region; region_ready
+        # marks which blocks of region_frames samples hold separated audio.
+        self.stems_partial = False
+        self.region_ready = None
+        self.region_frames = 0
+        self.separation_focus = 0
+
+        # Latest separation progress reported by the server.
+        self.separation_progress = 0.0
+        self.separation_rate = 0.0
+        self.separation_eta_s: float | None = None
+
+        # SeparationClient for the warm demucs server (see separation_service).
+        self.separator = separator
+        # Identifies this deck to the separation server (see SeparationClient.set_loaded).
+        self._deck_key = uuid.uuid4().hex
+        self.separation_priority = PRIORITY_CUED
+        self._sep_job_id: str | None = None
+
+        # Progressive decode: full_mix is preallocated and filled in the
+        # background; decoded_frames is the watermark of valid audio.
+        # track_len_samples is the buffer size (container estimate) until
+        # is_decoding clears, then the exact decoded length.
+        self.decoded_frames = 0
+        self.is_decoding = False
+        self.track_len_samples = 0
+        self._decode_lock = threading.Lock()
+        self._load_generation = 0
+
         self.current_track_path: Path | None = None
         self.current_track_id: str | None = None
         self.cache_root = default_cache_root()
 
         self.waveform_ready = False
-        self.waveform_x = None
-        self.waveform_y = None
-        self.waveform_y_low = None
-        self.waveform_y_mid = None
-        self.waveform_y_high = None
+        # Off in the audio worker, which never draws it.
+        self.compute_waveform = bool(compute_waveform)
+        self.waveform: WaveformPyramid | None = None
+        self._waveform_path: Path | None = None
+        self._waveform_cached = False
         self._waveform_thread = None
 
-        self.temp_dir = tempfile.mkdtemp()
-
     def load_track(
         self,
         file_path,
@@ -51,25 +82,65 @@ class StemManager:
             p = Path(file_path).expanduser().resolve()
             self.current_track_path = p
             self.current_track_id = track_id or track_id_for_path(p)
+            touch_last_loaded(self.cache_root, self.current_track_id)
+            if self.separator is not None:
+                try:
+                    self.separator.set_loaded(self._deck_key, self.current_track_id)
+                except Exception:
+                    pass
+
+            # A reload supersedes whatever this deck had queued.
+            self.cancel_separation()
 
             # Reset state
             self.stems_ready = False
             self.is_separating = False
             self.stems = {}
             self.lanes = [None] * 8
+            self.stems_partial = False
+            self.region_ready = None
+            self.region_frames = 0
+            self.separation_focus = 0
+            self.separation_progress = 0.0
+            self.separation_rate = 0.0
+            self.separation_eta_s = None
 
-            audio = AudioSegment.from_file(file_path)
-            audio = audio.set_frame_rate(self.sample_rate).set_channels(2)
-
-            samples = np.array(audio.get_array_of_samples())
-            if audio.sample_width == 2:
-                samples = samples.astype(np.float32) / 32768.0
-            elif audio.sample_width == 4:
-                samples = samples.astype(np.float32) / 2147483648.0
-            samples = samples.reshape((-1, 2))
-
-            self.full_mix = samples
-            self.track_len_samples = samples.shape[0]
+            self.waveform_ready = False
+            self.waveform = None
+            self._waveform_cached = False
+
+            cache_stems_dir = Path(cache_dir) if cache_dir is not None else (
+                self.cache_root / "tracks" / self.current_track_id / "stems"
+            )
+
+            # A previous load of this track left its waveform in the cache.
+            self._waveform_path = cache_stems_dir.parent / WAVEFORM_NAME
+            if self.compute_waveform:
+                wf = load_pyramid(self._waveform_path, int(self.sample_rate))
+                if wf is not None:
+                    self.waveform = wf
+                    self._waveform_cached = True
+                    self.waveform_ready = True
+
+            # Decode runs in the background; only block until the first chunk
+            # lands so the deck can be cued/played while the rest streams in.
+            with self._decode_lock:
+                self._load_generation += 1
+                gen = self._load_generation
+                self.full_mix = None
+                self.decoded_frames = 0
+                self.is_decoding = True
+            first_chunk = threading.Event()
+            t = threading.Thread(
+                target=self._decode_track,
+                args=(p, gen, first_chunk, cache_stems_dir, bool(start_separation)),
+                daemon=True,
+            )
+            t.start()
+            first_chunk.wait(timeout=30.0)
+
+            if self.full_mix is None:
+                return
 
             if self.clip_manager:
                 try:
@@ -92,255 +163,307 @@ class StemManager:
                 except Exception:
                     pass
 
-            self.waveform_ready = False
-            self.waveform_x = None
-            self.waveform_y = None
-            self.waveform_y_low = None
-            self.waveform_y_mid = None
-            self.waveform_y_high = None
-            self.start_waveform_compute(points=None)
+            self.start_waveform_compute()
+
+        except Exception as e:
+            print(f"Error loading track: {e}")
+        finally:
+            self.is_loading = False
+
+    def _decode_track(self, path: Path, gen: int, first_chunk: threading.Event, cache_stems_dir: Path, start_separation: bool):
+        sr = int(self.sample_rate)
+        try:
+            # Preallocate from the container duration (plus slack) so the
+            # buffer rarely has to grow; undecoded frames read as silence.
+            dur_s = probe_duration_s(path)
+            if dur_s is not None:
+                cap = int(dur_s * sr) + sr
+            else:
+                cap = sr * 60 * 8
+            buf = np.zeros((max(sr, cap), 2), dtype=np.float32)
+
+            with self._decode_lock:
+                if gen != self._load_generation:
+                    return
+                self.full_mix = buf
+                self.track_len_samples = buf.shape[0]
+
+            try:
+                chunks = iter_pcm_chunks(path, sample_rate=sr, channels=2)
+                first = next(chunks, None)
+            except FileNotFoundError:
+                # No ffmpeg binary: one-shot decode (libsndfile formats only).
+                chunks = iter(())
+                first = decode_audio(path, sample_rate=sr, channels=2)
+
+            last_waveform = 0
+            waveform_every = sr * 20
+            chunk = first
+            while chunk is not None:
+                n = int(chunk.shape[0])
+                with self._decode_lock:
+                    if gen != self._load_generation:
+                        return
+                    start = int(self.decoded_frames)
+                    end = start + n
+                    if end > buf.shape[0]:
+                        grown = np.zeros((max(end, int(buf.shape[0] * 1.5)), 2), dtype=np.float32)
+                        grown[:start] = buf[:start]
+                        buf = grown
+                        self.full_mix = buf
+                        self.track_len_samples = buf.shape[0]
+                    buf[start:end] = chunk
+                    self.decoded_frames = end
+                first_chunk.set()
+
+                # Refresh the envelope as audio arrives (no-op while a compute is running).
+                if end - last_waveform >= waveform_every:
+                    last_waveform = end
+                    self.start_waveform_compute()
+
+                chunk = next(chunks, None)
+
+            with self._decode_lock:
+                if gen != self._load_generation:
+                    return
+                total = int(self.decoded_frames)
+                if total <= 0:
+                    self.full_mix = None
+                    return
+                # Trim the preallocation slack (view, no copy).
+                self.full_mix = buf[:total]
+                self.track_len_samples = total
+                self.is_decoding = False
+
+            # The clip page was laid out from the preallocated (estimated) length.
+            if self.clip_manager:
+                try:
+                    self.clip_manager.set_page(
+                        int(self.clip_manager.current_page),
+                        total_samples=total,
+                        sample_rate=int(self.sample_rate),
+                        bpm=120.0,
+                        bars_per_slot=8,
+                        slots_per_page=8,
+                    )
+                except Exception:
+                    pass
+
+            # Final envelope over the complete track (unless the cached one matches it).
+            wf = self.waveform
+            if self._waveform_cached and (wf is None or wf.frames != total):
+                self.waveform = None
+                self._waveform_cached = False
+            if not self._waveform_cached:
+                wt = self._waveform_thread
+                if wt is not None and wt.is_alive():
+                    wt.join()
+                self.start_waveform_compute()
 
             if start_separation:
                 # Try to load cached stems first
-                cache_stems_dir = Path(cache_dir) if cache_dir is not None else (
-                    self.cache_root / "tracks" / self.current_track_id / "stems"
-                )
                 if self._load_cached_stems(cache_stems_dir):
                     self._derive_lanes()
                     self.stems_ready = True
                     return
 
-                t = threading.Thread(target=self._run_separation, args=(file_path, cache_stems_dir))
+                t = threading.Thread(target=self._run_separation, args=(str(path), cache_stems_dir, gen), daemon=True)
                 t.start()
-
         except Exception as e:
-            print(f"Error loading track: {e}")
+            print(f"Error decoding track: {e}")
+            with self._decode_lock:
+                if gen == self._load_generation and self.decoded_frames <= 0:
+                    self.full_mix = None
         finally:
-            self.is_loading = False
+            with self._decode_lock:
+                if gen == self._load_generation:
+                    self.is_decoding = False
+            first_chunk.set()
 
-    def start_waveform_compute(self, points: int | None = 2000):
-        if self.full_mix is None:
+    def start_waveform_compute(self, force: bool = False):
+        if not self.compute_waveform or self.full_mix is None:
             return
         if self._waveform_thread and self._waveform_thread.is_alive():
             return
-
-        # Adaptive envelope density: keep cached rendering fast but ensure zoom windows
-        # have enough bins on long tracks.
-        if points is None:
-            try:
-                n = int(self.full_mix.shape[0])
-                sr = float(self.sample_rate)
-                dur_s = float(n) / max(1.0, sr)
-            except Exception:
-                dur_s = 0.0
-
-            # Target bins-per-second with caps to avoid expensive compute.
-            # Higher density helps the 8s zoom window look continuous while keeping
-            # runtime rendering fast (still uses cached envelope).
-            bins_per_sec = 120.0
-            min_points = 4000
-            max_points = 20000
-            try:
-                points = int(dur_s * bins_per_sec)
-            except Exception:
-                points = min_points
-            if points < min_points:
-                points = min_points
-            if points > max_points:
-                points = max_points
-
-        self._waveform_thread = threading.Thread(target=self._compute_waveform, args=(points,))
+        if force:
+            self.waveform = None
+            self._waveform_cached = False
+        elif self._waveform_cached:
+            return
+        self._waveform_thread = threading.Thread(target=self._compute_waveform, args=(self._load_generation,))
         self._waveform_thread.daemon = True
         self._waveform_thread.start()
 
-    def _compute_waveform(self, points: int):
+    def _compute_waveform(self, gen: int):
         try:
-            x = self.full_mix
-            if x is None:
+            with self._decode_lock:
+                x = self.full_mix
+                complete = not self.is_decoding
+                n = int(self.decoded_frames) if not complete else (int(x.shape[0]) if x is not None else 0)
+                path = self._waveform_path
+            if x is None or n <= 0:
                 return
 
-            mono = x.mean(axis=1)
-            mono = mono.astype(np.float32, copy=False)
-            n = mono.shape[0]
-            if n == 0:
+            mono = x[:n].mean(axis=1, dtype=np.float32)
+            # While decoding, extend the previous pass instead of starting over.
+            wf = build_pyramid(mono, int(self.sample_rate), prev=self.waveform)
+            if gen != self._load_generation:
                 return
+            self.waveform = wf
+            self.waveform_ready = True
+            if complete and path is not None:
+                try:
+                    save_pyramid(path, wf)
+                except Exception as e:
+                    print(f"Waveform cache write failed: {e}")
+        except Exception:
+            self.waveform_ready = False
 
-            points = max(200, int(points))
-            hop = max(1, n // points)
-
-            sr = self.sample_rate
+    def set_separation_priority(self, priority: int):
+        self.separation_priority = int(priority)
+        job_id = self._sep_job_id
+        if job_id is not None and self.separator is not None:
+            try:
+                self.separator.set_priority(job_id, int(priority))
+            except Exception:
+                pass
 
-            peaks = []
-            times = []
-            for i in range(0, n, hop):
-                seg = mono[i : i + hop]
-                if seg.size == 0:
-                    continue
-                peaks.append(float(np.max(np.abs(seg))))
-                times.append(float(i) / float(sr))
-
-            if len(peaks) < 2:
-                self.waveform_x = times
-                self.waveform_y = peaks
-                self.waveform_y_low = peaks
-                self.waveform_y_mid = peaks
-                self.waveform_y_high = peaks
-                self.waveform_ready = True
-                return
+    def set_separation_focus(self, frame: int):
+        """Separate the region around `frame` next (play head / clip page)."""
+        self.separation_focus = max(0, int(frame))
+        job_id = self._sep_job_id
+        if job_id is not None and self.separator is not None:
+            try:
+                self.separator.set_focus(job_id, self.separation_focus)
+            except Exception:
+                pass
 
-            # Cheap pseudo-3-band decomposition from the peak envelope.
-            # No per-track filtering; just multi-scale smoothing.
+    def cancel_separation(self):
+        job_id = self._sep_job_id
+        self._sep_job_id = None
+        if job_id is not None and self.separator is not None:
             try:
-                pk = np.asarray(peaks, dtype=np.float32)
-
-                def _ma(xv: np.ndarray, win: int) -> np.ndarray:
-                    w = int(win)
-                    if w <= 1:
-                        return xv
-                    k = np.ones(w, dtype=np.float32) / float(w)
-                    y = np.convolve(xv, k, mode="same")
-                    return y.astype(np.float32, copy=False)
-
-                # Window sizes scale with point count to keep behavior stable.
-                slow = _ma(pk, max(3, int(pk.shape[0] // 120)))
-                mid = _ma(pk, max(3, int(pk.shape[0] // 300)))
-
-                e_low = np.maximum(slow, 0.0)
-                e_mid = np.maximum(mid - slow, 0.0)
-                e_high = np.maximum(pk - mid, 0.0)
-                w_low = np.float32(1.0)
-                w_mid = np.float32(1.0)
-                w_high = np.float32(0.55)
-                tot = (e_low * w_low) + (e_mid * w_mid) + (e_high * w_high) + np.float32(1e-6)
-
-                low = pk * ((e_low * w_low) / tot)
-                midc = pk * ((e_mid * w_mid) / tot)
-                high = pk * ((e_high * w_high) / tot)
-
-                self.waveform_x = times
-                self.waveform_y = [float(v) for v in pk]
-                self.waveform_y_low = [float(v) for v in low]
-                self.waveform_y_mid = [float(v) for v in midc]
-                self.waveform_y_high = [float(v) for v in high]
+                self.separator.cancel(job_id)
             except Exception:
-                self.waveform_x = times
-                self.waveform_y = peaks
-                self.waveform_y_low = peaks
-                self.waveform_y_mid = peaks
-                self.waveform_y_high = peaks
-            self.waveform_ready = True
-        except Exception:
-            self.waveform_ready = False
+                pass
 
-    def _run_separation(self, file_path, cache_stems_dir: Path):
+    def _run_separation(self, file_path, cache_stems_dir: Path, gen: int):
         self.is_separating = True
+        job_id = None
         try:
-            cmd = [
-                "demucs",
-                "-n",
-                "htdemucs",
-                "-d",
-                "cpu",
-                "--out",
-                self.temp_dir,
-                "--float32",
-                file_path,
-            ]
-
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            _, stderr = process.communicate()
-
-            if process.returncode != 0:
-                tail = stderr[-4000:] if stderr else ""
-                print(f"Demucs failed (code={process.returncode}). Command: {' '.join(cmd)}")
-                print(tail)
+            sep = self.separator
+            if sep is None:
+                print("Separation unavailable: no separation service attached")
                 return
 
-            filename_no_ext = os.path.splitext(os.path.basename(file_path))[0]
-            model_name = "htdemucs"
-            base_path = os.path.join(self.temp_dir, model_name, filename_no_ext)
-
-            stem_names = ["drums", "bass", "other", "vocals"]
-            loaded_stems = {}
+            job_id = sep.submit(
+                str(file_path),
+                track_id=self.current_track_id,
+                out_dir=str(cache_stems_dir),
+                priority=self.separation_priority,
+                focus=self.separation_focus,
+            )
+            if gen != self._load_generation:
+                sep.cancel(job_id)
+                sep.wait(job_id, timeout=5.0)
+                return
+            self._sep_job_id = job_id
 
-            for name in stem_names:
-                stem_path = os.path.join(base_path, f"{name}.wav")
-                if not os.path.exists(stem_path):
+            # Pick up regions as the server publishes them.
+            seen = 0.0
+            while True:
+                st = sep.wait(job_id, timeout=0.25)
+                if gen != self._load_generation:
+                    return
+                if st is not None and st.state in ("done", "error", "cancelled"):
+                    break
+                if not sep.responsive():
+                    # Server died or hung; give up instead of waiting forever.
+                    st = None
+                    break
+                if st is None:
                     continue
+                if st.state == "separating" and st.progress > seen:
+                    seen = st.progress
+                    self.separation_progress = float(st.progress)
+                    self.separation_rate = float(st.rate)
+                    self.separation_eta_s = st.eta_s
+                    self._ingest_regions(cache_stems_dir, gen)
+
+            if st is not None and st.state == "cancelled":
+                return
+            if st is not None and st.state == "done":
+                self.separation_progress = 1.0
+                self.separation_eta_s = 0.0
+            if st is None or st.state != "done":
+                msg = st.message if st is not None else "no response from separation service"
+                print(f"Demucs failed: {msg}")
+                return
 
-                data, sr = sf.read(stem_path, dtype="float32", always_2d=True)
-                if sr != self.sample_rate:
-                    pass
-
-                if data.shape[1] == 1:
-                    data = np.repeat(data, 2, axis=1)
-
-                loaded_stems[name] = data
+            # A different track may have been loaded while we waited.
+            if gen != self._load_generation:
+                return
 
-                # Save to cache
-                cache_stems_dir.mkdir(parents=True, exist_ok=True)
-                try:
-                    shutil.copy2(stem_path, cache_stems_dir / f"{name}.wav")
-                except Exception:
-                    pass
+            if self.region_ready is not None:
+                self._ingest_regions(cache_stems_dir, gen, final=True)
+            ready = self.region_ready
+            if ready is not None and bool(ready.all()):
+                # Every region was already ingested; no need to re-read the WAVs.
+                self.stems_ready = True
+                return
 
-            self.stems = loaded_stems
-            self._derive_lanes()
-            self.stems_ready = True
+            if self._load_cached_stems(cache_stems_dir):
+                self._derive_lanes()
+                self.stems_ready = True
 
         except Exception as e:
             print(f"Separation error: {e}")
         finally:
-            self.is_separating = False
+            if job_id is not None and self._sep_job_id == job_id:
+                self._sep_job_id = None
+            if gen == self._load_generation:
+                self.is_separating = False
 
     def _load_cached_stems(self, cache_stems_dir: Path) -> bool:
-        stem_names = ["drums", "bass", "other", "vocals"]
-        if not cache_stems_dir.exists():
+        loaded = load_stems(cache_stems_dir)
+        if loaded is None:
             return False
-        loaded_stems = {}
-        for name in stem_names:
-            p = cache_stems_dir / f"{name}.wav"
-            if not p.exists():
-                return False
-            try:
-                data, sr = sf.read(str(p), dtype="float32", always_2d=True)
-                if data.shape[1] == 1:
-                    data = np.repeat(data, 2, axis=1)
-                loaded_stems[name] = data
-            except Exception:
-                return False
-
-        self.stems = loaded_stems
+        self.stems = loaded[0]
         return True
 
-    def _derive_lanes(self):
-        if not self.stems:
-            return
-
+    def _split_lanes(self, stems: dict, like: np.ndarray) -> list:
         def apply_filter(data, cutoff, btype):
             b, a = signal.butter(2, cutoff / (self.sample_rate / 2), btype=btype)
             return signal.filtfilt(b, a, data, axis=0)
 
-        self.lanes[4] = self.stems.get("bass", np.zeros_like(self.full_mix))
-        self.lanes[7] = self.stems.get("vocals", np.zeros_like(self.full_mix))
+        lanes = [None] * 8
+        lanes[4] = stems.get("bass", np.zeros_like(like))
+        lanes[7] = stems.get("vocals", np.zeros_like(like))
 
-        drums = self.stems.get("drums", np.zeros_like(self.full_mix))
+        drums = stems.get("drums", np.zeros_like(like))
         kick = apply_filter(drums, 150, "low")
         hats = apply_filter(drums, 5000, "high")
         snare = apply_filter(drums, 200, "high")
         snare = apply_filter(snare, 4000, "low")
         perc = drums - kick - hats - snare
 
-        self.lanes[0] = kick
-        self.lanes[1] = snare
-        self.lanes[2] = hats
-        self.lanes[3] = perc
+        lanes[0] = kick
+        lanes[1] = snare
+        lanes[2] = hats
+        lanes[3] = perc
 
-        other = self.stems.get("other", np.zeros_like(self.full_mix))
+        other = stems.get("other", np.zeros_like(like))
         chords = apply_filter(other, 1000, "low")
         lead = apply_filter(other, 1000, "high")
-        self.lanes[5] = chords
-        self.lanes[6] = lead
+        lanes[5] = chords
+        lanes[6] = lead
+        return lanes
+
+    def _derive_lanes(self):
+        if not self.stems:
+            return
+
+        self.lanes = self._split_lanes(self.stems, self.full_mix)
 
         target_len = self.full_mix.shape[0]
         for i in range(8):
@@ -360,6 +483,93 @@ class StemManager:
             except Exception:
                 pass
 
+    def _ingest_regions(self, cache_stems_dir: Path, gen: int, final: bool = False):
+        mix = self.full_mix
+        if mix is None:
+            return
+        if final:
+            # Finished stems: fill in whatever regions the progress updates missed.
+            loaded = load_stems(cache_stems_dir)
+            if loaded is None or self.region_ready is None or self.region_frames <= 0:
+                return
+            parts = loaded[0]
+            n = int(parts["drums"].shape[0])
+            block = int(self.region_frames)
+            done = list(range((n + block - 1) // block))
+        else:
+            info = read_partial_regions(cache_stems_dir)
+            if info is None:
+                return
+            try:
+                n = int(info["frames"])
+                block = int(info["block_frames"])
+                done = [int(i) for i in info.get("done", [])]
+                pdir = Path(cache_stems_dir) / PARTIAL_DIR
+                parts = {name: np.load(str(pdir / f"{name}.npy"), mmap_mode="r") for name in STEM_NAMES}
+            except Exception:
+                return
+        if block <= 0 or n <= 0:
+            return
+
+        target_len = int(mix.shape[0])
+        nblocks = (n + block - 1) // block
+        ready = self.region_ready
+        if ready is None or self.region_frames != block or ready.shape[0] != nblocks:
+            lanes = [np.zeros((target_len, 2), dtype=np.float32) for _ in range(8)]
+            ready = np.zeros(nblocks, dtype=bool)
+            if gen != self._load_generation:
+                return
+            self.lanes = lanes
+            self.region_frames = block
+            self.region_ready = ready
+
+        done_set = set(done)
+        margin = int(LANE_FILTER_MARGIN_S * self.sample_rate)
+        for i in done:
+            if i < 0 or i >= nblocks or ready[i]:
+                continue
+            if gen != self._load_generation:
+                return
+            start = i * block
+            end = min(n, target_len, start + block)
+            if end <= start:
+                ready[i] = True
+                continue
+            # Only borrow filter context from neighbours that are separated too.
+            a = max(0, start - margin) if (i - 1) in done_set else start
+            b = min(n, end + margin) if (i + 1) in done_set else end
+            try:
+                stems = {}
+                for name, part in parts.items():
+                    d = np.asarray(part[a:b], dtype=np.float32)
+                    if d.shape[1] == 1:
+                        d = np.repeat(d, 2, axis=1)
+                    stems[name] = d
+                region = self._split_lanes(stems, stems["drums"])
+            except Exception:
+                return
+            for k in range(8):
+                self.lanes[k][start:end] = region[k][start - a : end - a]
+            # Publish only after the lane data is in place (audio thread reads this).
+            ready[i] = True
+            self.stems_partial = True
+
+    def region_mask(self, frame_idx: int, count: int) -> np.ndarray:
+        """(count, 1) weights: 1 where separated audio exists, 0 elsewhere."""
+        mask = np.zeros((int(count), 1), dtype=np.float32)
+        ready = self.region_ready
+        block = int(self.region_frames)
+        if ready is None or block <= 0 or count <= 0:
+            return mask
+        start = int(frame_idx)
+        end = start + int(count)
+        for r in range(max(0, start // block), min(ready.shape[0], (end - 1) // block + 1)):
+            if ready[r]:
+                s = max(start, r * block) - start
+                e = min(end, (r + 1) * block) - start
+                mask[s:e] = 1.0
+        return mask
+
     def get_frame(self, frame_idx, count, use_stems=False, *, clip_only: bool = False):
         if self.full_mix is None:
             return np.zeros((count, 2), dtype=np.float32), np.zeros((8, count, 2), dtype=np.float32)
@@ -378,7 +588,7 @@ class StemManager:
         mix_chunk = read_buffer(self.full_mix, frame_idx, count)
 
         lanes_chunk = np.zeros((8, count, 2), dtype=np.float32)
-        if self.stems_ready:
+        if self.stems_ready or self.stems_partial:
             for i in range(8):
                 active_clip = None
                 if self.clip_manager:
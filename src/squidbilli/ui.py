@@ -4,13 +4,26 @@ from pathlib import Path
 import math
 import json
 import time
+import numpy as np
 
 from squidbilli.keybindings import Actions, default_keybindings
-from squidbilli.library import TrackLibrary, default_cache_root, track_id_for_path
+from squidbilli.library import (
+    ANALYSIS_PRIORITY_SELECTED,
+    ANALYSIS_PRIORITY_VISIBLE,
+    TrackLibrary,
+    default_cache_root,
+    track_id_for_path,
+)
+from squidbilli.frame_scheduler import PRIORITY_CRITICAL, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, FrameScheduler
+from squidbilli.prefetch import PrefetchScheduler
 from squidbilli.stems import StemManager
+from squidbilli.waveform import BAND_COLORS, WAVEFORM_NAME, WaveformRaster, load_thumbnail
 from squidbilli.dj_proxy import DJProxy
 from squidbilli.synth_proxy import SynthProxy
 
+# Library thumbnail: a single grey peak envelope.
+THUMB_COLORS = (("peak", (160, 160, 160, 255)),)
+
 
 class UI:
     def __init__(self, transport_a, transport_b, mixer_state, stem_manager_a, stem_manager_b, audio, ingest=None):
@@ -26,13 +39,21 @@ class UI:
         self.keybindings = default_keybindings()
         self.library = TrackLibrary(cache_root=default_cache_root())
         self.library.add_folder(Path.home() / "Music")
-        self.library.scan()
+        self.library.scan_async()
+        self.library.start_watching()
+        self._library_list_key = None
+        self._recommend_key = None
+        self._recommend_items = []
+
+        # Pre-separate library tracks while nothing is playing.
+        self.prefetch = PrefetchScheduler(self.library, getattr(stem_manager_a, "separator", None), self._prefetch_deck_state)
+        self.prefetch.start()
 
         self._space_key = getattr(dpg, "mvKey_Spacebar", getattr(dpg, "mvKey_Space", None))
         self._waveform_plotted = False
         self._deck_b_waveform_plotted = False
         self._updating_position_slider = False
-        self._last_library_refresh = 0.0
+        self._library_thumb_key = None
         self._zoom_window_sec = 8.0
         self._zoom_points = 800
         self._last_zoom_update = 0.0
@@ -40,15 +61,16 @@ class UI:
         self._last_deck_a_playhead_draw = 0.0
         self._last_deck_b_playhead_draw = 0.0
         self._last_waveform_debug_draw = 0.0
-        self._last_deck_a_waveform_draw = 0.0
-        self._last_deck_b_waveform_draw = 0.0
-        self._last_deck_a_zoom_draw = 0.0
-        self._last_deck_b_zoom_draw = 0.0
 
-        self._overview_cache_key_a = None
-        self._overview_cache_key_b = None
-        self._zoom_cache_key_a = None
-        self._zoom_cache_key_b = None
+        self._wave_rasters = {}
+        self._overlay_state = {}
+        # Draw items created/deleted by the waveform views, for the debug HUD.
+        self._draw_counts = {"created": 0, "deleted": 0}
+        self._hud_last = None
+
+        self._last_status = None
+        self.frame_scheduler = FrameScheduler()
+        self._build_frame_tasks()
 
         self._debug_mode = False
         self._font_default = None
@@ -85,7 +107,11 @@ class UI:
         self._scene_theme_a = None
         self._scene_theme_b = None
         self._scene_theme_ab = None
-        self._last_clip_grid_refresh = 0.0
+        # Last applied clip/grid state, so status updates only touch what changed.
+        self._clip_grid_key = None
+        self._bound_themes = {}
+        self._clip_layouts = {}
+        self._deck_a_page_ui = None
 
         self._clip_grid_deck = "A"
 
@@ -251,9 +277,11 @@ class UI:
                 dpg.add_button(label="Load Track", callback=self.load_track_callback)
                 dpg.add_button(label="Separate Stems", callback=self.separate_callback)
                 dpg.add_button(label="Help (Cmd+Shift+?)", callback=self._toggle_help)
+                dpg.add_checkbox(label="Debug", default_value=False, callback=self.debug_mode_callback)
                 dpg.add_text("Status: Idle", tag="status_text")
 
             dpg.add_text("", tag="debug_status", color=(160, 160, 160, 255))
+            dpg.add_text("", tag="debug_hud", color=(160, 200, 160, 255), show=False)
 
             dpg.add_separator()
 
@@ -358,15 +386,28 @@ class UI:
                             dpg.add_text("Key:")
                             dpg.add_color_button(tag="library_key_color", default_value=(0, 0, 0, 255), width=18, height=18)
                             dpg.add_text("--", tag="library_key_text")
+                            dpg.add_drawlist(tag="library_thumb", width=160, height=18)
 
                         with dpg.group(horizontal=True):
                             dpg.add_input_text(tag="ingest_url", hint="SoundCloud/URL...", width=740)
                             dpg.add_button(label="Import URL", callback=self._ingest_import_url_clicked)
                         dpg.add_text("", tag="ingest_status", color=(160, 160, 160, 255))
+                        dpg.add_text("", tag="library_analysis_status", color=(160, 160, 160, 255))
 
                         dpg.add_listbox(tag="library_list", items=[], num_items=12, width=900, callback=self.library_select_callback)
                         self.library_refresh_listbox()
 
+                        with dpg.group(horizontal=True):
+                            dpg.add_text("Next for deck:")
+                            dpg.add_radio_button(
+                                items=["A", "B"],
+                                tag="library_recommend_deck",
+                                default_value="A",
+                                horizontal=True,
+                                callback=lambda s, a: self._task_recommend(),
+                            )
+                        dpg.add_listbox(tag="library_recommend", items=[], num_items=6, width=900, callback=self.library_recommend_callback)
+
                     with dpg.collapsing_header(label="Patterns", default_open=True):
                         dpg.add_text("Per-lane bar patterns (Tidal-ish): tokens 1-8 or ~")
                         with dpg.group(horizontal=True):
@@ -1132,10 +1173,35 @@ class UI:
         dpg.destroy_context()
 
     def update_loop(self):
+        self.frame_scheduler.run_frame()
+
+    def _build_frame_tasks(self):
+        """Per-frame UI work, by priority and target rate (see FrameScheduler)."""
+        sched = self.frame_scheduler
+        sched.add("status", self._task_sync_status, priority=PRIORITY_CRITICAL)
+        sched.add("tutorial", self._tutorial_tick, priority=PRIORITY_CRITICAL)
+        sched.add("transport", self._task_transport, priority=PRIORITY_CRITICAL)
+        sched.add("overlay_a", lambda: self._task_overlay("A"), priority=PRIORITY_CRITICAL, interval_s=0.03)
+        sched.add("overlay_b", lambda: self._task_overlay("B"), priority=PRIORITY_CRITICAL, interval_s=0.03)
+        sched.add("zoom_a", lambda: self._task_zoom("A"), priority=PRIORITY_HIGH, interval_s=0.0625)
+        sched.add("zoom_b", lambda: self._task_zoom("B"), priority=PRIORITY_HIGH, interval_s=0.0625)
+        sched.add("clip_grid", self._task_clip_grid, priority=PRIORITY_HIGH)
+        sched.add("overview_a", lambda: self._task_overview("A"), priority=PRIORITY_NORMAL, interval_s=0.1)
+        sched.add("overview_b", lambda: self._task_overview("B"), priority=PRIORITY_NORMAL, interval_s=0.1)
+        sched.add("status_text", self._task_status_text, priority=PRIORITY_NORMAL, interval_s=0.1)
+        sched.add("library", self._task_library, priority=PRIORITY_LOW, interval_s=1.0)
+        sched.add("recommend", self._task_recommend, priority=PRIORITY_LOW, interval_s=1.0)
+        sched.add("debug", self._task_debug, priority=PRIORITY_LOW, interval_s=0.2)
+        sched.add("debug_hud", self._task_debug_hud, priority=PRIORITY_LOW, interval_s=0.5)
+
+    def _task_sync_status(self):
         try:
             st = self.audio.poll_status() if self.audio is not None else None
         except Exception:
             st = None
+        # poll_status keeps returning the last status; apply each one once.
+        fresh = st is not None and st is not self._last_status
+        self._last_status = st
 
         try:
             ist = self.ingest.poll_status() if self.ingest is not None else None
@@ -1155,12 +1221,11 @@ class UI:
                 track_id = getattr(ist, "track_id", None)
                 if state == "done" and track_id and track_id != self._ingest_last_track_id:
                     self._ingest_last_track_id = track_id
-                    self.library.scan()
-                    self.library_refresh_listbox()
+                    self.library.scan_async()
             except Exception:
                 pass
 
-        if st is not None:
+        if fresh:
             try:
                 self.transport_a.playing = bool(st.playing_a)
                 self.transport_b.playing = bool(st.playing_b)
@@ -1171,116 +1236,63 @@ class UI:
             except Exception:
                 pass
 
-            # Sync clip state from audio worker so UI playheads/active clips match audio.
-            try:
-                cm_a = self._get_clip_manager_for_deck("A")
-                if cm_a is not None:
-                    cm_a.active_clip_indices = list(getattr(st, "active_clips_a", cm_a.active_clip_indices))
-                    cm_a.pending_clip_indices = list(getattr(st, "pending_clips_a", cm_a.pending_clip_indices))
-                    cm_a.clip_playheads = list(getattr(st, "clip_playheads_a", cm_a.clip_playheads))
-                    cm_a.current_page = int(getattr(st, "clip_page_a", getattr(cm_a, "current_page", 0)))
-                    try:
-                        mgr_a = self.stem_manager
-                        if getattr(mgr_a, "full_mix", None) is not None:
-                            cm_a.set_page(
-                                int(getattr(cm_a, "current_page", 0)),
-                                total_samples=int(mgr_a.full_mix.shape[0]),
-                                sample_rate=int(getattr(self.transport_a, "sample_rate", 44100)),
-                                bpm=float(getattr(self.transport_a, "bpm", 120.0)),
-                                bars_per_slot=8,
-                                slots_per_page=8,
-                            )
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+            # Stems the audio worker finished for a loaded track show as READY in the library.
+            for deck in ("A", "B"):
+                tid = st.track_id_a if deck == "A" else st.track_id_b
+                info = self.library.get_track(tid) if tid and self._deck_stems_ready(deck) else None
+                if info is not None and not info.stems_ready:
+                    self.library.mark_stems_ready(tid)
 
-            try:
-                cm_b = self._get_clip_manager_for_deck("B")
-                if cm_b is not None:
-                    cm_b.active_clip_indices = list(getattr(st, "active_clips_b", cm_b.active_clip_indices))
-                    cm_b.pending_clip_indices = list(getattr(st, "pending_clips_b", cm_b.pending_clip_indices))
-                    cm_b.clip_playheads = list(getattr(st, "clip_playheads_b", cm_b.clip_playheads))
-                    cm_b.current_page = int(getattr(st, "clip_page_b", getattr(cm_b, "current_page", 0)))
-                    try:
-                        mgr_b = self.deck_b
-                        if getattr(mgr_b, "full_mix", None) is not None:
-                            cm_b.set_page(
-                                int(getattr(cm_b, "current_page", 0)),
-                                total_samples=int(mgr_b.full_mix.shape[0]),
-                                sample_rate=int(getattr(self.transport_b, "sample_rate", 44100)),
-                                bpm=float(getattr(self.transport_b, "bpm", 120.0)),
-                                bars_per_slot=8,
-                                slots_per_page=8,
-                            )
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+            # Sync clip state from audio worker so UI playheads/active clips match audio.
+            self._sync_clip_state("A", st)
+            self._sync_clip_state("B", st)
 
             # Keep Deck A page control reflecting current track length/bpm and worker page.
             try:
                 max_p = int(self._deck_a_max_page())
-                if dpg.does_item_exist("deck_a_clip_page"):
-                    dpg.configure_item("deck_a_clip_page", max_value=int(max_p))
                 p = int(getattr(st, "clip_page_a", getattr(self, "_deck_a_clip_page", 0)))
                 if p < 0:
                     p = 0
                 if p > max_p:
                     p = max_p
                 self._deck_a_clip_page = int(p)
-                if dpg.does_item_exist("deck_a_clip_page"):
+                if (max_p, p) != self._deck_a_page_ui and dpg.does_item_exist("deck_a_clip_page"):
+                    dpg.configure_item("deck_a_clip_page", max_value=int(max_p))
                     dpg.set_value("deck_a_clip_page", int(p))
+                    self._deck_a_page_ui = (max_p, p)
             except Exception:
                 pass
 
-        self._tutorial_tick()
-
+    def _task_transport(self):
         bar_a, beat_a, phase_a = self.transport_a.get_beat_info()
-        bar_b, beat_b, phase_b = self.transport_b.get_beat_info()
         dpg.set_value("transport_text", f"Bar: {bar_a}.{beat_a}")
-
-        now = time.time()
-        if now - self._last_library_refresh >= 1.0:
-            self._last_library_refresh = now
-            self.library_refresh_listbox()
-
-        if getattr(self.stem_manager, "waveform_ready", False):
-            if (not self._waveform_plotted) or (now - self._last_deck_a_waveform_draw > 0.75):
-                if self._render_deck_overview("A"):
-                    self._waveform_plotted = True
-                    self._last_deck_a_waveform_draw = now
-            if now - self._last_deck_a_zoom_draw > 0.0625:
-                if self._render_deck_zoom("A"):
-                    self._last_deck_a_zoom_draw = now
-
-        if getattr(self.deck_b, "waveform_ready", False):
-            if (not self._deck_b_waveform_plotted) or (now - self._last_deck_b_waveform_draw > 0.769):
-                if self._render_deck_overview("B"):
-                    self._deck_b_waveform_plotted = True
-                    self._last_deck_b_waveform_draw = now
-            if now - self._last_deck_b_zoom_draw > 0.0625:
-                if self._render_deck_zoom("B"):
-                    self._last_deck_b_zoom_draw = now
-
-        if self._debug_mode:
-            self._render_waveform_debug()
-
         if dpg.does_item_exist("bpm_slider"):
             dpg.set_value("bpm_slider", float(self.transport_a.bpm))
         if dpg.does_item_exist("bpm_readout"):
             dpg.set_value("bpm_readout", f"{float(self.transport_a.bpm):.1f}")
-        self._position_debug_window()
 
+    def _task_overlay(self, deck: str):
         # Keep playhead/cue overlays in sync
-        if self.stem_manager.full_mix is not None:
-            self._render_deck_overlay("A")
-        if self.deck_b.full_mix is not None:
-            self._render_deck_overlay("B")
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        if mgr.full_mix is not None:
+            self._render_deck_overlay(deck)
 
-        self._update_status_text(st)
-        self._update_debug_status(st)
+    def _task_zoom(self, deck: str):
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        if getattr(mgr, "waveform_ready", False):
+            self._render_deck_zoom(deck)
 
+    def _task_overview(self, deck: str):
+        # Cheap when nothing changed: the overview raster is keyed by waveform and size.
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        if getattr(mgr, "waveform_ready", False):
+            if self._render_deck_overview(deck):
+                if deck == "A":
+                    self._waveform_plotted = True
+                else:
+                    self._deck_b_waveform_plotted = True
+
+    def _task_clip_grid(self):
         self._refresh_clip_grid_colors()
 
         try:
@@ -1293,6 +1305,84 @@ class UI:
         except Exception:
             pass
 
+    def _task_library(self):
+        done, total = self.library.analysis_progress()
+        if dpg.does_item_exist("library_analysis_status"):
+            dpg.set_value("library_analysis_status", f"Analyzing BPM/key: {done}/{total}" if total else "")
+        # Stems dropped by the separation server's cache maintenance.
+        sep = getattr(self.stem_manager, "separator", None)
+        if sep is not None:
+            for tid in sep.evicted():
+                self.library.mark_stems_ready(tid, False)
+        # Scans and analysis bump library.version; rebuild the listbox only then.
+        key = (self.library.version, self.library.filter_text)
+        if key != self._library_list_key:
+            self.library_refresh_listbox()
+
+    def _task_recommend(self):
+        if not dpg.does_item_exist("library_recommend"):
+            return
+        deck = str(dpg.get_value("library_recommend_deck") or "A")
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        tid = getattr(mgr, "current_track_id", None)
+        key = (deck, tid, self.library.version)
+        if key == self._recommend_key:
+            return
+        self._recommend_key = key
+        self._recommend_items = self.library.recommend(tid) if tid else []
+        dpg.configure_item("library_recommend", items=self._library_labels(self._recommend_items))
+
+    def _task_status_text(self):
+        st = self._last_status
+        self._update_status_text(st)
+        self._update_debug_status(st)
+
+    def _task_debug(self):
+        if self._debug_mode:
+            self._render_waveform_debug()
+        self._position_debug_window()
+
+    def _task_debug_hud(self):
+        if not self._debug_mode:
+            self._hud_last = None
+            return
+        now = time.perf_counter()
+        cmds = int(getattr(self.audio, "cmds_sent", 0)) if self.audio is not None else 0
+        counts = (now, self._draw_counts["created"], self._draw_counts["deleted"], cmds)
+        last = self._hud_last
+        self._hud_last = counts
+        if last is None or now <= last[0]:
+            return
+        dt = now - last[0]
+        created_s = (counts[1] - last[1]) / dt
+        deleted_s = (counts[2] - last[2]) / dt
+        cmds_s = (counts[3] - last[3]) / dt
+
+        snap = self.frame_scheduler.snapshot()
+        backlog = int(getattr(self.audio, "status_backlog", 0)) if self.audio is not None else 0
+        backlog_max = int(getattr(self.audio, "status_backlog_max", 0)) if self.audio is not None else 0
+        lines = [
+            f"frame p50/p95/p99 {snap['period_p50_ms']:.1f}/{snap['period_p95_ms']:.1f}/{snap['period_p99_ms']:.1f} ms   "
+            f"ui work p50/p95/p99/max {snap['p50_ms']:.1f}/{snap['p95_ms']:.1f}/{snap['p99_ms']:.1f}/{snap['max_ms']:.1f} ms   "
+            f"over budget {snap['over_budget']}/{snap['frames']}",
+            f"draw items +{created_s:.0f}/s -{deleted_s:.0f}/s   status_q backlog {backlog} (max {backlog_max})   ipc {cmds_s:.0f} cmd/s",
+        ]
+        tasks = sorted(snap["tasks"].items(), key=lambda kv: kv[1]["cost_ms"], reverse=True)
+        lines.append(
+            "  ".join(f"{name} {t['cost_ms']:.2f}ms" + (f" d{t['deferred']}" if t["deferred"] else "") for name, t in tasks)
+        )
+        dpg.set_value("debug_hud", "\n".join(lines))
+
+    def _count_draw_items(self, created: int = 0, deleted: int = 0):
+        self._draw_counts["created"] += int(created)
+        self._draw_counts["deleted"] += int(deleted)
+
+    def _draw_children(self, item) -> int:
+        try:
+            return len(dpg.get_item_children(item, 2) or [])
+        except Exception:
+            return 0
+
     def _ingest_import_url_clicked(self, sender, app_data):
         if self.ingest is None:
             return
@@ -1343,14 +1433,67 @@ class UI:
         mgr = self.stem_manager if deck == "A" else self.deck_b
         if getattr(mgr, "is_loading", False):
             return ("loading", "Loading")
+        if getattr(mgr, "is_decoding", False):
+            return ("loading", "Decoding")
         if getattr(mgr, "is_separating", False):
             return ("separating", "Separating")
-        if getattr(mgr, "stems_ready", False):
+        if self._deck_stems_ready(deck):
             return ("ready", "Ready")
         if getattr(mgr, "full_mix", None) is not None:
             return ("loaded", "Loaded")
         return ("idle", "Idle")
 
+    def _deck_stems_ready(self, deck: str) -> bool:
+        # Stems are separated and loaded by the audio worker, not the UI-side managers.
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        st = self._last_status
+        if st is not None:
+            ready, tid = (st.stems_ready_a, st.track_id_a) if deck == "A" else (st.stems_ready_b, st.track_id_b)
+            # Until the worker has picked up a new load its status describes the old track.
+            if ready and tid == getattr(mgr, "current_track_id", None):
+                return True
+        return bool(getattr(mgr, "stems_ready", False))
+
+    def _prefetch_deck_state(self) -> dict:
+        loaded = []
+        for mgr in (self.stem_manager, self.deck_b):
+            tid = getattr(mgr, "current_track_id", None)
+            if tid:
+                loaded.append(tid)
+        return {
+            "playing": bool(getattr(self.transport_a, "playing", False) or getattr(self.transport_b, "playing", False)),
+            "loaded": loaded,
+        }
+
+    def _separation_progress_label(self, progress: float, rate: float, eta_s) -> str:
+        try:
+            pct = int(round(float(progress) * 100.0))
+        except Exception:
+            pct = 0
+        if pct <= 0 or eta_s is None:
+            return "Separating"
+        eta = max(0, int(round(float(eta_s))))
+        return f"Separating {pct}% ETA {eta // 60}:{eta % 60:02d} ({float(rate):.1f}x)"
+
+    def _separation_queue_label(self) -> str:
+        sep = getattr(self.stem_manager, "separator", None)
+        if sep is None:
+            return ""
+        try:
+            jobs = sep.jobs()
+        except Exception:
+            return ""
+        if not jobs:
+            return ""
+        running = sum(1 for j in jobs if j.state == "running")
+        queued = len(jobs) - running
+        parts = []
+        if running:
+            parts.append(f"{running} running")
+        if queued:
+            parts.append(f"{queued} queued")
+        return "Stems: " + ", ".join(parts)
+
     def _update_status_text(self, st):
         audio_ready = st is not None
         spin = self._spinner_char()
@@ -1358,6 +1501,16 @@ class UI:
         a_state, a_label = self._deck_status("A")
         b_state, b_label = self._deck_status("B")
 
+        # The audio worker owns the stems that are actually played; prefer its
+        # separation progress over the UI-side managers.
+        if st is not None:
+            if getattr(st, "separating_a", False) and a_state not in ("loading",):
+                a_state = "separating"
+                a_label = self._separation_progress_label(st.sep_progress_a, st.sep_rate_a, st.sep_eta_a)
+            if getattr(st, "separating_b", False) and b_state not in ("loading",):
+                b_state = "separating"
+                b_label = self._separation_progress_label(st.sep_progress_b, st.sep_rate_b, st.sep_eta_b)
+
         if audio_ready:
             audio_label = "Audio: Ready"
         else:
@@ -1372,6 +1525,9 @@ class UI:
             b_txt = f"B: {b_label} {spin}"
 
         msg = f"{audio_label}   {a_txt}   {b_txt}"
+        sep_txt = self._separation_queue_label()
+        if sep_txt:
+            msg = f"{msg}   {sep_txt}"
         if dpg.does_item_exist("status_text"):
             dpg.set_value("status_text", msg)
 
@@ -1437,6 +1593,7 @@ class UI:
             try:
                 dpg.configure_item("deck_a_clip_page", max_value=int(max_p))
                 dpg.set_value("deck_a_clip_page", int(p))
+                self._deck_a_page_ui = (int(max_p), int(p))
             except Exception:
                 pass
 
@@ -1468,18 +1625,19 @@ class UI:
         try:
             for r in range(8):
                 tag = f"scene_btn_{r}"
-                if dpg.does_item_exist(tag) and self._scene_theme_default is not None:
-                    dpg.bind_item_theme(tag, self._scene_theme_default)
+                if dpg.does_item_exist(tag):
+                    self._bind_theme_cached(tag, self._scene_theme_default)
             for lane in range(8):
                 for slot in range(8):
                     tag = f"clip_btn_{lane}_{slot}"
-                    if dpg.does_item_exist(tag) and self._clip_theme_default is not None:
-                        dpg.bind_item_theme(tag, self._clip_theme_default)
+                    if dpg.does_item_exist(tag):
+                        self._bind_theme_cached(tag, self._clip_theme_default)
                 stop_tag = f"clip_btn_{lane}_-1"
-                if dpg.does_item_exist(stop_tag) and self._clip_theme_default is not None:
-                    dpg.bind_item_theme(stop_tag, self._clip_theme_default)
+                if dpg.does_item_exist(stop_tag):
+                    self._bind_theme_cached(stop_tag, self._clip_theme_default)
         except Exception:
             pass
+        self._clip_grid_key = None
 
         if push_audio and self.audio is not None:
             try:
@@ -1581,18 +1739,19 @@ class UI:
         try:
             for r in range(8):
                 tag = f"scene_btn_{r}"
-                if dpg.does_item_exist(tag) and self._scene_theme_default is not None:
-                    dpg.bind_item_theme(tag, self._scene_theme_default)
+                if dpg.does_item_exist(tag):
+                    self._bind_theme_cached(tag, self._scene_theme_default)
             for lane in range(8):
                 for slot in range(8):
                     tag = f"clip_btn_{lane}_{slot}"
-                    if dpg.does_item_exist(tag) and self._clip_theme_default is not None:
-                        dpg.bind_item_theme(tag, self._clip_theme_default)
+                    if dpg.does_item_exist(tag):
+                        self._bind_theme_cached(tag, self._clip_theme_default)
                 stop_tag = f"clip_btn_{lane}_-1"
-                if dpg.does_item_exist(stop_tag) and self._clip_theme_default is not None:
-                    dpg.bind_item_theme(stop_tag, self._clip_theme_default)
+                if dpg.does_item_exist(stop_tag):
+                    self._bind_theme_cached(stop_tag, self._clip_theme_default)
         except Exception:
             pass
+        self._clip_grid_key = None
 
         if push_audio and self.audio is not None:
             try:
@@ -1749,20 +1908,80 @@ class UI:
         except Exception:
             pass
 
+    def _sync_clip_state(self, deck: str, st):
+        """Apply one deck's clip state from an AudioStatus, touching only what changed."""
+        cm = self._get_clip_manager_for_deck(deck)
+        if cm is None:
+            return
+        sfx = deck.lower()
+        try:
+            active = getattr(st, f"active_clips_{sfx}", None)
+            if active is not None and list(active) != list(cm.active_clip_indices):
+                cm.active_clip_indices = list(active)
+            pending = getattr(st, f"pending_clips_{sfx}", None)
+            if pending is not None and list(pending) != list(cm.pending_clip_indices):
+                cm.pending_clip_indices = list(pending)
+            # A fresh list arrives with every status; no need to copy it.
+            playheads = getattr(st, f"clip_playheads_{sfx}", None)
+            if playheads is not None:
+                cm.clip_playheads = playheads
+            cm.current_page = int(getattr(st, f"clip_page_{sfx}", getattr(cm, "current_page", 0)))
+        except Exception:
+            return
+
+        # The grid only depends on page, track length, rate and BPM. Rebuild it
+        # when one of those changes or something else replaced it (e.g. a load).
+        mgr = self.stem_manager if deck == "A" else self.deck_b
+        tr = self.transport_a if deck == "A" else self.transport_b
+        if getattr(mgr, "full_mix", None) is None:
+            return
+        layout = (
+            int(cm.current_page),
+            int(mgr.full_mix.shape[0]),
+            int(getattr(tr, "sample_rate", 44100)),
+            float(getattr(tr, "bpm", 120.0)),
+        )
+        last = self._clip_layouts.get(deck)
+        if last is not None and last[0] == layout and last[1] is cm.grid:
+            return
+        try:
+            cm.set_page(
+                layout[0],
+                total_samples=layout[1],
+                sample_rate=layout[2],
+                bpm=layout[3],
+                bars_per_slot=8,
+                slots_per_page=8,
+            )
+            self._clip_layouts[deck] = (layout, cm.grid)
+        except Exception:
+            pass
+
+    def _bind_theme_cached(self, tag: str, theme):
+        if theme is None or self._bound_themes.get(tag) == theme:
+            return
+        try:
+            dpg.bind_item_theme(tag, theme)
+            self._bound_themes[tag] = theme
+        except Exception:
+            pass
+
     def _refresh_clip_grid_colors(self):
         cm = self._get_clip_manager_for_deck(self._clip_grid_deck)
         if cm is None:
             return
-        now = time.time()
-        if now - self._last_clip_grid_refresh < 0.05:
-            return
-        self._last_clip_grid_refresh = now
 
         pending = list(getattr(cm, "pending_clip_indices", [-2] * 8))
         active = list(getattr(cm, "active_clip_indices", [-1] * 8))
-
         scene_a = int(getattr(cm, "scene_a", -1))
         scene_b = int(getattr(cm, "scene_b", -1))
+
+        # Nothing launched, queued or selected since the last pass.
+        key = (self._clip_grid_deck, tuple(pending), tuple(active), scene_a, scene_b)
+        if key == self._clip_grid_key:
+            return
+        self._clip_grid_key = key
+
         for r in range(8):
             tag = f"scene_btn_{r}"
             if not dpg.does_item_exist(tag):
@@ -1774,11 +1993,7 @@ class UI:
                 theme = self._scene_theme_a
             elif r == scene_b:
                 theme = self._scene_theme_b
-            if theme is not None:
-                try:
-                    dpg.bind_item_theme(tag, theme)
-                except Exception:
-                    pass
+            self._bind_theme_cached(tag, theme)
 
         for lane in range(8):
             p = int(pending[lane]) if lane < len(pending) else -2
@@ -1792,22 +2007,14 @@ class UI:
                     theme = self._clip_theme_active
                 elif p == slot:
                     theme = self._clip_theme_pending
-                if theme is not None:
-                    try:
-                        dpg.bind_item_theme(tag, theme)
-                    except Exception:
-                        pass
+                self._bind_theme_cached(tag, theme)
 
             stop_tag = f"clip_btn_{lane}_-1"
             if dpg.does_item_exist(stop_tag):
                 theme = self._clip_theme_default
                 if p == -1:
                     theme = self._clip_theme_stop_pending
-                if theme is not None:
-                    try:
-                        dpg.bind_item_theme(stop_tag, theme)
-                    except Exception:
-                        pass
+                self._bind_theme_cached(stop_tag, theme)
 
     def tutorial_load_callback(self):
         if dpg.does_item_exist("tutorial_file_dialog"):
@@ -2034,8 +2241,7 @@ class UI:
             deck = str(action.get("deck", "A")).upper()
 
             if cond == "stems_ready":
-                mgr = self.stem_manager if deck != "B" else self.deck_b
-                ok = bool(getattr(mgr, "stems_ready", False))
+                ok = self._deck_stems_ready("B" if deck == "B" else "A")
                 if not ok:
                     self._tutorial_fail(f"assert stems_ready failed deck={deck}")
                 return True
@@ -2109,8 +2315,7 @@ class UI:
                 return bool(getattr(mgr, "waveform_ready", False))
             if cond == "stems_ready":
                 deck = str(action.get("deck", "A")).upper()
-                mgr = self.stem_manager if deck != "B" else self.deck_b
-                return bool(getattr(mgr, "stems_ready", False))
+                return self._deck_stems_ready("B" if deck == "B" else "A")
             if cond == "bar_boundary":
                 deck = str(action.get("deck", "A")).upper()
                 tr = self.transport_a if deck != "B" else self.transport_b
@@ -2362,15 +2567,15 @@ class UI:
         if info is None:
             return
 
-        cache_dir = self.library.cache_dir(info.track_id)
+        cache_dir = self.library.stems_dir(info.track_id)
         if deck == "B":
             try:
-                self.deck_b.load_track(str(info.path))
+                self.deck_b.load_track(str(info.path), start_separation=False)
             except Exception:
                 pass
         else:
             try:
-                self.stem_manager.load_track(str(info.path))
+                self.stem_manager.load_track(str(info.path), start_separation=False)
             except Exception:
                 pass
 
@@ -2457,7 +2662,7 @@ class UI:
             pass
 
     def waveform_rebuild(self):
-        self.stem_manager.start_waveform_compute()
+        self.stem_manager.start_waveform_compute(force=True)
 
     def _item_rel_x01(self, item_tag: str) -> float | None:
         try:
@@ -2579,18 +2784,36 @@ class UI:
         except Exception:
             pass
 
+    def _waveform_texture(self, drawlist: str, w: int, h: int, colors=BAND_COLORS):
+        """Raster + dynamic texture drawn at the bottom of `drawlist`, recreated on resize."""
+        raster = self._wave_rasters.get(drawlist)
+        tex = f"{drawlist}_texture"
+        img = f"{drawlist}_image"
+        if raster is not None and raster.width == w and raster.height == h and dpg.does_item_exist(img):
+            return raster, tex
+
+        if not dpg.does_item_exist("waveform_textures"):
+            dpg.add_texture_registry(tag="waveform_textures")
+        for item in (img, tex):
+            if dpg.does_item_exist(item):
+                dpg.delete_item(item)
+                self._count_draw_items(deleted=1)
+        raster = WaveformRaster(w, h, colors)
+        dpg.add_dynamic_texture(width=w, height=h, default_value=raster.pixels.ravel(), tag=tex, parent="waveform_textures")
+        children = dpg.get_item_children(drawlist, 2) or []
+        kwargs = {"before": children[0]} if children else {}
+        dpg.draw_image(tex, (0, 0), (w, h), parent=drawlist, tag=img, **kwargs)
+        self._count_draw_items(created=2)
+        self._wave_rasters[drawlist] = raster
+        return raster, tex
+
     def _render_deck_overview(self, deck: str) -> bool:
         try:
             mgr = self.stem_manager if deck == "A" else self.deck_b
             if not getattr(mgr, "waveform_ready", False):
                 return False
-            xs = getattr(mgr, "waveform_x", None)
-            yl = getattr(mgr, "waveform_y_low", None)
-            ym = getattr(mgr, "waveform_y_mid", None)
-            yh = getattr(mgr, "waveform_y_high", None)
-            if xs is None or yl is None or ym is None or yh is None:
-                return False
-            if not xs:
+            wf = getattr(mgr, "waveform", None)
+            if wf is None or not wf.levels:
                 return False
 
             tag = "deck_a_overview" if deck == "A" else "deck_b_overview"
@@ -2611,94 +2834,24 @@ class UI:
             if w <= 4 or h <= 4:
                 return False
 
-            try:
-                cache_key = (w, h, id(xs), id(yl), id(ym), id(yh), len(xs))
-            except Exception:
-                cache_key = None
-            if deck == "A":
-                if cache_key is not None and cache_key == self._overview_cache_key_a:
-                    return False
-                self._overview_cache_key_a = cache_key
-            else:
-                if cache_key is not None and cache_key == self._overview_cache_key_b:
-                    return False
-                self._overview_cache_key_b = cache_key
-
-            try:
-                dpg.delete_item(tag, children_only=True)
-            except Exception:
-                pass
+            # Span the whole track even while it is still decoding.
+            sr = float(getattr(self.transport_a if deck == "A" else self.transport_b, "sample_rate", 44100))
+            total_s = max(wf.duration_s, float(getattr(mgr, "track_len_samples", 0) or 0) / sr)
 
-            mid_y = h * 0.5
-            n = min(len(xs), len(yl), len(ym), len(yh))
-            if n <= 0:
+            raster, tex = self._waveform_texture(tag, w, h)
+            key = (id(wf), int(wf.frames), round(total_s, 3))
+            if raster.key == key:
                 return False
 
-            def _finite(v: float) -> bool:
-                return v == v and v != float("inf") and v != float("-inf")
-
-            max_peak = 0.0
-            for arr in (yl, ym, yh):
-                for v in arr:
-                    try:
-                        fv = float(v)
-                    except Exception:
-                        continue
-                    if not _finite(fv):
-                        continue
-                    if fv > max_peak:
-                        max_peak = fv
-            if max_peak <= 1e-9:
+            cols = wf.columns(0.0, total_s, w)
+            if cols is None:
+                return False
+            max_peak = float(wf.peak)
+            if not (max_peak > 1e-9):
                 max_peak = 1.0
-
-            blue = (60, 140, 255, 220)
-            orange = (255, 140, 40, 220)
-            white = (245, 245, 245, 240)
-
-            # Draw vertical lines per bin.
-            step = max(1, int(n // max(1, w)))
-            for i in range(0, n, step):
-                x = int((i * (w - 1)) / max(1, n - 1))
-                try:
-                    a_l = float(yl[i]) / max_peak
-                    a_m = float(ym[i]) / max_peak
-                    a_h = float(yh[i]) / max_peak
-                except Exception:
-                    continue
-
-                if not _finite(a_l):
-                    a_l = 0.0
-                if not _finite(a_m):
-                    a_m = 0.0
-                if not _finite(a_h):
-                    a_h = 0.0
-
-                if a_l < 0.0:
-                    a_l = 0.0
-                if a_m < 0.0:
-                    a_m = 0.0
-                if a_h < 0.0:
-                    a_h = 0.0
-                if a_l > 1.0:
-                    a_l = 1.0
-                if a_m > 1.0:
-                    a_m = 1.0
-                if a_h > 1.0:
-                    a_h = 1.0
-
-                # Non-additive overlay: each band drawn independently.
-                r_l = a_l * (h * 0.48)
-                r_m = a_m * (h * 0.48)
-                r_h = a_h * (h * 0.48)
-
-                # Draw order: blue (back), orange (middle), white (top).
-                if r_l > 0.05:
-                    dpg.draw_line((x, mid_y - r_l), (x, mid_y + r_l), color=blue, thickness=2.0, parent=tag)
-                if r_m > 0.05:
-                    dpg.draw_line((x, mid_y - r_m), (x, mid_y + r_m), color=orange, thickness=1.5, parent=tag)
-                if r_h > 0.05:
-                    dpg.draw_line((x, mid_y - r_h), (x, mid_y + r_h), color=white, thickness=2.0, parent=tag)
-            self._draw_clip_overlays(deck, tag, w, h)
+            raster.paint(cols, h * 0.48 / max_peak)
+            raster.key = key
+            dpg.set_value(tex, raster.pixels.ravel())
 
             self._render_deck_overlay(deck)
             return True
@@ -2707,46 +2860,6 @@ class UI:
                 dpg.set_value("status_text", f"Status: Deck {deck} render error: {e}")
             return False
 
-    def _draw_clip_overlays(self, deck: str, parent_tag: str, w: int, h: int):
-        cm = self._get_clip_manager_for_deck(deck)
-        if cm is None:
-            return
-        mgr = self.stem_manager if deck == "A" else self.deck_b
-        if mgr.full_mix is None:
-            return
-
-        try:
-            sr = getattr(self.transport_a if deck == "A" else self.transport_b, "sample_rate", 44100)
-            total_samples = int(mgr.full_mix.shape[0])
-        except Exception:
-            return
-        if total_samples <= 0:
-            return
-
-        lane_h = max(1, int(h / 8))
-
-        def _lane_color(lane: int, alpha: int):
-            base = [
-                (255, 120, 0),
-                (255, 60, 60),
-                (255, 200, 0),
-                (120, 220, 60),
-                (0, 190, 120),
-                (0, 160, 255),
-                (120, 120, 255),
-                (200, 100, 255),
-            ]
-            r, g, b = base[int(lane) % len(base)]
-            return (int(r), int(g), int(b), int(alpha))
-
-        try:
-            pending = list(getattr(cm, "pending_clip_indices", [-2] * 8))
-            active = list(getattr(cm, "active_clip_indices", [-1] * 8))
-        except Exception:
-            return
-
-        self._draw_clip_overlays_window(deck, parent_tag, w, h, 0, total_samples)
-
     def _draw_clip_overlays_window(self, deck: str, parent_tag: str, w: int, h: int, win_start: int, win_end: int):
         cm = self._get_clip_manager_for_deck(deck)
         if cm is None:
@@ -2849,30 +2962,8 @@ class UI:
                     if x1 > x0:
                         dpg.draw_rectangle((x0, y0), (x1, y1), color=_lane_color(lane, 200), fill=_lane_color(lane, 50), parent=parent_tag)
 
-                        # Clip playhead marker (shows looping position inside the active clip).
-                        try:
-                            clip_len = int(clip.end_sample - clip.start_sample)
-                        except Exception:
-                            clip_len = 0
-                        if clip_len > 0:
-                            try:
-                                off = float(cm.clip_playheads[lane])
-                            except Exception:
-                                off = 0.0
-                            t = 0.0
-                            try:
-                                t = max(0.0, min(1.0, float(off) / float(clip_len)))
-                            except Exception:
-                                t = 0.0
-                            xp = int(float(x0) + t * float(max(1, x1 - x0)))
-                            xp = max(x0, min(x1, xp))
-                            dpg.draw_line((xp, y0), (xp, y1), color=(245, 245, 245, 220), thickness=2.0, parent=parent_tag)
-
-            # Pending clip region (queued)
-            if p == -1:
-                # stop queued for lane: show small red marker at the far right of lane band
-                dpg.draw_rectangle((w - 6, y0), (w - 1, y1), color=(200, 40, 40, 220), fill=(200, 40, 40, 90), parent=parent_tag)
-            elif p >= 0:
+            # Pending clip region (queued); a queued stop is marked by _update_clip_markers.
+            if p >= 0:
                 try:
                     clip = cm.grid[lane][p]
                 except Exception:
@@ -2893,19 +2984,12 @@ class UI:
             mgr = self.stem_manager if deck == "A" else self.deck_b
             if not getattr(mgr, "waveform_ready", False):
                 return False
-            xs = getattr(mgr, "waveform_x", None)
-            yl = getattr(mgr, "waveform_y_low", None)
-            ym = getattr(mgr, "waveform_y_mid", None)
-            yh = getattr(mgr, "waveform_y_high", None)
-            if xs is None or yl is None or ym is None or yh is None:
+            wf = getattr(mgr, "waveform", None)
+            if wf is None or not wf.levels:
                 return False
-            if not xs:
-                return False
-
-            try:
-                xs0 = float(xs[0])
-                xs1 = float(xs[-1])
-            except Exception:
+            xs0 = 0.0
+            xs1 = float(wf.duration_s)
+            if xs1 <= 0.0:
                 return False
 
             tag = "deck_a_zoom" if deck == "A" else "deck_b_zoom"
@@ -2926,15 +3010,6 @@ class UI:
             if w <= 4 or h <= 4:
                 return False
 
-            try:
-                cache_key = (w, h, id(xs), id(yl), id(ym), id(yh), len(xs))
-            except Exception:
-                cache_key = None
-            if deck == "A":
-                last = self._zoom_cache_key_a
-            else:
-                last = self._zoom_cache_key_b
-
             tr = self.transport_a if deck == "A" else self.transport_b
             sr = getattr(tr, "sample_rate", 44100)
             center_s = float(self._deck_center_samples(deck)) / float(sr)
@@ -2951,121 +3026,47 @@ class UI:
             else:
                 start_s = max(xs0, start_s)
                 end_s = min(xs1, end_s)
+            if end_s - start_s <= 0.0:
+                return False
 
-            try:
-                pix_s = float(self._zoom_window_sec) / float(max(1, w))
-            except Exception:
-                pix_s = 0.0
-            if last is not None and cache_key is not None:
-                try:
-                    last_w, last_h, last_xs_id, last_yl_id, last_ym_id, last_yh_id, last_len, last_start_s = last
-                    if (
-                        last_w == w
-                        and last_h == h
-                        and last_xs_id == id(xs)
-                        and last_yl_id == id(yl)
-                        and last_ym_id == id(ym)
-                        and last_yh_id == id(yh)
-                        and last_len == len(xs)
-                        and pix_s > 0.0
-                        and abs(float(start_s) - float(last_start_s)) < (pix_s * 0.9)
-                    ):
+            raster, tex = self._waveform_texture(tag, w, h)
+            # Fixed gain (track peak) so already-drawn columns stay valid while scrolling.
+            max_peak = float(wf.peak)
+            if not (max_peak > 1e-9):
+                max_peak = 1.0
+            gain = h * 0.48 / max_peak
+            key = (id(wf), int(wf.frames), float(self._zoom_window_sec))
+
+            # Away from the track edges the window has a fixed scale: snap it to
+            # whole columns and scroll the image instead of repainting it.
+            pix_s = float(self._zoom_window_sec) / float(w)
+            steady = (end_s - start_s) >= float(self._zoom_window_sec) - 1e-6
+            if steady:
+                first_col = int(round(start_s / pix_s))
+                if raster.key == key and raster.first_col is not None and abs(first_col - raster.first_col) < w:
+                    dx = first_col - raster.first_col
+                    if dx == 0:
                         return False
-                except Exception:
-                    pass
-
-            if cache_key is not None:
-                new_key = (w, h, id(xs), id(yl), id(ym), id(yh), len(xs), float(start_s))
-                if deck == "A":
-                    self._zoom_cache_key_a = new_key
+                    raster.scroll(dx)
+                    if dx > 0:
+                        cols = wf.columns((first_col + w - dx) * pix_s, (first_col + w) * pix_s, dx)
+                        x0 = w - dx
+                    else:
+                        cols = wf.columns(first_col * pix_s, (first_col - dx) * pix_s, -dx)
+                        x0 = 0
                 else:
-                    self._zoom_cache_key_b = new_key
-
-            dpg.delete_item(tag, children_only=True)
-
-            # Match older implementation: scan indices in the cached envelope.
-            idxs = []
-            for i, t in enumerate(xs):
-                try:
-                    ft = float(t)
-                except Exception:
-                    continue
-                if ft < start_s:
-                    continue
-                if ft > end_s:
-                    break
-                idxs.append(i)
-            if len(idxs) < 2:
+                    cols = wf.columns(first_col * pix_s, (first_col + w) * pix_s, w)
+                    x0 = 0
+                    raster.first_col = first_col
+            else:
+                cols = wf.columns(start_s, end_s, w)
+                x0 = 0
+                raster.first_col = None
+            if cols is None:
                 return False
-
-            mid_y = h * 0.5
-
-            def _finite(v: float) -> bool:
-                return v == v and v != float("inf") and v != float("-inf")
-
-            max_peak = 0.0
-            for i in idxs:
-                for arr in (yl, ym, yh):
-                    try:
-                        fv = float(arr[i])
-                    except Exception:
-                        continue
-                    if not _finite(fv):
-                        continue
-                    if fv > max_peak:
-                        max_peak = fv
-            if max_peak <= 1e-9:
-                max_peak = 1.0
-
-            blue = (60, 140, 255, 220)
-            orange = (255, 140, 40, 220)
-            white = (245, 245, 245, 240)
-
-            m = len(idxs)
-            step = max(1, int(m // max(1, w)))
-            j = 0
-            for k in range(0, m, step):
-                i = idxs[k]
-                x = int((j * (w - 1)) / max(1, int((m + step - 1) // step) - 1))
-                try:
-                    a_l = float(yl[i]) / max_peak
-                    a_m = float(ym[i]) / max_peak
-                    a_h = float(yh[i]) / max_peak
-                except Exception:
-                    continue
-                if not _finite(a_l):
-                    a_l = 0.0
-                if not _finite(a_m):
-                    a_m = 0.0
-                if not _finite(a_h):
-                    a_h = 0.0
-                if a_l < 0.0:
-                    a_l = 0.0
-                if a_m < 0.0:
-                    a_m = 0.0
-                if a_h < 0.0:
-                    a_h = 0.0
-                if a_l > 1.0:
-                    a_l = 1.0
-                if a_m > 1.0:
-                    a_m = 1.0
-                if a_h > 1.0:
-                    a_h = 1.0
-
-                # Non-additive overlay: each band drawn independently.
-                r_l = a_l * (h * 0.48)
-                r_m = a_m * (h * 0.48)
-                r_h = a_h * (h * 0.48)
-
-                # Draw order: blue (back), orange (middle), white (top).
-                if r_l > 0.05:
-                    dpg.draw_line((x, mid_y - r_l), (x, mid_y + r_l), color=blue, thickness=2.0, parent=tag)
-                if r_m > 0.05:
-                    dpg.draw_line((x, mid_y - r_m), (x, mid_y + r_m), color=orange, thickness=1.5, parent=tag)
-                if r_h > 0.05:
-                    dpg.draw_line((x, mid_y - r_h), (x, mid_y + r_h), color=white, thickness=2.0, parent=tag)
-
-                j += 1
+            raster.paint(cols, gain, x0)
+            raster.key = key
+            dpg.set_value(tex, raster.pixels.ravel())
 
             self._render_deck_overlay(deck)
             return True
@@ -3115,33 +3116,26 @@ class UI:
                 return
 
             # Replace debug text/border each time.
-            if dpg.does_item_exist(txt_tag):
-                try:
-                    dpg.delete_item(txt_tag)
-                except Exception:
-                    pass
-            if dpg.does_item_exist(border_tag):
-                try:
-                    dpg.delete_item(border_tag)
-                except Exception:
-                    pass
+            for tag in (txt_tag, border_tag):
+                if dpg.does_item_exist(tag):
+                    try:
+                        dpg.delete_item(tag)
+                        self._count_draw_items(deleted=1)
+                    except Exception:
+                        pass
 
             ready = bool(getattr(mgr, "waveform_ready", False))
-            xs = getattr(mgr, "waveform_x", None)
-            yl = getattr(mgr, "waveform_y_low", None)
-            ym = getattr(mgr, "waveform_y_mid", None)
-            yh = getattr(mgr, "waveform_y_high", None)
+            wf = getattr(mgr, "waveform", None)
             full = getattr(mgr, "full_mix", None)
             full_n = int(full.shape[0]) if full is not None else 0
 
-            nx = len(xs) if isinstance(xs, list) else (-1 if xs is None else 0)
-            nl = len(yl) if isinstance(yl, list) else (-1 if yl is None else 0)
-            nm = len(ym) if isinstance(ym, list) else (-1 if ym is None else 0)
-            nh = len(yh) if isinstance(yh, list) else (-1 if yh is None else 0)
+            levels = len(wf.levels) if wf is not None else -1
+            base = int(wf.levels[0]["max"].shape[0]) if wf is not None and wf.levels else -1
 
             dpg.draw_rectangle((1, 1), (w - 2, h - 2), color=(0, 255, 255, 255), thickness=1.0, parent=parent, tag=border_tag)
-            msg = f"Deck {deck}  size={w}x{h}  ready={ready}  full={full_n}  x={nx}  L={nl}  M={nm}  H={nh}"
+            msg = f"Deck {deck}  size={w}x{h}  ready={ready}  full={full_n}  levels={levels}  bins={base}"
             dpg.draw_text((6, 6), msg, color=(255, 255, 0, 255), size=14, parent=parent, tag=txt_tag)
+            self._count_draw_items(created=2)
         except Exception as e:
             if dpg.does_item_exist("status_text"):
                 dpg.set_value("status_text", f"Status: Deck {deck} debug error: {e}")
@@ -3151,6 +3145,8 @@ class UI:
 
     def debug_mode_callback(self, sender, app_data):
         self._debug_mode = bool(app_data)
+        if dpg.does_item_exist("debug_hud"):
+            dpg.configure_item("debug_hud", show=self._debug_mode)
 
     def _position_debug_window(self):
         if not dpg.does_item_exist("debug_window"):
@@ -3224,16 +3220,24 @@ class UI:
         parent_over = "deck_a_overview" if deck == "A" else "deck_b_overview"
         parent_zoom = "deck_a_zoom" if deck == "A" else "deck_b_zoom"
 
-        tag_over = "deck_a_playhead_over" if deck == "A" else "deck_b_cue_over"
-        tag_zoom = "deck_a_playhead_zoom" if deck == "A" else "deck_b_cue_zoom"
+        tr = self.transport_a if deck == "A" else self.transport_b
+        if deck == "A":
+            pos = int(self.transport_a.play_head_samples)
+            color = (0, 255, 120, 255)
+        else:
+            pos = int(self.transport_b.play_head_samples)
+            color = (255, 220, 0, 255)
 
-        for parent, tag in ((parent_over, tag_over), (parent_zoom, tag_zoom)):
-            if dpg.does_item_exist(tag):
-                try:
-                    dpg.delete_item(tag)
-                except Exception:
-                    pass
+        # Beat grid + clip boxes only change with the track, BPM or clip state.
+        cm = self._get_clip_manager_for_deck(deck)
+        content = (
+            total,
+            float(getattr(tr, "samples_per_beat", 0.0) or 0.0),
+            int(getattr(tr, "beats_per_bar", 4) or 4),
+            self._clip_signature(cm),
+        )
 
+        for parent in (parent_over, parent_zoom):
             try:
                 w, h = dpg.get_item_rect_size(parent)
             except Exception:
@@ -3250,17 +3254,9 @@ class UI:
             if w <= 4 or h <= 4:
                 continue
 
-            if deck == "A":
-                pos = int(self.transport_a.play_head_samples)
-                color = (0, 255, 120, 255)
-            else:
-                pos = int(self.transport_b.play_head_samples)
-                color = (255, 220, 0, 255)
-
             if parent == parent_over:
-                x = int((float(pos) / float(total)) * float(w - 1))
+                start, end = 0, total
             else:
-                tr = self.transport_a if deck == "A" else self.transport_b
                 sr = getattr(tr, "sample_rate", 44100)
                 center = self._deck_center_samples(deck)
                 half = int((self._zoom_window_sec * sr) / 2)
@@ -3268,33 +3264,13 @@ class UI:
                 end = min(total, center + half)
                 if end <= start:
                     continue
-                p = max(start, min(end, pos))
-                x = int((float(p - start) / float(end - start)) * float(w - 1))
-
-            dpg.draw_line((x, 0), (x, h), color=color, thickness=2.0, parent=parent, tag=tag)
-
-            # Clip boxes + per-lane clip playheads should update continuously (overlay layer).
-            overlay_tag = f"deck_{str(deck).lower()}_clip_overlay_{'over' if parent == parent_over else 'zoom'}"
-            if not dpg.does_item_exist(overlay_tag):
-                try:
-                    with dpg.draw_layer(tag=overlay_tag, parent=parent):
-                        pass
-                except Exception:
-                    overlay_tag = None
-
-            if overlay_tag is not None and dpg.does_item_exist(overlay_tag):
-                try:
-                    dpg.delete_item(overlay_tag, children_only=True)
-                except Exception:
-                    pass
 
-            if overlay_tag is not None and dpg.does_item_exist(overlay_tag):
-                if parent == parent_over:
-                    self._draw_beat_ticks_window(deck, overlay_tag, w, h, 0, total)
-                    self._draw_clip_overlays_window(deck, overlay_tag, w, h, 0, total)
-                else:
-                    self._draw_beat_ticks_window(deck, overlay_tag, w, h, start, end)
-                    self._draw_clip_overlays_window(deck, overlay_tag, w, h, start, end)
+            try:
+                static, dynamic = self._overlay_nodes(parent)
+                self._update_overlay_static(deck, parent, static, w, h, start, end, total, content)
+                self._update_overlay_dynamic(deck, parent, dynamic, w, h, start, end, pos, color)
+            except Exception:
+                pass
 
         # Update slider to reflect Deck A position
         if deck == "A" and dpg.does_item_exist("position_slider"):
@@ -3304,6 +3280,140 @@ class UI:
             finally:
                 self._updating_position_slider = False
 
+    def _clip_signature(self, cm):
+        if cm is None:
+            return None
+        try:
+            grid = tuple(
+                (lane, slot, int(c.start_sample), int(c.end_sample))
+                for lane, row in enumerate(cm.grid)
+                for slot, c in enumerate(row)
+                if c is not None
+            )
+            return (grid, tuple(int(v) for v in cm.active_clip_indices), tuple(int(v) for v in cm.pending_clip_indices))
+        except Exception:
+            return None
+
+    def _overlay_nodes(self, parent: str):
+        """Static (beat grid, clip boxes) node and dynamic (playheads, markers) layer of a view.
+
+        Both are created once, above the waveform image, and kept for the
+        lifetime of the drawlist.
+        """
+        static = f"{parent}_overlay_static"
+        dynamic = f"{parent}_overlay_dynamic"
+        if not (dpg.does_item_exist(static) and dpg.does_item_exist(dynamic)):
+            for item in (static, dynamic):
+                if dpg.does_item_exist(item):
+                    self._count_draw_items(deleted=1 + self._draw_children(item))
+                    dpg.delete_item(item)
+            dpg.add_draw_node(tag=static, parent=parent)
+            dpg.add_draw_layer(tag=dynamic, parent=parent)
+            self._count_draw_items(created=2)
+            self._overlay_state.pop(parent, None)
+        return static, dynamic
+
+    def _update_overlay_static(self, deck: str, parent: str, node: str, w: int, h: int, start: int, end: int, total: int, content):
+        state = self._overlay_state.get(parent)
+        scale = float(w - 1) / float(max(1, end - start))
+
+        if parent.endswith("_overview"):
+            key = (w, h, content)
+            if state is not None and state["key"] == key:
+                return
+            self._count_draw_items(deleted=self._draw_children(node))
+            dpg.delete_item(node, children_only=True)
+            self._draw_beat_ticks_window(deck, node, w, h, start, end)
+            self._draw_clip_overlays_window(deck, node, w, h, start, end)
+            self._count_draw_items(created=self._draw_children(node))
+            self._overlay_state[parent] = {"key": key}
+            return
+
+        # Zoom: draw three windows' worth once, then slide the node with a
+        # translation as the window moves; rebuild when it runs off the edge.
+        key = (w, h, round(scale, 9), content)
+        ok = (
+            state is not None
+            and state["key"] == key
+            and state["start"] <= start
+            and end <= state["end"]
+        )
+        if not ok:
+            span = end - start
+            b_start = max(0, start - span)
+            b_end = min(total, end + span)
+            b_w = int(round(float(b_end - b_start) * scale)) + 1
+            self._count_draw_items(deleted=self._draw_children(node))
+            dpg.delete_item(node, children_only=True)
+            self._draw_beat_ticks_window(deck, node, b_w, h, b_start, b_end)
+            self._draw_clip_overlays_window(deck, node, b_w, h, b_start, b_end)
+            self._count_draw_items(created=self._draw_children(node))
+            state = {"key": key, "start": b_start, "end": b_end, "scale": float(b_w - 1) / float(max(1, b_end - b_start))}
+            self._overlay_state[parent] = state
+        dx = -float(start - state["start"]) * state["scale"]
+        dpg.apply_transform(node, dpg.create_translation_matrix([dx, 0.0]))
+
+    def _update_overlay_dynamic(self, deck: str, parent: str, layer: str, w: int, h: int, start: int, end: int, pos: int, color):
+        p = max(start, min(end, int(pos)))
+        x = int((float(p - start) / float(max(1, end - start))) * float(w - 1))
+        tag = f"{parent}_playhead"
+        if dpg.does_item_exist(tag):
+            dpg.configure_item(tag, p1=(x, 0), p2=(x, h))
+        else:
+            dpg.draw_line((x, 0), (x, h), color=color, thickness=2.0, parent=layer, tag=tag)
+            self._count_draw_items(created=1)
+        self._update_clip_markers(deck, parent, layer, w, h, start, end)
+
+    def _update_clip_markers(self, deck: str, parent: str, layer: str, w: int, h: int, start: int, end: int):
+        """Per-lane clip playheads and queued-stop markers, moved in place every frame."""
+        cm = self._get_clip_manager_for_deck(deck)
+        lane_h = max(1, int(h / 8))
+        for lane in range(8):
+            y0 = lane * lane_h
+            y1 = min(h, y0 + lane_h)
+            line_tag = f"{parent}_clip_playhead_{lane}"
+            stop_tag = f"{parent}_clip_stop_{lane}"
+            if not dpg.does_item_exist(line_tag):
+                dpg.draw_line((0, y0), (0, y1), color=(245, 245, 245, 220), thickness=2.0, parent=layer, tag=line_tag, show=False)
+                self._count_draw_items(created=1)
+            if not dpg.does_item_exist(stop_tag):
+                dpg.draw_rectangle((0, y0), (1, y1), color=(200, 40, 40, 220), fill=(200, 40, 40, 90), parent=layer, tag=stop_tag, show=False)
+                self._count_draw_items(created=1)
+
+            xp = None
+            stop = False
+            if cm is not None and y1 > y0:
+                try:
+                    stop = int(cm.pending_clip_indices[lane]) == -1
+                    a = int(cm.active_clip_indices[lane])
+                    clip = cm.grid[lane][a] if a >= 0 else None
+                except Exception:
+                    clip = None
+                if clip is not None and not (int(clip.end_sample) < start or int(clip.start_sample) > end):
+                    x0 = self._window_x(int(clip.start_sample), start, end, w)
+                    x1 = self._window_x(int(clip.end_sample), start, end, w)
+                    clip_len = int(clip.end_sample - clip.start_sample)
+                    if x1 > x0 and clip_len > 0:
+                        try:
+                            t = max(0.0, min(1.0, float(cm.clip_playheads[lane]) / float(clip_len)))
+                        except Exception:
+                            t = 0.0
+                        xp = max(x0, min(x1, int(float(x0) + t * float(max(1, x1 - x0)))))
+
+            if xp is not None:
+                dpg.configure_item(line_tag, p1=(xp, y0), p2=(xp, y1), show=True)
+            else:
+                dpg.configure_item(line_tag, show=False)
+            if stop:
+                dpg.configure_item(stop_tag, pmin=(w - 6, y0), pmax=(w - 1, y1), show=True)
+            else:
+                dpg.configure_item(stop_tag, show=False)
+
+    def _window_x(self, smp: int, start: int, end: int, w: int) -> int:
+        p = max(start, min(end, int(smp)))
+        x = int((float(p - start) / float(max(1, end - start))) * float(w - 1))
+        return max(0, min(w - 1, x))
+
     def _draw_beat_ticks_window(self, deck: str, parent: str, w: int, h: int, start: int, end: int):
         try:
             if end <= start:
@@ -3426,12 +3536,10 @@ class UI:
         p = Path(dpg.get_value("library_folder")).expanduser()
         if p.exists() and p.is_dir():
             self.library.add_folder(p)
-            self.library.scan()
-            self.library_refresh_listbox()
+            self.library.scan_async()
 
     def library_scan_callback(self):
-        self.library.scan()
-        self.library_refresh_listbox()
+        self.library.scan_async()
 
     def library_search_callback(self, sender, app_data):
         self.library.filter_text = app_data
@@ -3452,8 +3560,31 @@ class UI:
         labels = self._library_labels(items)
         if app_data in labels:
             self.library.selected_index = labels.index(app_data)
+            self._prioritize_library_analysis(items, self.library.selected_index)
             self._update_library_key_display()
 
+    def library_recommend_callback(self, sender, app_data):
+        # Make the suggestion the library selection so the load buttons/keys act on it.
+        labels = self._library_labels(self._recommend_items)
+        if app_data not in labels:
+            return
+        t = self._recommend_items[labels.index(app_data)]
+        items = self.library.filtered_tracks()
+        if t not in items:
+            self.library.filter_text = ""
+            if dpg.does_item_exist("library_search"):
+                dpg.set_value("library_search", "")
+            items = self.library.filtered_tracks()
+        if t in items:
+            self.library.selected_index = items.index(t)
+            self.library_refresh_listbox()
+
+    def _prioritize_library_analysis(self, items, idx: int):
+        # Analyze what the user is looking at before the rest of the backlog.
+        lo = max(0, idx - 6)
+        self.library.prioritize_analysis([t.track_id for t in items[lo : idx + 12]], ANALYSIS_PRIORITY_VISIBLE)
+        self.library.prioritize_analysis([items[idx].track_id], ANALYSIS_PRIORITY_SELECTED)
+
     def library_focus_search(self):
         if dpg.does_item_exist("library_search"):
             dpg.focus_item("library_search")
@@ -3476,7 +3607,9 @@ class UI:
         self._waveform_plotted = False
         self._deck_b_waveform_plotted = False
         self._last_zoom_update = 0.0
-        self.stem_manager.load_track(str(sel.path), track_id=sel.track_id, cache_dir=cache_dir)
+        # The audio worker separates and plays the stems; this copy only decodes
+        # for the waveform views and follows its progress via poll_status().
+        self.stem_manager.load_track(str(sel.path), track_id=sel.track_id, cache_dir=cache_dir, start_separation=False)
         try:
             self.transport_a.seek(0)
         except Exception:
@@ -3521,10 +3654,9 @@ class UI:
     def _library_labels(self, items):
         labels = []
         for t in items:
-            meta = self.library.get_meta(t.track_id)
             status = "READY" if t.stems_ready else "RAW"
-            bpm_val = meta.get("bpm", t.bpm)
-            camelot = meta.get("camelot", None)
+            bpm_val = t.bpm
+            camelot = t.camelot
             bpm = f"{float(bpm_val):.1f}" if bpm_val is not None else "?"
             ck = camelot if camelot else "--"
             labels.append(f"[{status}] bpm:{bpm}  {ck}  {t.name}")
@@ -3582,8 +3714,34 @@ class UI:
         if dpg.does_item_exist("library_key_color"):
             rgba = self._camelot_color_rgba(camelot) if camelot else (0, 0, 0, 255)
             dpg.set_value("library_key_color", rgba)
+        self._update_library_thumbnail(sel)
+
+    def _update_library_thumbnail(self, sel):
+        # Drawn from the waveform cached by an earlier load; blank until then.
+        if not dpg.does_item_exist("library_thumb"):
+            return
+        path = self.library.cache_root / "tracks" / sel.track_id / WAVEFORM_NAME
+        try:
+            mtime = path.stat().st_mtime
+        except Exception:
+            mtime = None
+        key = (sel.track_id, mtime)
+        if key == self._library_thumb_key:
+            return
+        self._library_thumb_key = key
+        w, h = 160, 18
+        raster, tex = self._waveform_texture("library_thumb", w, h, colors=THUMB_COLORS)
+        env = load_thumbnail(path, points=w) if mtime is not None else None
+        peak = float(env.max()) if env is not None and env.shape[0] else 0.0
+        if peak > 1e-9:
+            idx = (np.arange(w) * env.shape[0]) // w
+            raster.paint({"peak": env[idx]}, gain=h * 0.45 / peak)
+        else:
+            raster.pixels[:] = 0.0
+        dpg.set_value(tex, raster.pixels.ravel())
 
     def library_refresh_listbox(self, set_focus: bool = False):
+        self._library_list_key = (self.library.version, self.library.filter_text)
         items = self.library.filtered_tracks()
         labels = self._library_labels(items)
 
@@ -3593,6 +3751,7 @@ class UI:
         if labels:
             idx = max(0, min(self.library.selected_index, len(labels) - 1))
             self.library.selected_index = idx
+            self._prioritize_library_analysis(items, idx)
             dpg.set_value("library_list", labels[idx])
             if set_focus:
                 dpg.focus_item("library_list")
@@ -3636,7 +3795,7 @@ class UI:
         if not file_path:
             return
         try:
-            self.stem_manager.load_track(file_path)
+            self.stem_manager.load_track(file_path, start_separation=False)
         except Exception:
             pass
         try:
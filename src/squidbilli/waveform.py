@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Band edges (Hz): low < 200 <= mid < 2000 <= high.
+WAVE_LOW_HZ = 200.0
+WAVE_HIGH_HZ = 2000.0
+
+# Level 0 resolution: 256 samples per bin (~5.8 ms at 44.1 kHz).
+BASE_HOP = 256
+# Band energies are analyzed over at least this many samples (~43 Hz resolution).
+BAND_FRAME = 1024
+# Stop halving once a level fits in this many bins.
+MIN_LEVEL_BINS = 256
+
+FIELDS = ("min", "max", "low", "mid", "high")
+
+# Cached next to the track's stems; bump the version when the analysis changes.
+WAVEFORM_NAME = "waveform.npz"
+WAVEFORM_VERSION = 1
+
+
+def _bin_minmax(x: np.ndarray, hop: int) -> tuple[np.ndarray, np.ndarray]:
+    """Min/max per hop-sized bin (last partial bin included) as float32."""
+    n = int(x.shape[0])
+    full = n // hop
+    nbins = full + (1 if n % hop else 0)
+    mn = np.empty(nbins, dtype=np.float32)
+    mx = np.empty(nbins, dtype=np.float32)
+    if full:
+        v = x[: full * hop].reshape(full, hop)
+        v.min(axis=1, out=mn[:full])
+        v.max(axis=1, out=mx[:full])
+    if n % hop:
+        mn[full] = x[full * hop :].min()
+        mx[full] = x[full * hop :].max()
+    return mn, mx
+
+
+def _bin_band_peaks(x: np.ndarray, hop: int, sr: int, frame: int) -> np.ndarray:
+    """(3, bins) low/mid/high amplitude per hop-sized bin.
+
+    Bands come from batched, Hann-windowed rffts over `frame`-sample blocks
+    (a multiple of `hop`); each value is the sine-equivalent amplitude of the
+    band and is repeated over the bins its block covers.
+    """
+    n = int(x.shape[0])
+    nbins = -(-n // hop)
+    out = np.zeros((3, nbins), dtype=np.float32)
+    if n == 0:
+        return out
+
+    f = np.fft.rfftfreq(frame, 1.0 / float(sr))
+    masks = (f < WAVE_LOW_HZ, (f >= WAVE_LOW_HZ) & (f < WAVE_HIGH_HZ), f >= WAVE_HIGH_HZ)
+
+    win = np.hanning(frame).astype(np.float32)
+
+    def bands(spec: np.ndarray, scale: float, dst: np.ndarray):
+        power = spec.real * spec.real + spec.imag * spec.imag
+        for k, m in enumerate(masks):
+            dst[k] = np.sqrt(power[:, m].sum(axis=1)) * np.float32(scale)
+
+    full = n // frame
+    res = np.empty((3, full + (1 if n % frame else 0)), dtype=np.float32)
+    step = 2048
+    for a in range(0, full, step):
+        b = min(full, a + step)
+        spec = np.fft.rfft(x[a * frame : b * frame].reshape(b - a, frame) * win, axis=1)
+        bands(spec, 2.0 / np.sqrt(frame * float(np.sum(win * win))), res[:, a:b])
+    if n % frame:
+        rem = x[full * frame :]
+        rwin = np.hanning(rem.shape[0]).astype(np.float32) if rem.shape[0] > 2 else np.ones(rem.shape[0], np.float32)
+        spec = np.fft.rfft(rem * rwin, n=frame)[None, :]
+        bands(spec, 2.0 / np.sqrt(frame * float(np.sum(rwin * rwin)) + 1e-12), res[:, full:])
+
+    out[:] = np.repeat(res, frame // hop, axis=1)[:, :nbins]
+    return out
+
+
+def _build_levels(base: Dict[str, np.ndarray]) -> List[Dict[str, np.ndarray]]:
+    levels = [base]
+    cur = base
+    while cur["max"].shape[0] > MIN_LEVEL_BINS:
+        m = int(cur["max"].shape[0])
+        even = m - (m % 2)
+        nxt = {}
+        for k, v in cur.items():
+            pairs = v[:even].reshape(-1, 2)
+            r = pairs.min(axis=1) if k == "min" else pairs.max(axis=1)
+            if m % 2:
+                r = np.append(r, v[-1])
+            nxt[k] = r
+        levels.append(nxt)
+        cur = nxt
+    return levels
+
+
+@dataclass
+class WaveformPyramid:
+    """Mipmapped waveform: level L has one bin per hop * 2**L samples.
+
+    Every level holds min/max of the mono mix and low/mid/high band
+    amplitude; coarser levels take min/max of pairs. `columns` picks the
+    level closest to the requested pixel density, so drawing any range
+    costs O(pixels) regardless of track length or zoom.
+    """
+
+    sample_rate: int
+    hop: int
+    frames: int
+    levels: List[Dict[str, np.ndarray]] = field(default_factory=list)
+    peak: float = 0.0
+
+    @property
+    def duration_s(self) -> float:
+        return float(self.frames) / float(max(1, self.sample_rate))
+
+    def bin_seconds(self, level: int) -> float:
+        return float(self.hop << int(level)) / float(max(1, self.sample_rate))
+
+    def level_for(self, seconds_per_pixel: float) -> int:
+        """Coarsest level that still has at least one bin per pixel."""
+        if not self.levels or seconds_per_pixel <= 0.0:
+            return 0
+        ratio = float(seconds_per_pixel) / self.bin_seconds(0)
+        if ratio < 2.0:
+            return 0
+        return min(len(self.levels) - 1, int(np.log2(ratio)))
+
+    def columns(self, start_s: float, end_s: float, pixels: int) -> Optional[Dict[str, np.ndarray]]:
+        """Per-pixel min/max/band values for [start_s, end_s); zeros outside the track."""
+        pixels = int(pixels)
+        if pixels <= 0 or not self.levels or end_s <= start_s:
+            return None
+        px_s = (float(end_s) - float(start_s)) / float(pixels)
+        lv = self.level_for(px_s)
+        arrs = self.levels[lv]
+        m = int(arrs["max"].shape[0])
+        if m == 0:
+            return None
+        bin_s = self.bin_seconds(lv)
+
+        edges = np.floor((float(start_s) + np.arange(pixels + 1, dtype=np.float64) * px_s) / bin_s).astype(np.int64)
+        lo = edges[:-1]
+        hi = np.minimum(np.maximum(edges[1:], lo + 1), m)
+        valid = (lo >= 0) & (lo < m)
+        first = np.clip(lo, 0, m - 1)
+        span = int((hi - lo).max()) if valid.any() else 1
+
+        out = {}
+        for k, v in arrs.items():
+            reduce = np.minimum if k == "min" else np.maximum
+            acc = v[first]
+            # The chosen level has 1-2 bins per pixel, so this loop is short.
+            for d in range(1, max(1, span)):
+                j = lo + d
+                acc = np.where(j < hi, reduce(acc, v[np.clip(j, 0, m - 1)]), acc)
+            out[k] = np.where(valid, acc, np.float32(0.0)).astype(np.float32, copy=False)
+        return out
+
+
+# Draw order back to front; colors are 0-255 RGBA.
+BAND_COLORS = (
+    ("low", (60, 140, 255, 220)),
+    ("mid", (255, 140, 40, 220)),
+    ("high", (245, 245, 245, 240)),
+)
+
+
+class WaveformRaster:
+    """RGBA float32 image of a waveform view, uploaded as a dynamic texture.
+
+    Bands are drawn as centered vertical bars, one pixel column per value,
+    with vectorized masked fills. `scroll` shifts the image so a moving
+    view only has to paint the columns that came into sight.
+    """
+
+    def __init__(self, width: int, height: int, colors=BAND_COLORS):
+        self.width = int(width)
+        self.height = int(height)
+        self.pixels = np.zeros((self.height, self.width, 4), dtype=np.float32)
+        # Distance of each row's center from the horizontal midline.
+        self._dist = np.abs(np.arange(self.height, dtype=np.float32) + 0.5 - self.height * 0.5)[:, None]
+        # (field, rgba) drawn in order, so later fields paint over earlier ones.
+        self._colors = [(band, np.asarray(rgba, dtype=np.float32) / 255.0) for band, rgba in colors]
+        # What the image currently shows, and the absolute column at x=0 (for scrolling views).
+        self.key = None
+        self.first_col: Optional[int] = None
+
+    def paint(self, cols: Dict[str, np.ndarray], gain: float, x0: int = 0):
+        """Repaint columns x0.. from per-column band values; `gain` maps amplitude to pixels."""
+        n = min(int(cols[self._colors[0][0]].shape[0]), self.width - int(x0))
+        if n <= 0:
+            return
+        region = self.pixels[:, x0 : x0 + n]
+        region[:] = 0.0
+        limit = self.height * 0.48
+        for band, rgba in self._colors:
+            r = np.clip(np.nan_to_num(cols[band][:n]) * np.float32(gain), 0.0, limit)
+            r[r <= 0.05] = -1.0
+            region[self._dist <= r[None, :]] = rgba
+
+    def scroll(self, dx: int):
+        """Move content left by dx columns (right if negative); vacated columns are cleared."""
+        dx = int(dx)
+        if dx == 0:
+            return
+        if abs(dx) >= self.width:
+            self.pixels[:] = 0.0
+        elif dx > 0:
+            self.pixels[:, :-dx] = self.pixels[:, dx:]
+            self.pixels[:, -dx:] = 0.0
+        else:
+            self.pixels[:, -dx:] = self.pixels[:, :dx]
+            self.pixels[:, :-dx] = 0.0
+        if self.first_col is not None:
+            self.first_col += dx
+
+
+def build_pyramid(
+    mono: np.ndarray,
+    sample_rate: int,
+    prev: Optional[WaveformPyramid] = None,
+    hop: int = BASE_HOP,
+) -> WaveformPyramid:
+    """Build the pyramid for `mono`, reusing `prev`'s base bins for audio it already covered.
+
+    `prev` must describe a prefix of the same signal (e.g. an earlier pass
+    while the track was still decoding).
+    """
+    sr = int(sample_rate)
+    hop = max(1, int(hop))
+    frame = hop * max(1, -(-BAND_FRAME // hop))
+    n = int(mono.shape[0])
+
+    keep = 0
+    if prev is not None and prev.levels and prev.hop == hop and prev.sample_rate == sr:
+        keep = (min(int(prev.frames), n) // frame) * frame
+    kb = keep // hop
+
+    tail = np.ascontiguousarray(mono[keep:], dtype=np.float32)
+    mn, mx = _bin_minmax(tail, hop)
+    bands = _bin_band_peaks(tail, hop, sr, frame)
+    fresh = {"min": mn, "max": mx, "low": bands[0], "mid": bands[1], "high": bands[2]}
+    if kb:
+        old = prev.levels[0]
+        base = {k: np.concatenate([old[k][:kb], fresh[k]]) for k in FIELDS}
+    else:
+        base = fresh
+
+    peak = 0.0
+    for k in ("low", "mid", "high"):
+        if base[k].shape[0]:
+            peak = max(peak, float(np.nanmax(base[k])))
+    return WaveformPyramid(sample_rate=sr, hop=hop, frames=n, levels=_build_levels(base), peak=peak)
+
+
+def save_pyramid(path: str | Path, wf: WaveformPyramid):
+    """Write every level as float16 (plenty for drawing) via a temp file + rename."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "meta": np.array(
+            [WAVEFORM_VERSION, wf.sample_rate, wf.hop, wf.frames, len(wf.levels), BAND_FRAME], dtype=np.int64
+        ),
+        "peak": np.array([wf.peak], dtype=np.float32),
+    }
+    for i, lv in enumerate(wf.levels):
+        for k in FIELDS:
+            arrays[f"l{i}_{k}"] = lv[k].astype(np.float16)
+    tmp = p.with_name(f".{p.name}.partial")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, p)
+
+
+def load_pyramid(path: str | Path, sample_rate: int | None = None) -> Optional[WaveformPyramid]:
+    """Load a cached pyramid; None if missing, stale or for another sample rate."""
+    try:
+        with np.load(str(path)) as z:
+            version, sr, hop, frames, nlevels, band_frame = (int(v) for v in z["meta"])
+            if version != WAVEFORM_VERSION or band_frame != BAND_FRAME:
+                return None
+            if sample_rate is not None and sr != int(sample_rate):
+                return None
+            levels = [{k: z[f"l{i}_{k}"].astype(np.float32) for k in FIELDS} for i in range(nlevels)]
+            peak = float(z["peak"][0])
+    except Exception:
+        return None
+    if not levels:
+        return None
+    return WaveformPyramid(sample_rate=sr, hop=hop, frames=frames, levels=levels, peak=peak)
+
+
+def load_thumbnail(path: str | Path, points: int = 160) -> Optional[np.ndarray]:
+    """Peak envelope of a cached waveform with at least `points` bins (fewer for very short tracks).
+
+    Only the coarsest level that is dense enough is read from the file.
+    """
+    try:
+        with np.load(str(path)) as z:
+            version, _sr, hop, frames, nlevels, _band = (int(v) for v in z["meta"])
+            if version != WAVEFORM_VERSION or nlevels <= 0:
+                return None
+            sizes = [-(-frames // max(1, hop))]
+            for _ in range(1, nlevels):
+                sizes.append(-(-sizes[-1] // 2))
+            lv = 0
+            for i, m in enumerate(sizes):
+                if m >= int(points):
+                    lv = i
+            mx = z[f"l{lv}_max"].astype(np.float32)
+            mn = z[f"l{lv}_min"].astype(np.float32)
+    except Exception:
+        return None
+    return np.maximum(mx, -mn)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pytest
+
+import squidbilli.cache_manager as cache_manager
+from squidbilli.cache_manager import LAST_LOADED_NAME, CachePolicy, enforce, hot_limit, scan_cache
+from squidbilli.stem_store import STEM_NAMES, write_stems
+
+SR = 44100
+
+
+def make_track(root, tid, age_s, frames=2000):
+    d = root / "tracks" / tid
+    stems = {name: np.zeros((frames, 2), dtype=np.float32) for name in STEM_NAMES}
+    write_stems(d / "stems", stems, SR, "npy")
+    (d / LAST_LOADED_NAME).write_text(f"{time.time() - age_s:.3f}")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Old enough to be outside the "recently loaded" protection; t0 is newest.
+    for i in range(4):
+        make_track(tmp_path, f"t{i}", age_s=2 * 3600 + i * 60)
+    size = max(e.stems_bytes for e in scan_cache(tmp_path))
+    # Small enough that hot_limit keeps hot_tracks as given.
+    monkeypatch.setattr(cache_manager, "HOT_TRACK_BYTES", size // 4)
+    return tmp_path, size
+
+
+def with_stems(root):
+    return sorted(e.track_id for e in scan_cache(root) if e.stems_format is not None)
+
+
+def test_hot_limit_fits_budget():
+    assert hot_limit(CachePolicy()) * cache_manager.HOT_TRACK_BYTES <= CachePolicy().budget_bytes // 2
+    assert hot_limit(CachePolicy(budget_bytes=0)) == 0
+
+
+def test_drop_spares_hot_set_when_cold_tracks_suffice(cache):
+    root, size = cache
+    total = sum(e.total_bytes for e in scan_cache(root))
+    pol = CachePolicy(budget_bytes=total - size, hot_tracks=2, cold_format="npy")
+    assert hot_limit(pol) == 2
+    rep = enforce(root, pol)
+    assert rep.dropped == 1
+    assert with_stems(root) == ["t0", "t1", "t2"]
+
+
+def test_drop_reaches_hot_set_only_when_needed(cache):
+    root, size = cache
+    total = sum(e.total_bytes for e in scan_cache(root))
+    pol = CachePolicy(budget_bytes=total - 3 * size, hot_tracks=2, cold_format="npy")
+    assert hot_limit(pol) == 2
+    rep = enforce(root, pol, protect=["t0"])
+    assert rep.dropped == 3
+    assert with_stems(root) == ["t0"]
+
+
+def test_report_lists_dropped_ids(cache):
+    root, size = cache
+    total = sum(e.total_bytes for e in scan_cache(root))
+    pol = CachePolicy(budget_bytes=total - 2 * size, hot_tracks=2, cold_format="npy")
+    assert enforce(root, pol, dry_run=True).dropped_ids == ["t3", "t2"]
+    assert with_stems(root) == ["t0", "t1", "t2", "t3"]
+    rep = enforce(root, pol)
+    assert rep.dropped_ids == ["t3", "t2"]
+    assert rep.dropped == 2
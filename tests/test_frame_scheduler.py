@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import pytest
+
+import squidbilli.frame_scheduler as frame_scheduler
+from squidbilli.frame_scheduler import (
+    MAX_DEFER_PERIODS,
+    PRIORITY_CRITICAL,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    FrameScheduler,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(frame_scheduler, "time", c)
+    return c
+
+
+def costly(clock, log, name, cost_s):
+    def run():
+        log.append(name)
+        clock.now += cost_s
+
+    return run
+
+
+def test_runs_by_priority_within_budget(clock):
+    log = []
+    sched = FrameScheduler(budget_s=0.008)
+    sched.add("low", costly(clock, log, "low", 0.003), priority=PRIORITY_LOW)
+    sched.add("high", costly(clock, log, "high", 0.003), priority=PRIORITY_HIGH)
+    sched.add("critical", costly(clock, log, "critical", 0.003), priority=PRIORITY_CRITICAL)
+
+    # First frame: costs are unknown, so everything runs, most urgent first.
+    sched.run_frame()
+    assert log == ["critical", "high", "low"]
+    assert sched.stats.over_budget == 1
+
+    # Now the costs are known: critical + high leave no room for low, which waits.
+    log.clear()
+    clock.now += 1.0 / 60.0
+    sched.run_frame()
+    assert log == ["critical", "high"]
+    low = next(t for t in sched.tasks if t.name == "low")
+    assert low.deferred == 1
+
+
+def test_critical_runs_even_over_budget(clock):
+    log = []
+    sched = FrameScheduler(budget_s=0.001)
+    sched.add("a", costly(clock, log, "a", 0.005), priority=PRIORITY_CRITICAL)
+    sched.add("b", costly(clock, log, "b", 0.005), priority=PRIORITY_CRITICAL)
+    for _ in range(3):
+        sched.run_frame()
+        clock.now += 1.0 / 60.0
+    assert log == ["a", "b"] * 3
+
+
+def test_deferral_is_bounded(clock):
+    log = []
+    sched = FrameScheduler(budget_s=0.008)
+    sched.add("hog", costly(clock, log, "hog", 0.008), priority=PRIORITY_HIGH)
+    sched.add("low", costly(clock, log, "low", 0.002), priority=PRIORITY_LOW, interval_s=0.1)
+    sched.run_frame()
+    log.clear()
+
+    frame = 1.0 / 60.0
+    ran_at = None
+    start = clock.now
+    while ran_at is None and clock.now - start < 2.0:
+        clock.now += frame
+        sched.run_frame()
+        if "low" in log:
+            ran_at = clock.now
+    assert ran_at is not None
+    # Deferred until it is MAX_DEFER_PERIODS intervals late, then forced.
+    assert ran_at - start <= 0.1 * MAX_DEFER_PERIODS + 2 * frame + 0.008 * 2
+
+
+def test_interval_and_errors(clock):
+    calls = []
+    sched = FrameScheduler()
+    sched.add("tick", lambda: calls.append(clock.now), interval_s=0.5)
+
+    def broken():
+        raise RuntimeError("boom")
+
+    sched.add("broken", broken)
+    for _ in range(60):
+        sched.run_frame()
+        clock.now += 1.0 / 60.0
+    assert len(calls) == 2
+    snap = sched.snapshot()
+    assert snap["frames"] == 60
+    assert snap["tasks"]["broken"]["errors"] == 60
+    assert snap["tasks"]["tick"]["runs"] == 2
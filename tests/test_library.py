@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from squidbilli.library import ANALYSIS_PRIORITY_CHROMA, TrackLibrary
+from squidbilli.meta_index import META_JSON_NAME
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    calls = []
+
+    def record(self, track_id, path, priority=None, chroma_only=False):
+        calls.append((track_id, priority, chroma_only))
+
+    monkeypatch.setattr(TrackLibrary, "enqueue_analysis", record)
+    return calls
+
+
+def test_baseline_meta_only_needs_chroma(tmp_path, queued):
+    # meta.json as written before analysis versions and chroma were stored.
+    d = tmp_path / "cache" / "tracks" / "t1"
+    d.mkdir(parents=True)
+    (d / META_JSON_NAME).write_text(json.dumps({"bpm": 126.0, "key": "A min", "camelot": "8A", "stems_ready": False}))
+    song = tmp_path / "song.mp3"
+    song.write_bytes(b"")
+
+    lib = TrackLibrary(cache_root=tmp_path / "cache", analysis_workers=1)
+    try:
+        info = lib._track_info("t1", song)
+        assert (info.bpm, info.camelot, info.musical_key) == (126.0, "8A", "A min")
+        assert queued == [("t1", ANALYSIS_PRIORITY_CHROMA, True)]
+
+        # Rows that never went through the migration are treated the same way.
+        queued.clear()
+        lib.meta.put("t2", {"bpm": 100.0, "key": "C maj", "camelot": "8B"})
+        lib._track_info("t2", song)
+        assert queued == [("t2", ANALYSIS_PRIORITY_CHROMA, True)]
+
+        queued.clear()
+        lib.meta.put("t3", {"bpm": 100.0})
+        lib._track_info("t3", song)
+        assert queued == [("t3", None, False)]
+    finally:
+        lib.meta.close()
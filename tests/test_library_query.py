@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from squidbilli.library import TrackInfo
+from squidbilli.library_query import (
+    FacetIndex,
+    LibraryQuery,
+    Query,
+    TextIndex,
+    bpm_compatible,
+    bpm_deviation,
+    camelot_compatible,
+    camelot_neighbors,
+    parse_query,
+)
+
+CAMELOTS = [f"{n}{l}" for n in range(1, 13) for l in "AB"]
+KEYS = ["C maj", "A min", "F# min", "Eb maj", None]
+
+
+def make_tracks(n: int = 2000, seed: int = 7):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 6))) for _ in range(300)]
+    words += ["deep", "house", "techno", "dub", "mix"]
+    tracks = []
+    for i in range(n):
+        name = " ".join(rng.choice(words) for _ in range(3))
+        folder = f"{rng.choice(words)}-{rng.choice(words)}"
+        tracks.append(
+            TrackInfo(
+                track_id=f"t{i}",
+                path=Path(f"/music/{folder}/{name}.mp3"),
+                name=name,
+                stems_ready=False,
+                bpm=rng.uniform(80.0, 170.0) if rng.random() < 0.9 else None,
+                camelot=rng.choice(CAMELOTS) if rng.random() < 0.9 else None,
+                musical_key=rng.choice(KEYS),
+                chroma=tuple(rng.random() for _ in range(12)) if rng.random() < 0.8 else None,
+            )
+        )
+    return tracks
+
+
+def linear(tracks, q: Query):
+    return [i for i, t in enumerate(tracks) if q.matches(t)]
+
+
+def test_parse_query_facets_and_terms():
+    q = parse_query("Deep bpm:120-128~ camelot:8a key:Amin House")
+    assert q.terms == ("deep", "house")
+    assert (q.bpm_min, q.bpm_max, q.bpm_multiples) == (120.0, 128.0, True)
+    assert q.camelot == "8A"
+    assert q.key == "AMIN"
+
+    q = parse_query("bpm:124")
+    assert (q.bpm_min, q.bpm_max, q.bpm_multiples) == (124.0, 124.0, False)
+    assert parse_query("bpm:fast").bpm_min is None
+
+
+def test_refines():
+    assert parse_query("deep h").refines(parse_query("deep"))
+    assert parse_query("deep ho").refines(parse_query("deep h"))
+    assert not parse_query("deep").refines(parse_query("deep h"))
+    assert not parse_query("deep bpm:120-130").refines(parse_query("deep"))
+
+
+def test_text_index_matches_substrings():
+    hays = ["deep house mix /music/a/deep house mix.mp3", "techno /music/b/techno.mp3", "dub-step /music/c/dub-step.wav"]
+    idx = TextIndex(hays)
+    every = np.ones(len(hays), dtype=bool)
+    assert list(np.flatnonzero(idx.match("d", every))) == [0, 2]
+    assert list(np.flatnonzero(idx.match("ous", every))) == [0]
+    assert list(np.flatnonzero(idx.match("hous", every))) == [0]
+    assert list(np.flatnonzero(idx.match("b-st", every))) == [2]
+    assert list(np.flatnonzero(idx.match(".wav", every))) == [2]
+    assert not idx.match("zzz", every).any()
+    only_first = np.array([True, False, False])
+    assert list(np.flatnonzero(idx.match("d", only_first))) == [0]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "d",
+        "de",
+        "dee",
+        "deep",
+        "deep h",
+        "deep hou",
+        "mix.mp3",
+        "/music/",
+        "abc",
+        "bpm:120-125",
+        "bpm:60-65~",
+        "camelot:8A",
+        "key:AMIN",
+        "key:8B deep",
+        "techno bpm:120-130 camelot:5A",
+    ],
+)
+def test_run_matches_linear_filter(text):
+    tracks = make_tracks()
+    engine = LibraryQuery(tracks)
+    q = parse_query(text)
+    assert list(engine.run(q, 1)) == linear(tracks, q)
+
+
+def test_typing_sequence_reuses_previous_result():
+    tracks = make_tracks()
+    engine = LibraryQuery(tracks)
+    typed = ""
+    for ch in "deep house":
+        typed += ch
+        q = parse_query(typed)
+        assert list(engine.run(q, 1)) == linear(tracks, q)
+    # And back out again (not refinements).
+    while typed:
+        typed = typed[:-1]
+        q = parse_query(typed)
+        assert list(engine.run(q, 1)) == linear(tracks, q)
+
+
+def test_camelot_neighbors():
+    assert dict(camelot_neighbors("8A")) == {"8A": 1.0, "9A": 0.8, "7A": 0.8, "8B": 0.7}
+    assert {c for c, _ in camelot_neighbors("12b")} == {"12B", "1B", "11B", "12A"}
+    assert {c for c, _ in camelot_neighbors("1A")} == {"1A", "2A", "12A", "1B"}
+    assert camelot_neighbors("13A") == []
+    assert camelot_neighbors("x") == []
+
+
+def test_compatibility_helpers_match_recommend_rule():
+    assert camelot_compatible("9a", "8A") and camelot_compatible("8B", "8A")
+    assert not camelot_compatible("10A", "8A") and not camelot_compatible(None, "8A")
+    assert bpm_compatible(62.0, 124.0) and bpm_compatible(250.0, 124.0)
+    assert not bpm_compatible(None, 124.0) and not bpm_compatible(124.0, 0.0)
+    rng = np.random.default_rng(3)
+    bpms = rng.uniform(40.0, 260.0, 500)
+    dev = bpm_deviation(bpms, 124.0)
+    assert [bpm_compatible(b, 124.0, 0.06) for b in bpms] == list(dev <= 0.06)
+    assert np.isinf(bpm_deviation(np.nan, 124.0))
+
+
+def reference_recommend(tracks, ref, n, tol):
+    weights = dict(camelot_neighbors(ref.camelot))
+    v = np.asarray(ref.chroma, dtype=np.float64)
+    v = v / np.linalg.norm(v)
+    scored = []
+    for i, t in enumerate(tracks):
+        if t.track_id == ref.track_id or t.camelot not in weights or t.bpm is None:
+            continue
+        dev = min(abs(t.bpm - ref.bpm * m) / (ref.bpm * m) for m in (1.0, 2.0, 0.5))
+        if dev > tol:
+            continue
+        score = weights[t.camelot] + (1.0 - dev / tol)
+        if t.chroma is not None:
+            c = np.asarray(t.chroma, dtype=np.float64)
+            score += float(c @ v / np.linalg.norm(c))
+        scored.append((score, i))
+    scored.sort(key=lambda s: -s[0])
+    return [i for _, i in scored[:n]]
+
+
+def test_recommend_matches_reference():
+    tracks = make_tracks()
+    engine = LibraryQuery(tracks)
+    refs = [t for t in tracks if t.bpm is not None and t.camelot is not None and t.chroma is not None][:20]
+    for ref in refs:
+        got = list(engine.recommend(ref, n=10, bpm_tolerance=0.06))
+        assert got == reference_recommend(tracks, ref, 10, 0.06)
+
+
+def test_recommend_without_features_is_empty():
+    tracks = make_tracks(200)
+    engine = LibraryQuery(tracks)
+    blank = TrackInfo("x", Path("/x.mp3"), "x", False, None, None, None)
+    assert engine.recommend(blank).size == 0
+
+
+def test_update_track_equals_rebuild():
+    tracks = make_tracks()
+    engine = LibraryQuery(tracks)
+    rng = random.Random(3)
+    for _ in range(500):
+        t = tracks[rng.randrange(len(tracks))]
+        t.bpm = rng.choice([None, rng.uniform(80.0, 170.0), 124.0])
+        t.camelot = rng.choice(CAMELOTS + [None])
+        t.musical_key = rng.choice(KEYS)
+        t.chroma = rng.choice([None, tuple(rng.random() for _ in range(12))])
+        assert engine.update_track(t)
+
+    fresh = FacetIndex([t.bpm for t in tracks], [t.camelot for t in tracks], [t.musical_key for t in tracks], [t.chroma for t in tracks])
+    got = engine.facets
+    assert np.array_equal(got.bpm, fresh.bpm, equal_nan=True)
+    assert np.array_equal(got.bpm_sorted, fresh.bpm_sorted)
+    assert np.array_equal(np.sort(got.bpm_pos), np.sort(fresh.bpm_pos))
+    assert np.allclose(got.chroma, fresh.chroma)
+    for a, b in ((got.camelot, fresh.camelot), (got.keys, fresh.keys)):
+        assert a.keys() == b.keys()
+        for k in a:
+            assert np.array_equal(a[k], b[k])
+
+    for text in ("bpm:120-128", "bpm:60-64~ camelot:8A", "key:CMAJ"):
+        q = parse_query(text)
+        assert list(engine.run(q, 2)) == linear(tracks, q)
+    assert not engine.update_track(TrackInfo("missing", Path("/m.mp3"), "m", False, 120.0, "8A", None))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+
+import squidbilli.meta_index as meta_index
+from squidbilli.meta_index import FLUSH_BATCH, INDEX_NAME, META_JSON_NAME, MetadataIndex
+
+
+def stored(root, track_id):
+    db = sqlite3.connect(str(root / INDEX_NAME))
+    try:
+        row = db.execute("SELECT bpm, camelot, meta FROM track_meta WHERE track_id = ?", (track_id,)).fetchone()
+    finally:
+        db.close()
+    return None if row is None else (row[0], row[1], json.loads(row[2]))
+
+
+def test_updates_are_batched(tmp_path):
+    idx = MetadataIndex(tmp_path)
+    try:
+        idx.update("a", {"bpm": 120.0})
+        # Readable immediately from memory, not yet on disk.
+        assert idx.get("a") == {"bpm": 120.0}
+        assert stored(tmp_path, "a") is None
+
+        for i in range(FLUSH_BATCH - 1):
+            idx.update(f"t{i}", {"bpm": float(i)})
+        assert stored(tmp_path, "a") == (120.0, None, {"bpm": 120.0})
+        assert stored(tmp_path, f"t{FLUSH_BATCH - 2}") is not None
+    finally:
+        idx.close()
+
+
+def test_lone_update_flushes_after_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(meta_index, "FLUSH_INTERVAL_S", 0.05)
+    idx = MetadataIndex(tmp_path)
+    try:
+        idx.update("a", {"camelot": "8A"})
+        deadline = time.time() + 2.0
+        while stored(tmp_path, "a") is None and time.time() < deadline:
+            time.sleep(0.02)
+        assert stored(tmp_path, "a") == (None, "8A", {"camelot": "8A"})
+    finally:
+        idx.close()
+
+
+def test_flush_merges_with_other_writers(tmp_path):
+    a = MetadataIndex(tmp_path)
+    b = MetadataIndex(tmp_path)
+    try:
+        a.update("x", {"bpm": 124.0})
+        a.flush()
+        # b never reloaded, so it doesn't know about bpm; its update must not drop it.
+        b.update("x", {"source_url": "https://example.invalid/x"})
+        b.flush()
+        assert stored(tmp_path, "x")[2] == {"bpm": 124.0, "source_url": "https://example.invalid/x"}
+        assert b.get("x") == {"bpm": 124.0, "source_url": "https://example.invalid/x"}
+
+        a.put("x", {"bpm": 90.0})
+        a.flush()
+        assert stored(tmp_path, "x")[2] == {"bpm": 90.0}
+        b.reload()
+        assert b.get("x") == {"bpm": 90.0}
+    finally:
+        a.close()
+        b.close()
+
+
+def test_close_flushes_pending(tmp_path):
+    idx = MetadataIndex(tmp_path)
+    idx.update("a", {"key": "A min"})
+    idx.close()
+    assert stored(tmp_path, "a")[2] == {"key": "A min"}
+    again = MetadataIndex(tmp_path)
+    try:
+        assert again.get("a") == {"key": "A min"}
+    finally:
+        again.close()
+
+
+def test_migrates_meta_json_once(tmp_path):
+    for tid, meta in (("t1", {"bpm": 128.0, "camelot": "5A"}), ("t2", {"stems_ready": True})):
+        d = tmp_path / "tracks" / tid
+        d.mkdir(parents=True)
+        (d / META_JSON_NAME).write_text(json.dumps(meta))
+    (tmp_path / "tracks" / "broken").mkdir()
+    (tmp_path / "tracks" / "broken" / META_JSON_NAME).write_text("{not json")
+
+    idx = MetadataIndex(tmp_path)
+    try:
+        assert idx.get("t1") == {"bpm": 128.0, "camelot": "5A"}
+        assert idx.get("t2") == {"stems_ready": True}
+        assert idx.get("broken") == {}
+        assert stored(tmp_path, "t1")[:2] == (128.0, "5A")
+    finally:
+        idx.close()
+
+    # Later edits to meta.json are not re-imported.
+    (tmp_path / "tracks" / "t1" / META_JSON_NAME).write_text(json.dumps({"bpm": 1.0}))
+    idx = MetadataIndex(tmp_path)
+    try:
+        assert idx.get("t1")["bpm"] == 128.0
+    finally:
+        idx.close()
+
+
+def test_scan_file_records(tmp_path):
+    idx = MetadataIndex(tmp_path)
+    try:
+        idx.record_files([("/m/a.mp3", 10, 100, "ida"), ("/m/b.mp3", 20, 200, "idb")], [])
+        assert idx.scanned_files() == {"/m/a.mp3": (10, 100, "ida"), "/m/b.mp3": (20, 200, "idb")}
+        idx.record_files([("/m/a.mp3", 11, 101, "ida2")], ["/m/b.mp3"])
+        assert idx.scanned_files() == {"/m/a.mp3": (11, 101, "ida2")}
+    finally:
+        idx.close()
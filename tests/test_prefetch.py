@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import squidbilli.prefetch as prefetch
+from squidbilli.cache_manager import CachePolicy, save_policy
+from squidbilli.library import TrackInfo
+from squidbilli.prefetch import PREFETCH_MAX_TRACKS, PrefetchScheduler
+
+
+class FakeLibrary:
+    def __init__(self, root: Path, tracks):
+        self.cache_root = root
+        self.version = 1
+        self.tracks = {t.track_id: t for t in tracks}
+
+    def all_tracks(self):
+        return list(self.tracks.values())
+
+    def get_track(self, track_id):
+        return self.tracks.get(track_id)
+
+    def stems_dir(self, track_id):
+        return self.cache_root / "tracks" / track_id / "stems"
+
+    def mark_stems_ready(self, track_id, ready=True):
+        self.tracks[track_id].stems_ready = ready
+        self.version += 1
+
+
+class FakeSeparator:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, path, *, track_id, out_dir, priority):
+        self.submitted.append(track_id)
+        return f"job-{track_id}"
+
+    def wait(self, job_id, timeout=None):
+        return type("Status", (), {"state": "done"})()
+
+
+def track(i, bpm, camelot, stems_ready=False):
+    return TrackInfo(f"t{i:03d}", Path(f"/m/{i}.mp3"), str(i), stems_ready, bpm, camelot, None)
+
+
+@pytest.fixture(autouse=True)
+def idle(monkeypatch):
+    monkeypatch.setattr(prefetch, "_system_busy", lambda: False)
+
+
+def run(sched, ticks):
+    for _ in range(ticks):
+        sched._tick()
+
+
+def test_prefetch_stops_after_top_candidates(tmp_path):
+    ref = track(0, 124.0, "8A", stems_ready=True)
+    tracks = [ref] + [track(i, 124.0 if i < 5 else 90.0, "8A" if i < 5 else "3B") for i in range(1, 60)]
+    lib = FakeLibrary(tmp_path, tracks)
+    sep = FakeSeparator()
+    sched = PrefetchScheduler(lib, sep, lambda: {"loaded": ["t000"]})
+    run(sched, 3 * PREFETCH_MAX_TRACKS)
+    # The loaded track holds one of the top slots.
+    assert len(sep.submitted) == PREFETCH_MAX_TRACKS - 1
+    # Tracks matching the loaded deck's BPM and key go first.
+    assert set(sep.submitted[:4]) == {"t001", "t002", "t003", "t004"}
+
+
+def test_prefetch_waits_at_cache_high_water(tmp_path):
+    lib = FakeLibrary(tmp_path, [track(i, 120.0, "8A") for i in range(5)])
+    sep = FakeSeparator()
+    sched = PrefetchScheduler(lib, sep, lambda: {})
+    d = tmp_path / "tracks" / "big"
+    d.mkdir(parents=True)
+    (d / "blob").write_bytes(b"x" * 1000)
+    save_policy(CachePolicy(budget_bytes=1100), tmp_path)
+    run(sched, 3)
+    assert sep.submitted == []
+
+    save_policy(CachePolicy(budget_bytes=10_000), tmp_path)
+    sched._cache_checked_at = None
+    run(sched, 1)
+    assert len(sep.submitted) == 1
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+from squidbilli.stem_store import (
+    MANIFEST_NAME,
+    STEM_NAMES,
+    adopt_npy_stems,
+    cleanup_stale,
+    convert_stems,
+    load_stems,
+    read_manifest,
+    stem_file,
+    stems_complete,
+    stems_format,
+    write_stems,
+)
+
+SR = 44100
+
+
+def make_stems(frames: int = 4000, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    return {name: (0.5 * rng.standard_normal((frames, 2))).clip(-0.99, 0.99).astype(np.float32) for name in STEM_NAMES}
+
+
+@pytest.mark.parametrize("fmt,atol", [("npy", 0.0), ("wav", 0.0), ("flac", 1e-6)])
+def test_write_load_round_trip(tmp_path, fmt, atol):
+    stems = make_stems()
+    d = tmp_path / "stems"
+    write_stems(d, stems, SR, fmt)
+    assert stems_format(d) == fmt
+    assert read_manifest(d) == {"format": fmt, "sample_rate": SR, "frames": 4000, "stems": list(STEM_NAMES)}
+    loaded = load_stems(d)
+    assert loaded is not None
+    out, sr = loaded
+    assert sr == SR
+    for name in STEM_NAMES:
+        assert out[name].shape == (4000, 2)
+        np.testing.assert_allclose(np.asarray(out[name]), stems[name], atol=atol, rtol=0)
+    if fmt == "npy":
+        assert isinstance(out["drums"], np.memmap)
+
+
+def test_unknown_format_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_stems(tmp_path, make_stems(), SR, "mp3")
+
+
+def test_incomplete_dirs(tmp_path):
+    assert stems_format(tmp_path / "missing") is None
+    d = tmp_path / "stems"
+    write_stems(d, make_stems(), SR, "npy")
+    stem_file(d, "vocals", "npy").unlink()
+    assert not stems_complete(d)
+    assert load_stems(d) is None
+
+
+def test_legacy_wav_dir_without_manifest(tmp_path):
+    d = tmp_path / "stems"
+    write_stems(d, make_stems(), SR, "wav")
+    (d / MANIFEST_NAME).unlink()
+    assert stems_format(d) == "wav"
+    assert load_stems(d) is not None
+
+
+def test_convert_removes_old_format(tmp_path):
+    stems = make_stems()
+    d = tmp_path / "stems"
+    write_stems(d, stems, SR, "npy")
+    assert convert_stems(d, "flac")
+    assert stems_format(d) == "flac"
+    assert not any(stem_file(d, n, "npy").exists() for n in STEM_NAMES)
+    assert not convert_stems(d, "flac")
+    out, _ = load_stems(d)
+    np.testing.assert_allclose(out["bass"], stems["bass"], atol=1e-6, rtol=0)
+
+
+def test_adopt_npy_stems_moves_files(tmp_path):
+    stems = make_stems()
+    src = tmp_path / "partial"
+    src.mkdir()
+    sources = {}
+    for name, data in stems.items():
+        p = src / f"{name}.npy"
+        np.save(str(p), data)
+        sources[name] = p
+    d = tmp_path / "stems"
+    adopt_npy_stems(d, sources, SR, 4000)
+    assert stems_format(d) == "npy"
+    assert not any(p.exists() for p in sources.values())
+    out, _ = load_stems(d)
+    np.testing.assert_array_equal(out["other"], stems["other"])
+
+
+def test_cleanup_stale_removes_old_debris_only(tmp_path):
+    d = tmp_path / "tracks" / "t1" / "stems"
+    write_stems(d, make_stems(), SR, "npy")
+    old = time.time() - 30 * 24 * 60 * 60
+    stale = d / ".drums.npy.partial"
+    stale.write_bytes(b"x")
+    os.utime(stale, (old, old))
+    fresh = d / ".bass.npy.partial"
+    fresh.write_bytes(b"x")
+    partial_dir = d / ".partial"
+    partial_dir.mkdir()
+    os.utime(partial_dir, (old, old))
+
+    assert cleanup_stale(tmp_path) >= 2
+    assert not stale.exists()
+    assert not partial_dir.exists()
+    assert fresh.exists()
+    assert stems_complete(d)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import numpy as np
+
+from squidbilli.waveform import BASE_HOP, FIELDS, WaveformRaster, build_pyramid, load_pyramid, save_pyramid
+
+SR = 44100
+
+
+def signal(seconds: float = 30.0, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    x = 0.5 * np.sin(2 * np.pi * 80 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    x += 0.2 * rng.standard_normal(t.shape[0])
+    return x.astype(np.float32)
+
+
+def test_levels_halve_and_keep_extremes():
+    x = signal()
+    wf = build_pyramid(x, SR)
+    assert wf.frames == x.shape[0]
+    assert wf.duration_s == x.shape[0] / SR
+    base = wf.levels[0]
+    assert base["max"].shape[0] == -(-x.shape[0] // BASE_HOP)
+    assert np.isclose(base["max"].max(), x.max())
+    assert np.isclose(base["min"].min(), x.min())
+    for fine, coarse in zip(wf.levels, wf.levels[1:]):
+        assert coarse["max"].shape[0] == -(-fine["max"].shape[0] // 2)
+        assert np.isclose(coarse["max"].max(), fine["max"].max())
+        assert np.isclose(coarse["min"].min(), fine["min"].min())
+
+
+def test_level_for_picks_coarsest_with_a_bin_per_pixel():
+    wf = build_pyramid(signal(), SR)
+    assert wf.level_for(0.0) == 0
+    assert wf.level_for(wf.bin_seconds(0)) == 0
+    for lv in range(1, len(wf.levels)):
+        assert wf.level_for(wf.bin_seconds(lv)) == lv
+        assert wf.bin_seconds(wf.level_for(wf.bin_seconds(lv) * 1.5)) <= wf.bin_seconds(lv) * 1.5
+
+
+def test_columns_cover_range_and_pad_outside():
+    x = signal(10.0)
+    wf = build_pyramid(x, SR)
+    cols = wf.columns(0.0, wf.duration_s, 200)
+    assert set(cols) == set(FIELDS)
+    assert all(v.shape == (200,) and v.dtype == np.float32 for v in cols.values())
+    assert np.isclose(cols["max"].max(), x.max())
+    assert np.isclose(cols["min"].min(), x.min())
+
+    # Half the view lies past the end of the track.
+    cols = wf.columns(wf.duration_s - 1.0, wf.duration_s + 1.0, 100)
+    assert np.all(cols["max"][60:] == 0.0)
+    assert np.any(cols["max"][:40] != 0.0)
+    assert wf.columns(1.0, 1.0, 100) is None
+    assert wf.columns(0.0, 1.0, 0) is None
+
+
+def test_incremental_build_equals_full_build():
+    x = signal(40.0)
+    full = build_pyramid(x, SR)
+    wf = None
+    for end in (3 * SR + 123, 11 * SR, 25 * SR + 7, x.shape[0]):
+        wf = build_pyramid(x[:end], SR, prev=wf)
+    assert wf.frames == full.frames
+    assert len(wf.levels) == len(full.levels)
+    for a, b in zip(wf.levels, full.levels):
+        for k in FIELDS:
+            np.testing.assert_allclose(a[k], b[k], rtol=1e-5, atol=1e-6)
+    assert np.isclose(wf.peak, full.peak)
+
+
+def test_save_load_round_trip(tmp_path):
+    wf = build_pyramid(signal(8.0), SR)
+    path = tmp_path / "wf" / "waveform.npz"
+    save_pyramid(path, wf)
+    back = load_pyramid(path, SR)
+    assert back is not None
+    assert (back.sample_rate, back.hop, back.frames) == (wf.sample_rate, wf.hop, wf.frames)
+    assert len(back.levels) == len(wf.levels)
+    for a, b in zip(back.levels, wf.levels):
+        for k in FIELDS:
+            # Stored as float16.
+            np.testing.assert_allclose(a[k], b[k], rtol=1e-3, atol=1e-3)
+    assert load_pyramid(path, 48000) is None
+    assert load_pyramid(tmp_path / "missing.npz") is None
+
+
+def test_raster_paints_custom_fields():
+    raster = WaveformRaster(8, 10, colors=(("peak", (255, 0, 0, 255)),))
+    raster.paint({"peak": np.array([0.0, 1.0, 4.0, 100.0], dtype=np.float32)}, gain=1.0)
+    lit = raster.pixels[:, :, 3] > 0
+    # Bars are centered; height follows the value, clipped to the raster.
+    assert lit[:, 0].sum() == 0
+    assert lit[:, 1].sum() == 2
+    assert lit[:, 2].sum() == 8
+    assert lit[:, 3].sum() == 10
+    assert not lit[:, 4:].any()
+    np.testing.assert_array_equal(raster.pixels[5, 3], [1.0, 0.0, 0.0, 1.0])